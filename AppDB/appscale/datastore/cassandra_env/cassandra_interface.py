@@ -19,7 +19,6 @@ from cassandra.cluster import Cluster
 from cassandra.query import BatchStatement
 from cassandra.query import ConsistencyLevel
 from cassandra.query import SimpleStatement
-from cassandra.query import ValueSequence
 from tornado import gen
 
 from appscale.datastore import dbconstants
@@ -73,6 +72,10 @@ SCATTER_PROP_KEY = 'scatter_prop'
 # The metadata key indicating that the database has been primed.
 PRIMED_KEY = 'primed'
 
+# The metadata key used to indicate whether or not the entity statistics
+# counters account for every entity.
+ENTITY_STATS_KEY = 'entity_stats'
+
 # The size in bytes that a batch must be to use the batches table.
 LARGE_BATCH_THRESHOLD = 5 << 10
 
@@ -116,6 +119,110 @@ class ScatterPropStates(object):
   POPULATION_IN_PROGRESS = 'population_in_progress'
 
 
+class EntityStatsStates(object):
+  """ Possible states for the entity statistics counters. """
+  RECONCILED = 'reconciled'
+
+
+class RangePager(object):
+  """ Iterates through a range of rows one Cassandra page at a time.
+
+  Rows are assembled from the page results as they arrive, so callers never
+  need to hold the whole range in memory.
+  """
+  def __init__(self, tornado_cassandra, query, parameters, column_names,
+               keys_only=False):
+    """ Creates a new RangePager.
+
+    Args:
+      tornado_cassandra: A TornadoCassandra object.
+      query: A Cassandra statement for the range with a fetch_size.
+      parameters: The parameters for the statement.
+      column_names: A list of the columns fetched for each row.
+      keys_only: Boolean if pages should only contain keys.
+    """
+    self._tornado_cassandra = tornado_cassandra
+    self._query = query
+    self._parameters = parameters
+    self._column_count = len(column_names)
+    self._keys_only = keys_only
+
+    self._paging_state = None
+    self._pending_key = None
+    self._pending_item = {}
+
+    # Indicates that Cassandra has no more pages for the range.
+    self.exhausted = False
+
+    # An opaque value that can be used to resume the range after the last row
+    # that was returned.
+    self.page_token = None
+
+    self.next_page_sync = tornado_synchronous(self.async_next_page)
+
+  @gen.coroutine
+  def async_next_page(self):
+    """ Retrieves the next complete rows in the range.
+
+    Returns:
+      An ordered list of dictionaries of key=>columns/values or a list of keys
+      if keys only. An empty list indicates that the range is exhausted.
+    Raises:
+      AppScaleDBConnectionError: If the page could not be fetched due to an
+        error with Cassandra.
+    """
+    rows = []
+    while not rows and not self.exhausted:
+      try:
+        results, self._paging_state = yield self._tornado_cassandra.\
+          execute_page(self._query, self._parameters,
+                       paging_state=self._paging_state)
+      except dbconstants.TRANSIENT_CASSANDRA_ERRORS:
+        message = 'Exception while fetching range page'
+        logger.exception(message)
+        raise AppScaleDBConnectionError(message)
+
+      self.exhausted = self._paging_state is None
+
+      # A row's columns can be split across pages, so the last row is only
+      # returned once it is known to be complete.
+      for (key, column, value) in results:
+        if key != self._pending_key:
+          self._flush_pending(rows)
+          self._pending_key = key
+
+        self._pending_item[column] = value
+        if len(self._pending_item) == self._column_count:
+          self._flush_pending(rows)
+
+      if self.exhausted:
+        self._flush_pending(rows)
+
+    if rows:
+      if self._keys_only:
+        self.page_token = rows[-1]
+      else:
+        self.page_token = rows[-1].keys()[0]
+
+    raise gen.Return(rows)
+
+  def _flush_pending(self, rows):
+    """ Adds the row being assembled to a list of results.
+
+    Args:
+      rows: A list of results.
+    """
+    if not self._pending_item:
+      return
+
+    if self._keys_only:
+      rows.append(self._pending_key)
+    else:
+      rows.append({self._pending_key: self._pending_item})
+
+    self._pending_item = {}
+
+
 class DatastoreProxy(AppDBInterface):
   """
     Cassandra implementation of the AppDBInterface
@@ -149,7 +256,11 @@ class DatastoreProxy(AppDBInterface):
         time.sleep(3)
 
     self.session.default_consistency_level = ConsistencyLevel.QUORUM
+
+    # Prepared statements keyed by table, operation, and statement options.
     self.prepared_statements = {}
+    self.prepared_statement_hits = 0
+    self.prepared_statement_misses = 0
 
     # Provide synchronous version of some async methods
     self.batch_get_entity_sync = tornado_synchronous(self.batch_get_entity)
@@ -160,11 +271,49 @@ class DatastoreProxy(AppDBInterface):
     self.get_metadata_sync = tornado_synchronous(self.get_metadata)
     self.set_metadata_sync = tornado_synchronous(self.set_metadata)
     self.delete_table_sync = tornado_synchronous(self.delete_table)
+    self.get_entity_stats_sync = tornado_synchronous(self.get_entity_stats)
+    self.update_entity_stats_sync = tornado_synchronous(
+      self.update_entity_stats)
 
   def close(self):
     """ Close all sessions and connections to Cassandra. """
     self.cluster.shutdown()
 
+  def get_prepared(self, registry_key, statement, retry_policy=None):
+    """ Fetches a prepared statement from the registry, preparing it if needed.
+
+    Args:
+      registry_key: A tuple identifying the statement. It should start with
+        the table and operation followed by any options that change the CQL.
+      statement: A string containing the CQL to prepare on a miss.
+      retry_policy: The retry policy to use when executing the statement.
+    Returns:
+      A PreparedStatement object.
+    """
+    prepared = self.prepared_statements.get(registry_key)
+    if prepared is not None:
+      self.prepared_statement_hits += 1
+      return prepared
+
+    self.prepared_statement_misses += 1
+    prepared = self.session.prepare(statement)
+    if retry_policy is not None:
+      prepared.retry_policy = retry_policy
+
+    self.prepared_statements[registry_key] = prepared
+    return prepared
+
+  def prepared_statement_stats(self):
+    """ Reports how effective the prepared statement registry has been.
+
+    Returns:
+      A dictionary containing the number of prepared statements, registry
+      hits, and registry misses.
+    """
+    return {'statements': len(self.prepared_statements),
+            'hits': self.prepared_statement_hits,
+            'misses': self.prepared_statement_misses}
+
   @gen.coroutine
   def batch_get_entity(self, table_name, row_keys, column_names):
     """
@@ -189,13 +338,14 @@ class DatastoreProxy(AppDBInterface):
     row_keys_bytes = [bytearray(row_key) for row_key in row_keys]
 
     statement = 'SELECT * FROM "{table}" '\
-                'WHERE {key} IN %s and {column} IN %s'.format(
+                'WHERE {key} IN ? and {column} IN ?'.format(
                   table=table_name,
                   key=ThriftColumn.KEY,
                   column=ThriftColumn.COLUMN_NAME,
                 )
-    query = SimpleStatement(statement, retry_policy=BASIC_RETRIES)
-    parameters = (ValueSequence(row_keys_bytes), ValueSequence(column_names))
+    query = self.get_prepared((table_name, 'get'), statement,
+                              retry_policy=BASIC_RETRIES)
+    parameters = (row_keys_bytes, column_names)
 
     try:
       results = yield self.tornado_cassandra.execute(
@@ -250,9 +400,10 @@ class DatastoreProxy(AppDBInterface):
                value=ThriftColumn.VALUE)
 
     if ttl is not None:
-      insert_str += 'USING TTL {}'.format(ttl)
+      insert_str += ' USING TTL {}'.format(ttl)
 
-    statement = self.session.prepare(insert_str)
+    statement = self.get_prepared((table_name, 'put', ttl),
+                                  insert_str)
 
     statements_and_params = []
     for row_key in row_keys:
@@ -288,10 +439,7 @@ class DatastoreProxy(AppDBInterface):
                column=ThriftColumn.COLUMN_NAME,
                value=ThriftColumn.VALUE)
 
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = self.session.prepare(statement)
-
-    return self.prepared_statements[statement]
+    return self.get_prepared((table, 'put', 'timestamp'), statement)
 
   def prepare_delete(self, table):
     """ Prepare a delete statement.
@@ -307,10 +455,8 @@ class DatastoreProxy(AppDBInterface):
       'WHERE {key} = ?'
     ).format(table=table, key=ThriftColumn.KEY)
 
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = self.session.prepare(statement)
-
-    return self.prepared_statements[statement]
+    return self.get_prepared((table, 'delete', 'timestamp'),
+                             statement)
 
   @gen.coroutine
   def normal_batch(self, mutations, txid):
@@ -448,7 +594,8 @@ class DatastoreProxy(AppDBInterface):
       '                     path, old_value, new_value) '
       'VALUES (?, ?, ?, ?, ?, ?)'
     )
-    insert_statement = self.session.prepare(insert_item)
+    insert_statement = self.get_prepared(('batches', 'put'),
+                                         insert_item)
 
     statements_and_params = []
     for entity_change in entity_changes:
@@ -529,13 +676,14 @@ class DatastoreProxy(AppDBInterface):
 
     row_keys_bytes = [bytearray(row_key) for row_key in row_keys]
 
-    statement = 'DELETE FROM "{table}" WHERE {key} IN %s'.\
+    statement = 'DELETE FROM "{table}" WHERE {key} IN ?'.\
       format(
         table=table_name,
         key=ThriftColumn.KEY
       )
-    query = SimpleStatement(statement, retry_policy=BASIC_RETRIES)
-    parameters = (ValueSequence(row_keys_bytes),)
+    query = self.get_prepared((table_name, 'delete'), statement,
+                              retry_policy=BASIC_RETRIES)
+    parameters = (row_keys_bytes,)
 
     try:
       yield self.tornado_cassandra.execute(query, parameters=parameters)
@@ -659,6 +807,106 @@ class DatastoreProxy(AppDBInterface):
     if not isinstance(offset, (int, long)):
       raise TypeError('offset must be int or long')
 
+    query = self._prepare_range(table_name, start_inclusive, end_inclusive,
+                                limit is not None)
+    parameters = [bytearray(start_key), bytearray(end_key), column_names]
+    if limit is not None:
+      parameters.append(len(column_names) * limit)
+
+    try:
+      results = yield self.tornado_cassandra.execute(
+        query, parameters=parameters)
+
+      # Rows before the offset are counted but never materialized.
+      results_list = []
+      current_item = {}
+      current_key = None
+      seen_keys = 0
+      for (key, column, value) in results:
+        if key != current_key:
+          if current_item:
+            results_list.append({current_key: current_item})
+          current_item = {}
+          current_key = key
+          seen_keys += 1
+          if keys_only and seen_keys > offset:
+            results_list.append(key)
+
+        if keys_only or seen_keys <= offset:
+          continue
+
+        current_item[column] = value
+      if current_item:
+        results_list.append({current_key: current_item})
+      raise gen.Return(results_list)
+    except dbconstants.TRANSIENT_CASSANDRA_ERRORS:
+      message = 'Exception during range_query'
+      logger.exception(message)
+      raise AppScaleDBConnectionError(message)
+
+  def range_pager(self,
+                  table_name,
+                  column_names,
+                  start_key,
+                  end_key,
+                  page_size,
+                  page_token=None,
+                  start_inclusive=True,
+                  end_inclusive=True,
+                  keys_only=False):
+    """
+    Creates a RangePager that streams a range ordered by keys using Cassandra's
+    paging state instead of fetching the whole range at once.
+
+    Args:
+      table_name: Name of table to access
+      column_names: Columns which get returned within the key range
+      start_key: String for which the query starts at
+      end_key: String for which the query ends at
+      page_size: The number of rows to fetch from Cassandra at a time
+      page_token: A page_token from a previous RangePager to resume after
+      start_inclusive: Boolean if results should include the start_key
+      end_inclusive: Boolean if results should include the end_key
+      keys_only: Boolean if to only keys and not values
+    Raises:
+      TypeError: If an argument passed in was not of the expected type.
+    Returns:
+      A RangePager object.
+    """
+    if not isinstance(table_name, str):
+      raise TypeError('table_name must be a string')
+    if not isinstance(column_names, list):
+      raise TypeError('column_names must be a list')
+    if not isinstance(start_key, str):
+      raise TypeError('start_key must be a string')
+    if not isinstance(end_key, str):
+      raise TypeError('end_key must be a string')
+    if not isinstance(page_size, (int, long)):
+      raise TypeError('page_size must be int or long')
+
+    if page_token is not None:
+      start_key = page_token
+      start_inclusive = False
+
+    prepared = self._prepare_range(table_name, start_inclusive, end_inclusive)
+    query = prepared.bind((bytearray(start_key), bytearray(end_key),
+                           column_names))
+    query.fetch_size = len(column_names) * page_size
+    return RangePager(self.tornado_cassandra, query, None, column_names,
+                      keys_only=keys_only)
+
+  def _prepare_range(self, table_name, start_inclusive, end_inclusive,
+                     limited=False):
+    """ Fetches a prepared statement for a range of keys.
+
+    Args:
+      table_name: Name of table to access.
+      start_inclusive: Boolean if results should include the start key.
+      end_inclusive: Boolean if results should include the end key.
+      limited: Boolean if the statement should accept a row limit.
+    Returns:
+      A PreparedStatement object.
+    """
     if start_inclusive:
       gt_compare = '>='
     else:
@@ -670,14 +918,14 @@ class DatastoreProxy(AppDBInterface):
       lt_compare = '<'
 
     query_limit = ''
-    if limit is not None:
-      query_limit = 'LIMIT {}'.format(len(column_names) * limit)
+    if limited:
+      query_limit = 'LIMIT ?'
 
     statement = (
       'SELECT * FROM "{table}" WHERE '
-      'token({key}) {gt_compare} %s AND '
-      'token({key}) {lt_compare} %s AND '
-      '{column} IN %s '
+      'token({key}) {gt_compare} ? AND '
+      'token({key}) {lt_compare} ? AND '
+      '{column} IN ? '
       '{limit} '
       'ALLOW FILTERING'
     ).format(table=table_name,
@@ -687,36 +935,30 @@ class DatastoreProxy(AppDBInterface):
              column=ThriftColumn.COLUMN_NAME,
              limit=query_limit)
 
-    query = SimpleStatement(statement, retry_policy=BASIC_RETRIES)
-    parameters = (bytearray(start_key), bytearray(end_key),
-                  ValueSequence(column_names))
+    registry_key = (table_name, 'range', start_inclusive, end_inclusive,
+                    limited)
+    return self.get_prepared(registry_key, statement,
+                             retry_policy=BASIC_RETRIES)
 
-    try:
-      results = yield self.tornado_cassandra.execute(
-        query, parameters=parameters)
+  def get_token_ranges(self):
+    """ Lists the key ranges that make up the token ring.
 
-      results_list = []
-      current_item = {}
-      current_key = None
-      for (key, column, value) in results:
-        if keys_only:
-          results_list.append(key)
-          continue
+    Since the cluster uses the ByteOrderedPartitioner, tokens are keys. Each
+    range starts after the previous token and ends with a token, so the ranges
+    can be passed to range_pager with start_inclusive=False. An empty start
+    or end key indicates that the range is unbounded in that direction.
 
-        if key != current_key:
-          if current_item:
-            results_list.append({current_key: current_item})
-          current_item = {}
-          current_key = key
+    Returns:
+      A list of (start_key, end_key) tuples that cover every key.
+    """
+    token_map = self.cluster.metadata.token_map
+    if token_map is None:
+      return [('', '')]
 
-        current_item[column] = value
-      if current_item:
-        results_list.append({current_key: current_item})
-      raise gen.Return(results_list[offset:])
-    except dbconstants.TRANSIENT_CASSANDRA_ERRORS:
-      message = 'Exception during range_query'
-      logger.exception(message)
-      raise AppScaleDBConnectionError(message)
+    tokens = sorted(set(token.value for token in token_map.ring))
+    boundaries = [''] + tokens + ['']
+    return [(boundaries[index], boundaries[index + 1])
+            for index in range(len(boundaries) - 1)]
 
   @gen.coroutine
   def get_metadata(self, key):
@@ -787,6 +1029,59 @@ class DatastoreProxy(AppDBInterface):
                               dbconstants.DATASTORE_METADATA_SCHEMA)
       yield self.tornado_cassandra.execute(statement, parameters)
 
+  @gen.coroutine
+  def get_entity_stats(self):
+    """ Fetches the entity statistics counters.
+
+    Returns:
+      A dictionary mapping (project, category, name) tuples of UTF-8 encoded
+      strings to (bytes, entities) tuples.
+    Raises:
+      AppScaleDBConnectionError: If the counters could not be fetched.
+    """
+    statement = ('SELECT project, category, name, bytes, entities '
+                 'FROM entity_stats')
+    try:
+      results = yield self.tornado_cassandra.execute(statement)
+    except ((cassandra.InvalidRequest,) +
+            dbconstants.TRANSIENT_CASSANDRA_ERRORS):
+      message = 'Unable to fetch entity statistics'
+      logger.exception(message)
+      raise AppScaleDBConnectionError(message)
+
+    raise gen.Return({
+      (result.project.encode('utf-8'), result.category.encode('utf-8'),
+       result.name.encode('utf-8')): (result.bytes, result.entities)
+      for result in results})
+
+  @gen.coroutine
+  def update_entity_stats(self, deltas):
+    """ Adds to the entity statistics counters.
+
+    Counter updates are not idempotent, so they are not retried.
+
+    Args:
+      deltas: A dictionary mapping (project, category, name) tuples to
+        (bytes, entities) tuples.
+    Raises:
+      AppScaleDBConnectionError: If the counters could not be updated.
+    """
+    statement = ('UPDATE entity_stats '
+                 'SET bytes = bytes + ?, entities = entities + ? '
+                 'WHERE project = ? AND category = ? AND name = ?')
+    try:
+      update = self.get_prepared(('entity_stats', 'update'), statement,
+                                 retry_policy=NO_RETRIES)
+      yield [self.tornado_cassandra.execute(
+               update, (bytes_, entities, project, category, name))
+             for (project, category, name), (bytes_, entities)
+             in deltas.iteritems()]
+    except ((cassandra.InvalidRequest,) +
+            dbconstants.TRANSIENT_CASSANDRA_ERRORS):
+      message = 'Unable to update entity statistics'
+      logger.exception(message)
+      raise AppScaleDBConnectionError(message)
+
   @gen.coroutine
   def valid_data_version(self):
     """ Checks whether or not the data layout can be used.
@@ -871,7 +1166,7 @@ class DatastoreProxy(AppDBInterface):
     """
     batch = BatchStatement(consistency_level=ConsistencyLevel.QUORUM,
                            retry_policy=BASIC_RETRIES)
-    insert = self.session.prepare("""
+    insert = self.get_prepared(('transactions', 'put', 'entity'), """
       INSERT INTO transactions (txid_hash, operation, namespace, path, entity)
       VALUES (?, ?, ?, ?, ?)
       USING TTL {ttl}
@@ -903,7 +1198,7 @@ class DatastoreProxy(AppDBInterface):
     """
     batch = BatchStatement(consistency_level=ConsistencyLevel.QUORUM,
                            retry_policy=BASIC_RETRIES)
-    insert = self.session.prepare("""
+    insert = self.get_prepared(('transactions', 'put', 'entity'), """
       INSERT INTO transactions (txid_hash, operation, namespace, path, entity)
       VALUES (?, ?, ?, ?, ?)
       USING TTL {ttl}
@@ -968,7 +1263,7 @@ class DatastoreProxy(AppDBInterface):
       'VALUES (?, ?, ?, ?, ?) '
       'USING TTL {ttl}'
     ).format(ttl=dbconstants.MAX_TX_DURATION * 2)
-    insert = self.session.prepare(query_str)
+    insert = self.get_prepared(('transactions', 'put', 'task'), query_str)
 
     for task in tasks:
       task.clear_transaction()
@@ -1002,7 +1297,7 @@ class DatastoreProxy(AppDBInterface):
     """
     batch = BatchStatement(consistency_level=ConsistencyLevel.QUORUM,
                            retry_policy=BASIC_RETRIES)
-    insert = self.session.prepare("""
+    insert = self.get_prepared(('transactions', 'put', 'read'), """
       INSERT INTO transactions (txid_hash, operation, namespace, path)
       VALUES (?, ?, ?, ?)
       USING TTL {ttl}
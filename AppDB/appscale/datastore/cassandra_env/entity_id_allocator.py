@@ -1,4 +1,5 @@
 import sys
+import time
 import uuid
 
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
@@ -7,6 +8,7 @@ from cassandra.query import (
   SimpleStatement
 )
 from tornado import gen
+from tornado.locks import Lock
 
 from appscale.datastore.cassandra_env.retry_policies import NO_RETRIES
 from appscale.datastore.cassandra_env.tornado_cassandra import TornadoCassandra
@@ -27,6 +29,13 @@ from google.appengine.datastore.datastore_stub_util import (
 # The number of scattered IDs the datastore should reserve at a time.
 DEFAULT_RESERVATION_SIZE = 10000
 
+# The bounds for reservation sizes that are based on the allocation rate.
+MIN_RESERVATION_SIZE = 1000
+MAX_RESERVATION_SIZE = 1000000
+
+# The number of seconds a reserved block should last at the observed rate.
+RESERVATION_PERIOD = 60
+
 
 class ReservationFailed(Exception):
   """ Indicates that a block of IDs could not be reserved. """
@@ -265,6 +274,17 @@ class ScatteredAllocator(EntityIDAllocator):
     self.start_id = None
     self.end_id = None
 
+    # Ensures that concurrent requests for IDs share a single reservation.
+    self._lock = Lock()
+
+    # The number of IDs to reserve with the next block.
+    self._reservation_size = DEFAULT_RESERVATION_SIZE
+
+    # The time the current block was reserved and the number of IDs that
+    # have been allocated from it.
+    self._block_time = None
+    self._block_allocated = 0
+
   def __iter__(self):
     """ Returns a new iterator object. """
     return self
@@ -276,19 +296,77 @@ class ScatteredAllocator(EntityIDAllocator):
     Returns:
       An integer specifying an entity ID.
     """
-    # This function will require a tornado lock when made asynchronous.
-    if self.start_id is None or self.start_id > self.end_id:
-      size = DEFAULT_RESERVATION_SIZE
-      self.start_id, self.end_id = yield self.allocate_size(size)
+    new_ids = yield self.next_n(1)
+    raise gen.Return(new_ids[0])
+
+  @gen.coroutine
+  def next_n(self, count):
+    """ Generates several new entity IDs.
 
-    next_id = ToScatteredId(self.start_id)
-    self.start_id += 1
-    raise gen.Return(next_id)
+    If the current block does not have enough IDs, a new block large enough
+    for the rest is reserved with a single request.
+
+    Args:
+      count: An integer specifying the number of IDs to generate.
+    Returns:
+      A list of integers specifying entity IDs.
+    """
+    new_ids = []
+    with (yield self._lock.acquire()):
+      while len(new_ids) < count:
+        if self.start_id is None or self.start_id > self.end_id:
+          yield self._reserve_block(count - len(new_ids))
+
+        take = min(count - len(new_ids), self.end_id - self.start_id + 1)
+        new_ids.extend(ToScatteredId(counter) for counter
+                       in range(self.start_id, self.start_id + take))
+        self.start_id += take
+        self._block_allocated += take
+
+    raise gen.Return(new_ids)
+
+  @gen.coroutine
+  def _reserve_block(self, needed, min_counter=None):
+    """ Replaces the current block with a newly-reserved one.
+
+    Args:
+      needed: An integer specifying the minimum size of the block.
+      min_counter: The minimum counter value that should be reserved.
+    """
+    self._update_reservation_size()
+    size = max(needed, self._reservation_size)
+    self.start_id, self.end_id = yield self.allocate_size(
+      size, min_counter=min_counter)
+    self._block_time = time.time()
+    self._block_allocated = 0
+
+  def _update_reservation_size(self):
+    """ Sizes the next block so that it lasts for about RESERVATION_PERIOD
+    seconds at the rate IDs were allocated from the current block. """
+    if self._block_time is None or not self._block_allocated:
+      return
+
+    elapsed = max(time.time() - self._block_time, 1)
+    rate = self._block_allocated / elapsed
+    self._reservation_size = int(min(
+      max(rate * RESERVATION_PERIOD, MIN_RESERVATION_SIZE),
+      MAX_RESERVATION_SIZE))
 
   @gen.coroutine
   def set_min_counter(self, counter):
     """ Ensures the counter is at least as large as the given value.
 
+    Args:
+      counter: An integer specifying the minimum counter value.
+    """
+    with (yield self._lock.acquire()):
+      yield self._set_min_counter(counter)
+
+  @gen.coroutine
+  def _set_min_counter(self, counter):
+    """ Ensures the counter is at least as large as the given value while
+    the lock is held.
+
     Args:
       counter: An integer specifying the minimum counter value.
     """
@@ -312,6 +390,4 @@ class ScatteredAllocator(EntityIDAllocator):
 
     # If this server has allocated a block, but the relevant ID is greater than
     # the end ID, get a new block that starts at least as high as the ID.
-    self.start_id, self.end_id = yield self.allocate_size(
-      DEFAULT_RESERVATION_SIZE, min_counter=counter
-    )
+    yield self._reserve_block(DEFAULT_RESERVATION_SIZE, min_counter=counter)
@@ -19,6 +19,7 @@ from cassandra import ConsistencyLevel
 from cassandra.cluster import Cluster
 from cassandra.cluster import SimpleStatement
 from cassandra.policies import FallthroughRetryPolicy
+from .cassandra_interface import EntityStatsStates
 from .cassandra_interface import IndexStates
 from .cassandra_interface import INITIAL_CONNECT_RETRIES
 from .cassandra_interface import KEYSPACE
@@ -171,6 +172,33 @@ def create_transactions_table(session):
     raise
 
 
+def create_entity_stats_table(session):
+  """ Create the table used for counting the size and number of entities.
+
+  Args:
+    session: A cassandra-driver session.
+  """
+  create_table = """
+    CREATE TABLE IF NOT EXISTS entity_stats (
+      project text,
+      category text,
+      name text,
+      bytes counter,
+      entities counter,
+      PRIMARY KEY (project, category, name)
+    )
+  """
+  statement = SimpleStatement(create_table, retry_policy=NO_RETRIES)
+  try:
+    session.execute(statement, timeout=SCHEMA_CHANGE_TIMEOUT)
+  except cassandra.OperationTimedOut:
+    logger.warning(
+      'Encountered an operation timeout while creating entity_stats table. '
+      'Waiting {} seconds for schema to settle.'.format(SCHEMA_CHANGE_TIMEOUT))
+    time.sleep(SCHEMA_CHANGE_TIMEOUT)
+    raise
+
+
 def create_entity_ids_table(session):
   create_table = """
     CREATE TABLE IF NOT EXISTS reserved_ids (
@@ -341,6 +369,7 @@ def prime_cassandra(replication):
   create_transactions_table(session)
   create_pull_queue_tables(cluster, session)
   create_entity_ids_table(session)
+  create_entity_stats_table(session)
 
   first_entity = session.execute(
     'SELECT * FROM "{}" LIMIT 1'.format(dbconstants.APP_ENTITY_TABLE))
@@ -389,6 +418,12 @@ def prime_cassandra(replication):
                   'value': bytearray(ScatterPropStates.POPULATED)}
     session.execute(metadata_insert, parameters)
 
+    # Indicate that the entity statistics counters include every entity.
+    parameters = {'key': bytearray(cassandra_interface.ENTITY_STATS_KEY),
+                  'column': cassandra_interface.ENTITY_STATS_KEY,
+                  'value': bytearray(EntityStatsStates.RECONCILED)}
+    session.execute(metadata_insert, parameters)
+
   # Indicate that the database has been successfully primed.
   parameters = {'key': bytearray(cassandra_interface.PRIMED_KEY),
                 'column': cassandra_interface.PRIMED_KEY,
@@ -34,6 +34,28 @@ class TornadoCassandra(object):
     )
     return tornado_future
 
+  def execute_page(self, query, parameters=None, paging_state=None, **kwargs):
+    """ Runs a Cassandra query asynchronously and fetches a single page.
+
+    Args:
+      query: An instance of Cassandra query with a fetch_size.
+      parameters: The parameters for the query.
+      paging_state: The paging state returned along with the previous page.
+    Returns:
+      A Tornado future that resolves to a tuple containing the page's rows and
+      the paging state for the next page (None if there are no more pages).
+    """
+    tornado_future = TornadoFuture()
+    io_loop = IOLoop.current()
+    cassandra_future = self._session.execute_async(
+      query, parameters, paging_state=paging_state, **kwargs)
+    cassandra_future.add_callbacks(
+      self._handle_single_page, self._handle_failure,
+      callback_args=(io_loop, tornado_future, cassandra_future),
+      errback_args=(io_loop, tornado_future, query)
+    )
+    return tornado_future
+
   @staticmethod
   def _handle_page(results, io_loop, tornado_future, cassandra_future):
     """ Assigns the Cassandra result to the Tornado future.
@@ -53,6 +75,20 @@ class TornadoCassandra(object):
     result = cassandra_future.result()
     io_loop.add_callback(tornado_future.set_result, result)
 
+  @staticmethod
+  def _handle_single_page(results, io_loop, tornado_future, cassandra_future):
+    """ Assigns a page of results and the next paging state to the Tornado
+    future.
+
+    Args:
+      results: A list of result rows for the current page.
+      io_loop: An instance of tornado IOLoop where execute was initially called.
+      tornado_future: A Tornado future.
+      cassandra_future: A Cassandra future containing ResultSet.
+    """
+    paging_state = cassandra_future.result().paging_state
+    io_loop.add_callback(tornado_future.set_result, (results, paging_state))
+
   @staticmethod
   def _handle_failure(error, io_loop, tornado_future, query):
     """ Assigns the Cassandra exception to the Tornado future.
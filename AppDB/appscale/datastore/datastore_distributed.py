@@ -1,9 +1,11 @@
 import array
+import bisect
 import datetime
 import itertools
 import logging
 import md5
 import sys
+import time
 import uuid
 
 from tornado import gen
@@ -25,7 +27,9 @@ from appscale.datastore.cassandra_env.entity_id_allocator import ScatteredAlloca
 from appscale.datastore.cassandra_env.large_batch import BatchNotApplied
 from appscale.datastore.cassandra_env.utils import deletions_for_entity
 from appscale.datastore.cassandra_env.utils import mutations_for_entity
+from appscale.datastore.entity_stats import StatsBuffer
 from appscale.datastore.index_manager import IndexInaccessible
+from appscale.datastore.query_planner import QueryPlan, Strategies
 from appscale.datastore.taskqueue_client import EnqueueError, TaskQueueClient
 from appscale.datastore.utils import clean_app_id
 from appscale.datastore.utils import decode_path
@@ -42,6 +46,7 @@ from appscale.datastore.utils import kind_from_encoded_key
 from appscale.datastore.utils import reference_property_to_reference
 from appscale.datastore.utils import UnprocessedQueryCursor
 from appscale.datastore.range_iterator import RangeExhausted, RangeIterator
+from appscale.datastore.read_cache import EntityReadCache
 from appscale.datastore.zkappscale import entity_lock
 from appscale.datastore.zkappscale import zktransaction
 
@@ -59,6 +64,7 @@ from google.appengine.datastore.datastore_stub_util import SEQUENTIAL
 from google.appengine.runtime import apiproxy_errors
 from google.appengine.ext import db
 from google.appengine.ext.db.metadata import Namespace
+from google.appengine.ext.db.stats import KindStat
 from google.net.proto.ProtocolBuffer import ProtocolBufferDecodeError
 
 logger = logging.getLogger(__name__)
@@ -117,6 +123,16 @@ class DatastoreDistributed():
   # The number of entities to fetch at a time when updating indices.
   BATCH_SIZE = 100
 
+  # The number of index keys to read at a time when skipping a query offset.
+  _OFFSET_SCAN_SIZE = 1000
+
+  # The number of seconds to use kind statistics before fetching them again.
+  _KIND_STATS_TTL = 600
+
+  # The maximum number of entity groups that a non-transactional put or
+  # delete locks and writes at once.
+  _MAX_WRITE_GROUPS = dbconstants.MAX_GROUPS_FOR_XG
+
   def __init__(self, datastore_batch, transaction_manager, zookeeper=None,
                log_level=logging.INFO, taskqueue_locations=()):
     """
@@ -149,6 +165,20 @@ class DatastoreDistributed():
     self.taskqueue_client = TaskQueueClient(taskqueue_locations)
     self.transaction_manager = transaction_manager
     self.index_manager = None
+
+    # Accumulates changes to entity statistics from writes.
+    self.stats_buffer = StatsBuffer(datastore_batch)
+
+    # Maps each project to the time its kind statistics were fetched and a
+    # dictionary of entity counts for each kind.
+    self._kind_counts = {}
+
+    # The projects whose kind statistics are being fetched.
+    self._kind_count_refreshes = set()
+
+    # Counts the batches applied by non-transactional writes and the number
+    # of mutations they contained.
+    self.batch_counts = {'normal': 0, 'large': 0, 'mutations': 0}
     self.zookeeper.handle.add_listener(self._zk_state_listener)
 
   def get_limit(self, query):
@@ -173,6 +203,67 @@ class DatastoreDistributed():
       limit = 1
     return limit
 
+  def _skippable_offset(self, query):
+    """ Returns the number of offset results that a scan can skip without
+    fetching entities.
+
+    Args:
+      query: A datastore_pb.Query.
+    Returns:
+      An integer specifying the number of results to skip.
+    """
+    # Distinct queries and the namespace metadata query do not map each index
+    # entry to exactly one result.
+    if (query.group_by_property_name_size() > 0 or
+        query.kind() == '__namespace__'):
+      return 0
+
+    return min(query.offset(), self._MAXIMUM_RESULTS)
+
+  @gen.coroutine
+  def _skip_range_keys(self, table_name, column_names, startrow, endrow,
+                       start_inclusive, end_inclusive, offset,
+                       key_filter=None):
+    """ Moves the start of a range past the first results by reading keys.
+
+    Args:
+      table_name: A string specifying the table to scan.
+      column_names: A list of columns that every row in the range contains.
+      startrow: The key from which the range starts.
+      endrow: The key at which the range ends.
+      start_inclusive: Boolean if the range includes the start key.
+      end_inclusive: Boolean if the range includes the end key.
+      offset: An integer specifying the number of results to skip.
+      key_filter: A function that decides if a key counts as a result.
+    Returns:
+      A tuple containing the number of skipped results, the new start key,
+      and whether or not the new start key is inclusive.
+    """
+    skipped = 0
+    while skipped < offset:
+      if key_filter is None:
+        batch_size = min(offset - skipped, self._OFFSET_SCAN_SIZE)
+      else:
+        batch_size = self._OFFSET_SCAN_SIZE
+
+      keys = yield self.datastore_batch.range_query(
+        table_name, column_names, startrow, endrow, batch_size,
+        start_inclusive=start_inclusive, end_inclusive=end_inclusive,
+        keys_only=True)
+
+      for key in keys:
+        startrow = key
+        start_inclusive = self._DISABLE_INCLUSIVITY
+        if key_filter is None or key_filter(key):
+          skipped += 1
+          if skipped == offset:
+            break
+
+      if len(keys) < batch_size:
+        break
+
+    raise gen.Return((skipped, startrow, start_inclusive))
+
   @staticmethod
   def __decode_index_str(value, prop_value):
     """ Takes an encoded string and converts it to a PropertyValue.
@@ -547,6 +638,7 @@ class DatastoreDistributed():
     self.logger.debug('Inserting {} entities'.format(len(entities)))
 
     composite_indexes = self.get_indexes(app)
+    read_cache = EntityReadCache(self.datastore_batch)
 
     by_group = {}
     for entity in entities:
@@ -555,31 +647,37 @@ class DatastoreDistributed():
         by_group[group_key] = []
       by_group[group_key].append(entity)
 
-    for encoded_group_key, entity_list in by_group.iteritems():
-      group_key = entity_pb.Reference(encoded_group_key)
-
-      txid = self.transaction_manager.create_transaction_id(app, xg=False)
-      self.transaction_manager.set_groups(app, txid, [group_key])
+    encoded_groups = by_group.keys()
+    for index in range(0, len(encoded_groups), self._MAX_WRITE_GROUPS):
+      chunk = encoded_groups[index:index + self._MAX_WRITE_GROUPS]
+      yield self._put_groups(app, {group: by_group[group] for group in chunk},
+                             composite_indexes, read_cache)
 
-      # Allow the lock to stick around if there is an issue applying the batch.
-      lock = entity_lock.EntityLock(self.zookeeper.handle, [group_key], txid)
-      try:
-        yield lock.acquire()
-      except entity_lock.LockTimeout:
-        raise Timeout('Unable to acquire entity group lock')
+  @gen.coroutine
+  def _put_groups(self, app, by_group, composite_indexes, read_cache):
+    """ Writes entities from several entity groups under a single lock.
 
+    Args:
+      app: A string containing the application ID.
+      by_group: A dictionary mapping encoded entity group keys to lists of
+        entities.
+      composite_indexes: A list of CompositeIndex objects.
+      read_cache: An EntityReadCache for the current request.
+    """
+    txid, lock = yield self._lock_groups(app, by_group.keys())
+    try:
+      entity_keys = [
+        get_entity_key(self.get_table_prefix(entity), entity.key().path())
+        for entity_list in by_group.itervalues() for entity in entity_list]
       try:
-        entity_keys = [
-          get_entity_key(self.get_table_prefix(entity), entity.key().path())
-          for entity in entity_list]
-        try:
-          current_values = yield self.datastore_batch.batch_get_entity(
-            dbconstants.APP_ENTITY_TABLE, entity_keys, APP_ENTITY_SCHEMA)
-        except dbconstants.AppScaleDBConnectionError:
-          lock.release()
-          self.transaction_manager.delete_transaction_id(app, txid)
-          raise
+        current_values = yield self._get_entity_rows(entity_keys, read_cache)
+      except dbconstants.AppScaleDBConnectionError:
+        lock.release()
+        self.transaction_manager.delete_transaction_id(app, txid)
+        raise
 
+      group_batches = []
+      for encoded_group_key, entity_list in by_group.iteritems():
         batch = []
         entity_changes = []
         for entity in entity_list:
@@ -593,76 +691,226 @@ class DatastoreDistributed():
 
           batch.extend(mutations_for_entity(entity, txid, current_value,
                                             composite_indexes))
-
-          batch.append({'table': 'group_updates',
-                        'key': bytearray(encoded_group_key),
-                        'last_update': txid})
-
           entity_changes.append(
             {'key': entity.key(), 'old': current_value, 'new': entity})
 
-        if batch_size(batch) > LARGE_BATCH_THRESHOLD:
-          try:
-            yield self.datastore_batch.large_batch(app, batch, entity_changes,
-                                                   txid)
-          except BatchNotApplied as error:
-            # If the "applied" switch has not been flipped, the lock can be
-            # released. The transaction ID is kept so that the groomer can
-            # clean up the batch tables.
-            lock.release()
-            raise dbconstants.AppScaleDBConnectionError(str(error))
-        else:
-          try:
-            yield self.datastore_batch.normal_batch(batch, txid)
-          except dbconstants.AppScaleDBConnectionError:
-            # Since normal batches are guaranteed to be atomic, the lock can
-            # be released.
-            lock.release()
-            self.transaction_manager.delete_transaction_id(app, txid)
-            raise
+        batch.append({'table': 'group_updates',
+                      'key': bytearray(encoded_group_key),
+                      'last_update': txid})
+        group_batches.append((batch, entity_changes))
 
+      try:
+        yield self._apply_group_batches(app, txid, lock, group_batches)
+      finally:
+        read_cache.invalidate(entity_keys)
+
+    finally:
+      # In case of failure entity group lock should stay acquired
+      # as transaction groomer will handle it later.
+      # But tornado lock must be released.
+      lock.ensure_release_tornado_lock()
+
+    self.transaction_manager.delete_transaction_id(app, txid)
+
+  @gen.coroutine
+  def _lock_groups(self, app, encoded_groups):
+    """ Allocates a transaction ID for entity groups and locks them.
+
+    Args:
+      app: A string containing the application ID.
+      encoded_groups: A list of encoded entity group keys.
+    Returns:
+      A tuple containing the transaction ID and the acquired EntityLock.
+    Raises:
+      Timeout if the lock could not be acquired.
+    """
+    group_keys = [entity_pb.Reference(encoded_group_key)
+                  for encoded_group_key in encoded_groups]
+    txid = yield self.transaction_manager.create_transaction_id(
+      app, xg=len(group_keys) > 1)
+    self.transaction_manager.set_groups(app, txid, group_keys)
+
+    # Allow the lock to stick around if there is an issue applying the batch.
+    lock = entity_lock.EntityLock(self.zookeeper.handle, group_keys, txid)
+    try:
+      yield lock.acquire()
+    except entity_lock.LockTimeout:
+      raise Timeout('Unable to acquire entity group lock')
+
+    raise gen.Return((txid, lock))
+
+  @gen.coroutine
+  def _apply_group_batches(self, app, txid, lock, group_batches):
+    """ Applies the mutations for entity groups that are locked together.
+
+    Each group's mutations are applied in a single batch, and the groups'
+    batches are applied concurrently. Groups with too many mutations for a
+    normal batch are combined into one large batch. The lock is released
+    when the outcome of every batch is known.
+
+    Args:
+      app: A string containing the application ID.
+      txid: An integer specifying the transaction ID the groups share.
+      lock: The EntityLock that covers the groups.
+      group_batches: A list of (mutations, entity_changes) tuples, one for
+        each entity group.
+    Raises:
+      AppScaleDBConnectionError if any of the batches failed.
+    """
+    normal_batches = []
+    large_mutations = []
+    large_changes = []
+    for batch, entity_changes in group_batches:
+      if batch_size(batch) > LARGE_BATCH_THRESHOLD:
+        large_mutations.extend(batch)
+        large_changes.extend(entity_changes)
+      else:
+        normal_batches.append((batch, entity_changes))
+
+    large_future = None
+    if large_mutations:
+      large_future = self.datastore_batch.large_batch(
+        app, large_mutations, large_changes, txid)
+      self.batch_counts['large'] += 1
+      self.batch_counts['mutations'] += len(large_mutations)
+
+    normal_futures = []
+    for batch, entity_changes in normal_batches:
+      normal_futures.append(
+        (self.datastore_batch.normal_batch(batch, txid), entity_changes))
+      self.batch_counts['normal'] += 1
+      self.batch_counts['mutations'] += len(batch)
+
+    normal_error = None
+    for future, entity_changes in normal_futures:
+      try:
+        yield future
+      except dbconstants.AppScaleDBConnectionError as error:
+        normal_error = error
+        continue
+
+      self.stats_buffer.add(entity_changes)
+
+    if large_future is not None:
+      try:
+        yield large_future
+      except BatchNotApplied as error:
+        # If the "applied" switch has not been flipped, the lock can be
+        # released. The transaction ID is kept so that the groomer can
+        # clean up the batch tables.
         lock.release()
+        raise dbconstants.AppScaleDBConnectionError(str(error))
 
-      finally:
-        # In case of failure entity group lock should stay acquired
-        # as transaction groomer will handle it later.
-        # But tornado lock must be released.
-        lock.ensure_release_tornado_lock()
+      self.stats_buffer.add(large_changes)
 
+    if normal_error is not None:
+      # Since normal batches are guaranteed to be atomic, the lock can be
+      # released.
+      lock.release()
       self.transaction_manager.delete_transaction_id(app, txid)
+      raise normal_error
+
+    lock.release()
+
+  def mutations_per_batch(self):
+    """ Calculates the average size of the batches applied by writes.
+
+    Returns:
+      A float specifying the average number of mutations in a batch.
+    """
+    batches = self.batch_counts['normal'] + self.batch_counts['large']
+    if not batches:
+      return 0.0
+
+    return float(self.batch_counts['mutations']) / batches
 
   @gen.coroutine
-  def delete_entities(self, group, txid, keys, composite_indexes=()):
+  def delete_entities(self, app, keys, composite_indexes=(), read_cache=None):
     """ Deletes the entities and the indexes associated with them.
 
     Args:
-      group: An entity group Reference object.
-      txid: An integer specifying a transaction ID.
+      app: A string containing the application ID.
       keys: An interable containing entity Reference objects.
       composite_indexes: A list or tuple of CompositeIndex objects.
+      read_cache: An EntityReadCache for the current request.
     """
-    entity_keys = []
+    if read_cache is None:
+      read_cache = EntityReadCache(self.datastore_batch)
+
+    by_group = {}
     for key in keys:
-      prefix = self.get_table_prefix(key)
-      entity_keys.append(get_entity_key(prefix, key.path()))
+      group_key = group_for_key(key).Encode()
+      if group_key not in by_group:
+        by_group[group_key] = []
+      by_group[group_key].append(key)
 
-    # Must fetch the entities to get the keys of indexes before deleting.
-    current_values = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, entity_keys, APP_ENTITY_SCHEMA)
+    encoded_groups = by_group.keys()
+    for index in range(0, len(encoded_groups), self._MAX_WRITE_GROUPS):
+      chunk = encoded_groups[index:index + self._MAX_WRITE_GROUPS]
+      yield self._delete_groups(
+        app, {group: by_group[group] for group in chunk}, composite_indexes,
+        read_cache)
 
-    for key in entity_keys:
-      if not current_values[key]:
-        continue
+  @gen.coroutine
+  def _delete_groups(self, app, by_group, composite_indexes, read_cache):
+    """ Deletes entities from several entity groups under a single lock.
 
-      current_value = entity_pb.EntityProto(
-        current_values[key][APP_ENTITY_SCHEMA[0]])
-      batch = deletions_for_entity(current_value, composite_indexes)
+    Args:
+      app: A string containing the application ID.
+      by_group: A dictionary mapping encoded entity group keys to lists of
+        entity Reference objects.
+      composite_indexes: A list or tuple of CompositeIndex objects.
+      read_cache: An EntityReadCache for the current request.
+    """
+    txid, lock = yield self._lock_groups(app, by_group.keys())
+    try:
+      entity_keys = [get_entity_key(self.get_table_prefix(key), key.path())
+                     for key_list in by_group.itervalues() for key in key_list]
 
-      batch.append({'table': 'group_updates',
-                    'key': bytearray(group.Encode()),
-                    'last_update': txid})
+      # Must fetch the entities to get the keys of indexes before deleting.
+      try:
+        current_values = yield self._get_entity_rows(entity_keys, read_cache)
+      except dbconstants.AppScaleDBConnectionError:
+        lock.release()
+        self.transaction_manager.delete_transaction_id(app, txid)
+        raise
 
-      yield self.datastore_batch.normal_batch(batch, txid)
+      group_batches = []
+      for encoded_group_key, key_list in by_group.iteritems():
+        batch = []
+        entity_changes = []
+        for key in key_list:
+          entity_key = get_entity_key(self.get_table_prefix(key), key.path())
+          if not current_values[entity_key]:
+            continue
+
+          current_value = entity_pb.EntityProto(
+            current_values[entity_key][APP_ENTITY_SCHEMA[0]])
+          batch.extend(deletions_for_entity(current_value, composite_indexes))
+          entity_changes.append(
+            {'key': current_value.key(), 'old': current_value, 'new': None})
+
+        if not batch:
+          continue
+
+        batch.append({'table': 'group_updates',
+                      'key': bytearray(encoded_group_key),
+                      'last_update': txid})
+        group_batches.append((batch, entity_changes))
+
+      try:
+        yield self._apply_group_batches(app, txid, lock, group_batches)
+      finally:
+        read_cache.invalidate(entity_keys)
+
+    finally:
+      # In case of failure entity group lock should stay acquired
+      # as transaction groomer will handle it later.
+      # But tornado lock must be released.
+      lock.ensure_release_tornado_lock()
+
+    self.logger.debug('Removed {} entities'.format(len(entity_keys)))
+    self.transaction_manager.delete_transaction_id(app, txid)
 
   @gen.coroutine
   def dynamic_put(self, app_id, put_request, put_response):
@@ -682,6 +930,7 @@ class DatastoreDistributed():
 
     entities = put_request.entity_list()
 
+    incomplete = []
     for entity in entities:
       self.validate_key(entity.key())
 
@@ -694,8 +943,12 @@ class DatastoreDistributed():
 
       last_path = entity.key().path().element_list()[-1]
       if last_path.id() == 0 and not last_path.has_name():
-        allocated_id = yield allocator.next()
-        last_path.set_id(allocated_id)
+        incomplete.append(entity)
+
+    if incomplete:
+      allocated_ids = yield allocator.next_n(len(incomplete))
+      for entity, allocated_id in zip(incomplete, allocated_ids):
+        entity.key().path().element_list()[-1].set_id(allocated_id)
         group = entity.mutable_entity_group()
         root = entity.key().path().element(0)
         group.add_element().CopyFrom(root)
@@ -840,11 +1093,12 @@ class DatastoreDistributed():
       self.zookeeper.release_lock(app_id, txnid)
 
   @gen.coroutine
-  def fetch_keys(self, key_list):
+  def fetch_keys(self, key_list, read_cache=None):
     """ Given a list of keys fetch the entities.
 
     Args:
       key_list: A list of keys to fetch.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A tuple of entities from the datastore and key list.
     """
@@ -854,8 +1108,7 @@ class DatastoreDistributed():
       index_key = str(encode_index_pb(key.path()))
       prefix = self.get_table_prefix(key)
       row_keys.append(self._SEPARATOR.join([prefix, index_key]))
-    result = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, row_keys, APP_ENTITY_SCHEMA)
+    result = yield self._get_entity_rows(row_keys, read_cache)
     raise gen.Return((result, row_keys))
 
   @gen.coroutine
@@ -917,42 +1170,8 @@ class DatastoreDistributed():
       txid = delete_request.transaction().handle()
       yield self.datastore_batch.delete_entities_tx(app_id, txid, keys)
     else:
-      by_group = {}
-      for key in keys:
-        group_key = group_for_key(key).Encode()
-        if group_key not in by_group:
-          by_group[group_key] = []
-        by_group[group_key].append(key)
-
-      for encoded_group_key, key_list in by_group.iteritems():
-        group_key = entity_pb.Reference(encoded_group_key)
-
-        txid = self.transaction_manager.create_transaction_id(app_id, xg=False)
-        self.transaction_manager.set_groups(app_id, txid, [group_key])
-
-        # Allow the lock to stick around if there is an issue applying the batch.
-        lock = entity_lock.EntityLock(self.zookeeper.handle, [group_key], txid)
-        try:
-          yield lock.acquire()
-        except entity_lock.LockTimeout:
-          raise Timeout('Unable to acquire entity group lock')
-
-        try:
-          yield self.delete_entities(
-            group_key,
-            txid,
-            key_list,
-            composite_indexes=filtered_indexes
-          )
-          lock.release()
-        finally:
-          # In case of failure entity group lock should stay acquired
-          # as transaction groomer will handle it later.
-          # But tornado lock must be released.
-          lock.ensure_release_tornado_lock()
-
-        self.logger.debug('Removed {} entities'.format(len(key_list)))
-        self.transaction_manager.delete_transaction_id(app_id, txid)
+      yield self.delete_entities(app_id, keys,
+                                 composite_indexes=filtered_indexes)
 
   def generate_filter_info(self, filters):
     """Transform a list of filters into a more usable form.
@@ -1081,16 +1300,32 @@ class DatastoreDistributed():
     return True
 
   @gen.coroutine
-  def __fetch_entities_from_row_list(self, rowkeys):
+  def _get_entity_rows(self, row_keys, read_cache=None):
+    """ Fetches rows from the entity table.
+
+    Args:
+      row_keys: A list of strings which are keys to the entity table.
+      read_cache: An EntityReadCache for the current request.
+    Returns:
+      A dictionary mapping each key to a dictionary of its columns.
+    """
+    if read_cache is None:
+      read_cache = EntityReadCache(self.datastore_batch)
+
+    result = yield read_cache.get(row_keys)
+    raise gen.Return(result)
+
+  @gen.coroutine
+  def __fetch_entities_from_row_list(self, rowkeys, read_cache=None):
     """ Given a list of keys fetch the entities from the entity table.
 
     Args:
       rowkeys: A list of strings which are keys to the entitiy table.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A list of entities.
     """
-    result = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, rowkeys, APP_ENTITY_SCHEMA)
+    result = yield self._get_entity_rows(rowkeys, read_cache)
     entities = []
     for key in rowkeys:
       if key in result and APP_ENTITY_SCHEMA[0] in result[key]:
@@ -1119,44 +1354,47 @@ class DatastoreDistributed():
     return rowkeys
 
   @gen.coroutine
-  def __fetch_entities(self, refs):
+  def __fetch_entities(self, refs, read_cache=None):
     """ Given a list of references, get the entities.
 
     Args:
       refs: key/value pairs where the values contain a reference to
             the entitiy table.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A list of validated entities.
     """
     rowkeys = self.__extract_rowkeys_from_refs(refs)
-    result = yield self.__fetch_entities_from_row_list(rowkeys)
+    result = yield self.__fetch_entities_from_row_list(rowkeys, read_cache)
     raise gen.Return(result)
 
   @gen.coroutine
-  def __fetch_entities_dict(self, refs):
+  def __fetch_entities_dict(self, refs, read_cache=None):
     """ Given a list of references, return the entities as a dictionary.
 
     Args:
       refs: key/value pairs where the values contain a reference to
             the entitiy table.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A dictionary of validated entities.
     """
     rowkeys = self.__extract_rowkeys_from_refs(refs)
-    result = yield self.__fetch_entities_dict_from_row_list(rowkeys)
+    result = yield self.__fetch_entities_dict_from_row_list(rowkeys,
+                                                            read_cache)
     raise gen.Return(result)
 
   @gen.coroutine
-  def __fetch_entities_dict_from_row_list(self, rowkeys):
+  def __fetch_entities_dict_from_row_list(self, rowkeys, read_cache=None):
     """ Given a list of rowkeys, return the entities as a dictionary.
 
     Args:
       rowkeys: A list of strings which are keys to the entitiy table.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A dictionary of validated entities.
     """
-    results = yield self.datastore_batch.batch_get_entity(
-      dbconstants.APP_ENTITY_TABLE, rowkeys, APP_ENTITY_SCHEMA)
+    results = yield self._get_entity_rows(rowkeys, read_cache)
 
     clean_results = {}
     for key in rowkeys:
@@ -1167,7 +1405,7 @@ class DatastoreDistributed():
 
   @gen.coroutine
   def __fetch_and_validate_entity_set(self, index_dict, limit, app_id,
-    direction):
+    direction, read_cache=None):
     """ Fetch all the valid entities as needed from references.
 
     Args:
@@ -1176,6 +1414,7 @@ class DatastoreDistributed():
       limit: An integer specifying the max number of entities needed.
       app_id: A string, the application identifier.
       direction: The direction of the index.
+      read_cache: An EntityReadCache for the current request.
     Returns:
       A list of valid entities.
     """
@@ -1193,7 +1432,8 @@ class DatastoreDistributed():
       if len(refs_to_fetch) == 0:
         raise gen.Return(results[:limit])
 
-      entities = yield self.__fetch_entities_dict_from_row_list(refs_to_fetch)
+      entities = yield self.__fetch_entities_dict_from_row_list(refs_to_fetch,
+                                                                read_cache)
 
       # Prevent duplicate entities across queries with a cursor.
       entity_keys = entities.keys()
@@ -1299,6 +1539,17 @@ class DatastoreDistributed():
     if startrow > endrow:
       raise gen.Return([])
 
+    offset = self._skippable_offset(query)
+    if offset:
+      key_filter = None
+      if query.has_kind():
+        key_filter = lambda key: kind_from_encoded_key(key) == query.kind()
+
+      skipped, startrow, start_inclusive = yield self._skip_range_keys(
+        dbconstants.APP_ENTITY_TABLE, [APP_ENTITY_SCHEMA[1]], startrow, endrow,
+        start_inclusive, end_inclusive, offset, key_filter)
+      query.set_offset(query.offset() - skipped)
+
     limit = self.get_limit(query)
 
     entities = []
@@ -1362,36 +1613,24 @@ class DatastoreDistributed():
     Returns:
        A validated database result.
     """
-    final_result = []
-    while 1:
-      result = yield self.datastore_batch.range_query(
-        dbconstants.APP_ENTITY_TABLE,
-        APP_ENTITY_SCHEMA,
-        startrow,
-        endrow,
-        limit,
-        offset=0,
-        start_inclusive=start_inclusive,
-        end_inclusive=end_inclusive)
+    pager = self.datastore_batch.range_pager(
+      dbconstants.APP_ENTITY_TABLE,
+      APP_ENTITY_SCHEMA,
+      startrow,
+      endrow,
+      limit,
+      start_inclusive=start_inclusive,
+      end_inclusive=end_inclusive)
 
-      prev_len = len(result)
-      last_result = None
-      if result:
-        last_result = result[-1].keys()[0]
-      else:
+    final_result = []
+    while len(final_result) < limit:
+      page = yield pager.async_next_page()
+      if not page:
         break
 
-      final_result += result
-
-      if len(result) != prev_len:
-        startrow = last_result
-        start_inclusive = self._DISABLE_INCLUSIVITY
-        limit = limit - len(result)
-        continue
-      else:
-        break
+      final_result.extend(page)
 
-    raise gen.Return(self.__extract_entities(final_result))
+    raise gen.Return(self.__extract_entities(final_result[:limit]))
 
   @gen.coroutine
   def kindless_query(self, query, filter_info):
@@ -1442,6 +1681,13 @@ class DatastoreDistributed():
       if query.compiled_cursor().position_list()[0].start_inclusive() == 1:
         start_inclusive = self._ENABLE_INCLUSIVITY
 
+    offset = self._skippable_offset(query)
+    if offset:
+      skipped, startrow, start_inclusive = yield self._skip_range_keys(
+        dbconstants.APP_ENTITY_TABLE, [APP_ENTITY_SCHEMA[1]], startrow, endrow,
+        start_inclusive, end_inclusive, offset)
+      query.set_offset(query.offset() - skipped)
+
     limit = self.get_limit(query)
     result = yield self.fetch_from_entity_table(
       startrow, endrow, limit, offset=0, start_inclusive=start_inclusive,
@@ -1530,7 +1776,8 @@ class DatastoreDistributed():
     return protobuf.Encode()
 
   @gen.coroutine
-  def __kind_query(self, query, filter_info, order_info):
+  def __kind_query(self, query, filter_info, order_info, read_cache=None,
+                   plan=None):
     """ Performs kind only queries, kind and ancestor, and ancestor queries
         https://developers.google.com/appengine/docs/python/datastore/queries.
 
@@ -1538,12 +1785,17 @@ class DatastoreDistributed():
       query: The query to run.
       filter_info: tuple with filter operators and values.
       order_info: tuple with property name and the sort order.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       An ordered list of entities matching the query.
     Raises:
       AppScaleDBError: An infinite loop is detected when fetching references.
     """
     self.logger.debug('Kind Query:\n{}'.format(query))
+    if plan is None:
+      plan = QueryPlan()
+
     filter_info = self.remove_exists_filters(filter_info)
     # Detect quickly if this is a kind query or not.
     for fi in filter_info:
@@ -1555,10 +1807,12 @@ class DatastoreDistributed():
         raise BadRequest('Ordered ancestor queries require an index')
 
       result = yield self.ancestor_query(query, filter_info)
+      plan.entities_fetched += len(result)
       raise gen.Return(result)
 
     if not query.has_kind():
       result = yield self.kindless_query(query, filter_info)
+      plan.entities_fetched += len(result)
       raise gen.Return(result)
 
     if query.kind().startswith("__") and query.kind().endswith("__"):
@@ -1579,10 +1833,13 @@ class DatastoreDistributed():
       if query.compiled_cursor().position_list()[0].start_inclusive() == 1:
         start_inclusive = self._ENABLE_INCLUSIVITY
 
-    limit = self.get_limit(query)
     if startrow > endrow:
       raise gen.Return([])
 
+    # Kind index entries are only validated against the entity table after
+    # they are fetched, so the offset cannot be skipped by reading keys.
+    limit = self.get_limit(query)
+
     # Since the validity of each reference is not checked until after the
     # range query has been performed, we may need to fetch additional
     # references in order to satisfy the query.
@@ -1599,8 +1856,9 @@ class DatastoreDistributed():
         start_inclusive=start_inclusive,
         end_inclusive=end_inclusive
       )
+      plan.index_rows_read += len(references)
 
-      new_entities = yield self.__fetch_entities(references)
+      new_entities = yield self.__fetch_entities(references, read_cache)
       entities.extend(new_entities)
 
       # If we have enough valid entities to satisfy the query, we're done.
@@ -1684,17 +1942,23 @@ class DatastoreDistributed():
     return filter_ops
 
   @gen.coroutine
-  def __single_property_query(self, query, filter_info, order_info):
+  def __single_property_query(self, query, filter_info, order_info,
+                              read_cache=None, plan=None):
     """Performs queries satisfiable by the Single_Property tables.
 
     Args:
       query: The query to run.
       filter_info: tuple with filter operators and values.
       order_info: tuple with property name and the sort order.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       List of entities retrieved from the given query.
     """
     self.logger.debug('Single Property Query:\n{}'.format(query))
+    if plan is None:
+      plan = QueryPlan()
+
     if query.kind().startswith("__") and \
       query.kind().endswith("__"):
       # Use the default namespace for metadata queries.
@@ -1740,8 +2004,6 @@ class DatastoreDistributed():
 
     prefix = self.get_table_prefix(query)
 
-    limit = self.get_limit(query)
-
     if query.has_compiled_cursor() and query.compiled_cursor().position_size():
       cursor = appscale_stub_util.ListCursor(query)
       last_result = cursor._GetLastResult()
@@ -1754,6 +2016,10 @@ class DatastoreDistributed():
     if query.has_end_compiled_cursor():
       end_compiled_cursor = query.end_compiled_cursor()
 
+    # Index entries are only validated against the entity table after they
+    # are fetched, so the offset cannot be skipped by reading keys.
+    limit = self.get_limit(query)
+
     # Since the validity of each reference is not checked until after the
     # range query has been performed, we may need to fetch additional
     # references in order to satisfy the query.
@@ -1764,8 +2030,10 @@ class DatastoreDistributed():
         filter_ops, order_info, property_name, query.kind(), prefix,
         current_limit, startrow, ancestor=ancestor, query=query,
         end_compiled_cursor=end_compiled_cursor)
+      plan.index_rows_read += len(references)
 
-      potential_entities = yield self.__fetch_entities_dict(references)
+      potential_entities = yield self.__fetch_entities_dict(references,
+                                                            read_cache)
 
       # Since the entities may be out of order due to invalid references,
       # we construct a new list in order of valid references.
@@ -2118,6 +2386,10 @@ class DatastoreDistributed():
   def _common_refs_from_ranges(ranges, limit):
     """ Find common entries across multiple index ranges.
 
+    Each pass fetches the next block of entries for every range concurrently
+    and intersects the blocks in memory, skipping ahead with a binary search
+    whenever one range is behind the others.
+
     Args:
       ranges: A list of RangeIterator objects.
       limit: An integer specifying the maximum number of references to find.
@@ -2125,42 +2397,57 @@ class DatastoreDistributed():
       A dictionary mapping entity references to index entries.
     """
     reference_hash = {}
-    min_common_path = ranges[0].get_cursor()
-    entries_exhausted = False
     while True:
-      common_keys = []
-      entry = None
-      for range_ in ranges:
-        try:
-          entry = yield range_.async_next()
-        except RangeExhausted:
-          # If any ranges have been exhausted, there are no more matches.
-          entries_exhausted = True
-          break
+      try:
+        blocks = yield [range_.async_next_block() for range_ in ranges]
+      except RangeExhausted:
+        # If any ranges have been exhausted, there are no more matches.
+        break
 
-        # If this entry's path is ahead of the others, consider it the new
-        # minimum acceptable path and adjust the other ranges.
-        if entry.encoded_path > str(encode_index_pb(min_common_path)):
-          min_common_path = entry.path
+      block_paths = [[entry.encoded_path for entry in block]
+                     for block in blocks]
+      positions = [0 for _ in blocks]
+      target = max(paths[0] for paths in block_paths)
+      inclusive = True
+      while True:
+        # Skip each block ahead to the first entry that could match.
+        for index, paths in enumerate(block_paths):
+          positions[index] = bisect.bisect_left(paths, target,
+                                                positions[index])
+
+        if any(position == len(paths)
+               for position, paths in zip(positions, block_paths)):
           break
 
-        common_keys.append({'index': entry.key, 'prop_name': range_.prop_name})
+        candidates = [paths[position]
+                      for position, paths in zip(positions, block_paths)]
+        highest = max(candidates)
+        if highest != target:
+          target = highest
+          continue
 
-      if entries_exhausted:
-        break
+        entries = [block[position]
+                   for position, block in zip(positions, blocks)]
+        reference_hash[entries[0].entity_reference] = [
+          {'index': entry.key, 'prop_name': range_.prop_name}
+          for entry, range_ in zip(entries, ranges)]
 
-      # If not all paths are common, adjust earlier ranges.
-      if len(common_keys) < len(ranges):
-        for range_ in ranges:
-          range_.set_cursor(min_common_path, inclusive=True)
+        # Ensure the chosen reference is excluded.
+        inclusive = False
+        if len(reference_hash) == limit:
+          break
 
-        continue
+        positions = [position + 1 for position in positions]
+        if any(position == len(paths)
+               for position, paths in zip(positions, block_paths)):
+          break
 
-      reference_hash[entry.entity_reference] = common_keys
+        target = max(paths[position]
+                     for position, paths in zip(positions, block_paths))
+        inclusive = True
 
-      # Ensure the chosen reference is excluded.
       for range_ in ranges:
-        range_.set_cursor(min_common_path, inclusive=False)
+        range_.set_encoded_cursor(target, inclusive)
 
       # If there are enough references to satisfy the query, stop fetching
       # entries.
@@ -2170,7 +2457,8 @@ class DatastoreDistributed():
     raise gen.Return(reference_hash)
 
   @gen.coroutine
-  def zigzag_merge_join(self, query, filter_info, order_info):
+  def zigzag_merge_join(self, query, filter_info, order_info, read_cache=None,
+                        plan=None):
     """ Performs a composite query for queries which have multiple
     equality filters. Uses a varient of the zigzag join merge algorithm.
 
@@ -2187,10 +2475,15 @@ class DatastoreDistributed():
       filter_info: dict of property names mapping to tuples of filter
         operators and values.
       order_info: tuple with property name and the sort order.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       List of entities retrieved from the given query.
     """
     self.logger.debug('ZigZag Merge Join Query:\n{}'.format(query))
+    if plan is None:
+      plan = QueryPlan()
+
     if not self.is_zigzag_merge_join(query, filter_info, order_info):
       return
     kind = query.kind()
@@ -2218,7 +2511,7 @@ class DatastoreDistributed():
     while True:
       reference_hash = yield self._common_refs_from_ranges(ranges, limit)
       new_entities = yield self.__fetch_and_validate_entity_set(
-        reference_hash, limit, app_id, direction)
+        reference_hash, limit, app_id, direction, read_cache)
       entities.extend(new_entities)
 
       # If there are enough entities to satisfy the query, stop fetching.
@@ -2230,6 +2523,7 @@ class DatastoreDistributed():
       if len(reference_hash) < limit:
         break
 
+    plan.index_rows_read += sum(range_.rows_read for range_ in ranges)
     results = entities[:limit]
     self.logger.debug('Returning {} results'.format(len(results)))
     raise gen.Return(results)
@@ -2447,7 +2741,7 @@ class DatastoreDistributed():
     return start_key, end_key
 
   @gen.coroutine
-  def composite_v2(self, query, filter_info):
+  def composite_v2(self, query, filter_info, read_cache=None, plan=None):
     """Performs composite queries using a range query against
        the composite table. Faster than in-memory filters, but requires
        indexes to be built upon each put.
@@ -2456,10 +2750,14 @@ class DatastoreDistributed():
       query: The query to run.
       filter_info: dictionary mapping property names to tuples of
         filter operators and values.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       List of entities retrieved from the given query.
     """
     self.logger.debug('Composite Query:\n{}'.format(query))
+    if plan is None:
+      plan = QueryPlan()
 
     app_id = clean_app_id(query.app())
     if query.composite_index_list():
@@ -2518,13 +2816,15 @@ class DatastoreDistributed():
       references = yield self.datastore_batch.range_query(
         table_name, column_names, startrow, endrow, current_limit,
         offset=0, start_inclusive=start_inclusive, end_inclusive=True)
+      plan.index_rows_read += len(references)
 
       # This is a projection query.
       if query.property_name_size() > 0:
         potential_entities = self._extract_entities_from_composite_indexes(
           query, references, composite_index)
       else:
-        potential_entities = yield self.__fetch_entities(references)
+        potential_entities = yield self.__fetch_entities(references,
+                                                         read_cache)
 
       if len(multiple_equality_filters) > 0:
         self.logger.debug('Detected multiple equality filters on a repeated '
@@ -2852,7 +3152,8 @@ class DatastoreDistributed():
     return entities
 
   @gen.coroutine
-  def __composite_query(self, query, filter_info, _):
+  def __composite_query(self, query, filter_info, _, read_cache=None,
+                        plan=None):
     """Performs Composite queries which is a combination of
        multiple properties to query on.
 
@@ -2860,11 +3161,13 @@ class DatastoreDistributed():
       query: The query to run.
       filter_info: dictionary mapping property names to tuples of
         filter operators and values.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       List of entities retrieved from the given query.
     """
     if self.does_composite_index_exist(query):
-      result = yield self.composite_v2(query, filter_info)
+      result = yield self.composite_v2(query, filter_info, read_cache, plan)
       raise gen.Return(result)
 
     self.logger.error('No composite ID was found for query:\n{}.'.
@@ -2873,24 +3176,147 @@ class DatastoreDistributed():
       datastore_pb.Error.NEED_INDEX,
       'No composite index provided')
 
-  # These are the three different types of queries attempted. Queries
-  # can be identified by their filters and orderings.
-  # TODO: Queries have hints which help in picking which strategy to do first.
+  @gen.coroutine
+  def __found_index_query(self, query, filter_info, _, read_cache=None,
+                          plan=None):
+    """ Performs a composite query with an index the client did not provide.
+
+    Args:
+      query: The query to run.
+      filter_info: dictionary mapping property names to tuples of
+        filter operators and values.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
+    Returns:
+      List of entities retrieved from the given query.
+    """
+    result = yield self.composite_v2(query, filter_info, read_cache, plan)
+    raise gen.Return(result)
+
+  # These are the different types of queries attempted. Queries can be
+  # identified by their filters and orderings. When more than one strategy
+  # applies, the planner tries the cheapest one first.
   _QUERY_STRATEGIES = [
-      __single_property_query,
-      __kind_query,
-      zigzag_merge_join,
+      (Strategies.SINGLE_PROPERTY, __single_property_query),
+      (Strategies.KIND, __kind_query),
+      (Strategies.ZIGZAG_MERGE_JOIN, zigzag_merge_join),
+      (Strategies.COMPOSITE, __found_index_query),
   ]
 
+  def _candidate_strategies(self, query, filter_info, order_info):
+    """ Lists the strategies that are able to run a query.
+
+    Args:
+      query: A datastore_pb.Query protocol buffer.
+      filter_info: dict of property names mapping to tuples of filter
+        operators and values.
+      order_info: tuple with property name and the sort order.
+    Returns:
+      A list of strategy names.
+    """
+    property_names = set(self.remove_exists_filters(filter_info).keys())
+    property_names.update(order[0] for order in order_info)
+    property_names.discard('__key__')
+
+    candidates = []
+    if len(property_names) == 1:
+      candidates.append(Strategies.SINGLE_PROPERTY)
+
+    if not property_names:
+      candidates.append(Strategies.KIND)
+
+    if not self.is_zigzag_merge_join(query, filter_info, order_info):
+      return candidates
+
+    candidates.append(Strategies.ZIGZAG_MERGE_JOIN)
+
+    # A merge join does not need a composite index, but one can be used if it
+    # exists.
+    try:
+      project_indexes = self.get_indexes(clean_app_id(query.app()))
+      index = _FindIndexToUse(query, project_indexes)
+    except (apiproxy_errors.ApplicationError, BadRequest, InternalError):
+      index = None
+
+    if (index is not None and
+        index.state() == entity_pb.CompositeIndex.READ_WRITE):
+      candidates.append(Strategies.COMPOSITE)
+
+    return candidates
+
+  def _get_kind_count(self, app_id, kind):
+    """ Looks up the number of entities the groomer last counted for a kind.
+
+    The statistics are fetched in the background so that queries do not wait
+    for them.
+
+    Args:
+      app_id: A string specifying an application ID.
+      kind: A string specifying an entity kind.
+    Returns:
+      An integer or None if there are no statistics for the kind yet.
+    """
+    fetched, counts = self._kind_counts.get(app_id, (0, {}))
+    if (time.time() - fetched > self._KIND_STATS_TTL and
+        app_id not in self._kind_count_refreshes):
+      self._kind_count_refreshes.add(app_id)
+      IOLoop.current().spawn_callback(self._refresh_kind_counts, app_id)
+
+    return counts.get(kind)
+
   @gen.coroutine
-  def __get_query_results(self, query):
+  def _refresh_kind_counts(self, app_id):
+    """ Fetches the entity counts the groomer last recorded for a project.
+
+    Args:
+      app_id: A string specifying an application ID.
+    """
+    stats_query = datastore_pb.Query()
+    stats_query.set_app(app_id)
+    stats_query.set_kind(KindStat.STORED_KIND_NAME)
+    try:
+      encoded_stats = yield self.__kind_query(stats_query, {}, [])
+    except dbconstants.AppScaleDBConnectionError:
+      self.logger.exception('Unable to fetch kind statistics')
+      return
+    finally:
+      self._kind_count_refreshes.discard(app_id)
+
+    # Older passes may have left more than one statistic for a kind, so only
+    # the newest one is used.
+    counts = {}
+    timestamps = {}
+    for encoded_stat in encoded_stats or []:
+      stat = entity_pb.EntityProto(encoded_stat)
+      values = {prop.name(): prop.value() for prop in stat.property_list()}
+      if 'kind_name' not in values or 'count' not in values:
+        continue
+
+      stat_kind = values['kind_name'].stringvalue()
+      timestamp = 0
+      if 'timestamp' in values:
+        timestamp = values['timestamp'].int64value()
+
+      if timestamp >= timestamps.get(stat_kind, timestamp):
+        counts[stat_kind] = values['count'].int64value()
+        timestamps[stat_kind] = timestamp
+
+    self._kind_counts[app_id] = (time.time(), counts)
+
+  @gen.coroutine
+  def __get_query_results(self, query, read_cache=None, plan=None):
     """Applies the strategy for the provided query.
 
     Args:
       query: A datastore_pb.Query protocol buffer.
+      read_cache: An EntityReadCache for the current request.
+      plan: A QueryPlan that records the work done.
     Returns:
       Result set.
     """
+    if plan is None:
+      plan = QueryPlan()
+
     if query.has_transaction() and not query.has_ancestor():
       raise apiproxy_errors.ApplicationError(
           datastore_pb.Error.BAD_REQUEST,
@@ -2921,52 +3347,92 @@ class DatastoreDistributed():
     # We do the composite check first because its easy to determine if a query
     # has a composite index.
     if query.composite_index_size() > 0:
-      result = yield self.__composite_query(query, filter_info, order_info)
+      plan.strategy = Strategies.COMPOSITE
+      with plan.phase('execute'):
+        result = yield self.__composite_query(query, filter_info, order_info,
+                                              read_cache, plan)
       raise gen.Return(result)
 
-    for strategy in DatastoreDistributed._QUERY_STRATEGIES:
-      results = yield strategy(self, query, filter_info, order_info)
-      if results or results == []:
-        raise gen.Return(results)
+    with plan.phase('plan'):
+      candidates = self._candidate_strategies(query, filter_info, order_info)
+      if len(candidates) > 1:
+        plan.entity_count = self._get_kind_count(app_id, query.kind())
+
+      candidates = plan.order_strategies(candidates, filter_info,
+                                         self.get_limit(query))
+
+    # Strategies decide for themselves whether they can run the query, so the
+    # others are still tried if none of the candidates can.
+    strategies = dict(DatastoreDistributed._QUERY_STRATEGIES)
+    for name, _ in DatastoreDistributed._QUERY_STRATEGIES:
+      if name not in candidates and name != Strategies.COMPOSITE:
+        candidates.append(name)
+
+    with plan.phase('execute'):
+      for name in candidates:
+        results = yield strategies[name](self, query, filter_info, order_info,
+                                         read_cache, plan)
+        if results or results == []:
+          plan.strategy = name
+          raise gen.Return(results)
 
     # The client may not have given a composite index, but there may be one
     # that still works.
     index_to_use = _FindIndexToUse(query, self.get_indexes(app_id))
     if index_to_use is not None:
-      result = yield self.__composite_query(query, filter_info, order_info)
+      result = yield self.__composite_query(query, filter_info, order_info,
+                                            read_cache)
       raise gen.Return(result)
 
     raise BadRequest('The query cannot be satisfied')
 
   @gen.coroutine
-  def _dynamic_run_query(self, query, query_result):
+  def _dynamic_run_query(self, query, query_result, plan=None):
     """Populates the query result and use that query result to
        encode a cursor.
 
     Args:
       query: The query to run.
       query_result: The response given to the application server.
+      plan: A QueryPlan that records how the query was run.
     """
-    result = yield self.__get_query_results(query)
-    last_entity = None
-    count = 0
+    if plan is None:
+      plan = QueryPlan()
+
     offset = query.offset()
+    limit = self.get_limit(query)
+
+    # Strategies can revisit the same entities while validating references.
+    read_cache = EntityReadCache(self.datastore_batch)
+    try:
+      result = yield self.__get_query_results(query, read_cache, plan)
+    finally:
+      plan.entities_fetched += read_cache.rows_fetched
+
+    # Index scans reduce the query's offset by the number of results they
+    # were able to skip without fetching entities.
+    remaining_offset = query.offset()
+    if remaining_offset != offset:
+      query.set_offset(offset)
+
+    count = offset - remaining_offset
+
+    last_entity = None
     if result:
-      query_result.set_skipped_results(len(result) - offset)
       # Last entity is used for the cursor. It needs to be set before
       # applying the offset.
       last_entity = result[-1]
-      count = len(result)
-      result = result[offset:]
+      count += len(result)
+      result = result[remaining_offset:]
       if query.has_limit():
         result = result[:query.limit()]
 
     cur = UnprocessedQueryCursor(query, result, last_entity)
-    cur.PopulateQueryResult(count, query.offset(), query_result)
+    cur.PopulateQueryResult(count, offset, query_result)
 
     # If we have less than the amount of entities we request there are no
     # more results for this query.
-    if count < self.get_limit(query):
+    if count < limit:
       query_result.set_more_results(False)
 
     # If there were no results then we copy the last cursor so future queries
@@ -3013,7 +3479,8 @@ class DatastoreDistributed():
     Returns:
       A long representing a unique transaction ID.
     """
-    txid = self.transaction_manager.create_transaction_id(app_id, xg=is_xg)
+    txid = yield self.transaction_manager.create_transaction_id(
+      app_id, xg=is_xg)
     in_progress = self.transaction_manager.get_open_transactions(app_id)
     yield self.datastore_batch.start_transaction(
       app_id, txid, is_xg, in_progress)
@@ -3110,8 +3577,7 @@ class DatastoreDistributed():
       entity_table_keys.extend([encode_entity_table_key(key)
                                 for key in metadata['deletes']])
       try:
-        current_values = yield self.datastore_batch.batch_get_entity(
-          dbconstants.APP_ENTITY_TABLE, entity_table_keys, APP_ENTITY_SCHEMA)
+        current_values = yield self._get_entity_rows(entity_table_keys)
       except dbconstants.AppScaleDBConnectionError:
         lock.release()
         self.transaction_manager.delete_transaction_id(app, txn)
@@ -3173,6 +3639,7 @@ class DatastoreDistributed():
           self.transaction_manager.delete_transaction_id(app, txn)
           raise
 
+      self.stats_buffer.add(entity_changes)
       lock.release()
 
     finally:
@@ -0,0 +1,147 @@
+""" Tracks the size and number of entities as they are written. """
+
+import logging
+import re
+
+from tornado import gen
+from tornado.ioloop import PeriodicCallback
+
+from appscale.datastore.dbconstants import AppScaleDBConnectionError
+from appscale.datastore.utils import get_entity_kind
+
+logger = logging.getLogger(__name__)
+
+# Kinds that are used internally and are not included in statistics.
+PRIVATE_KINDS = '__(.*)__'
+
+# Kinds that are reserved and are not included in statistics.
+PROTECTED_KINDS = '_(.*)_'
+
+# Applications that are internal to AppScale and do not have statistics.
+APPSCALE_APPLICATIONS = ['apichecker', 'appscaledashboard']
+
+
+class StatCategories(object):
+  """ The groups that entities are counted by. """
+  KIND = 'kind'
+  NAMESPACE = 'namespace'
+
+
+def is_tracked(app_id, kind):
+  """ Determines whether or not entities are included in statistics.
+
+  Args:
+    app_id: A string specifying an application ID.
+    kind: A string specifying an entity kind.
+  Returns:
+    A boolean.
+  """
+  if not app_id or not kind:
+    return False
+
+  if re.match(PROTECTED_KINDS, kind) or re.match(PRIVATE_KINDS, kind):
+    return False
+
+  return app_id not in APPSCALE_APPLICATIONS
+
+
+def stat_deltas(entity_changes):
+  """ Calculates how a set of writes changes the entity statistics.
+
+  Args:
+    entity_changes: A list of dictionaries containing the entity's key, its
+      old value, and its new value. A value is None if the entity does not
+      exist.
+  Returns:
+    A dictionary mapping (project, category, name) tuples to
+    (bytes, entities) tuples.
+  """
+  deltas = {}
+  for change in entity_changes:
+    key = change['key']
+    app_id = key.app()
+    kind = get_entity_kind(key)
+    if not is_tracked(app_id, kind):
+      continue
+
+    size = 0
+    number = 0
+    if change['old'] is not None:
+      size -= change['old'].ByteSize()
+      number -= 1
+
+    if change['new'] is not None:
+      size += change['new'].ByteSize()
+      number += 1
+
+    if size == 0 and number == 0:
+      continue
+
+    for category, name in [(StatCategories.KIND, kind),
+                           (StatCategories.NAMESPACE, key.name_space())]:
+      stat_key = (app_id, category, name)
+      bytes_, entities = deltas.get(stat_key, (0, 0))
+      deltas[stat_key] = (bytes_ + size, entities + number)
+
+  return deltas
+
+
+class StatsBuffer(object):
+  """ Accumulates entity statistics changes and periodically adds them to
+  the statistics counters. """
+
+  # The number of seconds between writes to the statistics counters.
+  FLUSH_INTERVAL = 10
+
+  def __init__(self, db):
+    """ Creates a new StatsBuffer.
+
+    Args:
+      db: A database interface object.
+    """
+    self._db = db
+    self._deltas = {}
+    self._flush_callback = None
+
+  def add(self, entity_changes):
+    """ Records the changes made by a set of writes.
+
+    Args:
+      entity_changes: A list of dictionaries containing the entity's key, its
+        old value, and its new value.
+    """
+    self._merge(stat_deltas(entity_changes))
+
+  def start(self):
+    """ Starts writing the changes to the statistics counters periodically. """
+    if self._flush_callback is None:
+      self._flush_callback = PeriodicCallback(self.flush,
+                                              self.FLUSH_INTERVAL * 1000)
+      self._flush_callback.start()
+
+  @gen.coroutine
+  def flush(self):
+    """ Writes the accumulated changes to the statistics counters. """
+    if not self._deltas:
+      return
+
+    deltas = self._deltas
+    self._deltas = {}
+    try:
+      yield self._db.update_entity_stats(deltas)
+    except AppScaleDBConnectionError:
+      # The groomer reconciles the counters if this was partially applied.
+      logger.warning('Unable to flush {} entity stat changes'.format(
+        len(deltas)))
+      self._merge(deltas)
+
+  def _merge(self, deltas):
+    """ Adds changes to the buffer.
+
+    Args:
+      deltas: A dictionary mapping (project, category, name) tuples to
+        (bytes, entities) tuples.
+    """
+    for stat_key, (size, number) in deltas.iteritems():
+      bytes_, entities = self._deltas.get(stat_key, (0, 0))
+      self._deltas[stat_key] = (bytes_ + size, entities + number)
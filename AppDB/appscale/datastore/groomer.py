@@ -1,4 +1,6 @@
+import base64
 import datetime
+import json
 import logging
 import os
 import random
@@ -7,9 +9,7 @@ import sys
 import threading
 import time
 
-from tornado import gen
-
-from appscale.datastore.utils import tornado_synchronous
+from kazoo.exceptions import KazooException, NodeExistsError, NoNodeError
 
 import appscale_datastore_batch
 import dbconstants
@@ -23,6 +23,10 @@ from appscale.taskqueue.distributed_tq import TaskName
 from . import helper_functions
 from .cassandra_env import cassandra_interface
 from .datastore_distributed import DatastoreDistributed
+from .entity_stats import APPSCALE_APPLICATIONS
+from .entity_stats import PRIVATE_KINDS
+from .entity_stats import PROTECTED_KINDS
+from .entity_stats import StatCategories
 from .index_manager import IndexManager
 from .utils import get_composite_indexes_rows
 from .zkappscale import zktransaction as zk
@@ -47,6 +51,132 @@ from dashboard_logs import RequestLogLine
 logger = logging.getLogger(__name__)
 
 
+def _encode_counts(counts):
+  """ Prepares a statistics dictionary for JSON encoding.
+
+  Args:
+    counts: A dictionary mapping app IDs to dictionaries that map kinds or
+      namespaces to sizes and numbers of entities.
+  Returns:
+    A dictionary with the same structure.
+  """
+  return {app_id: {name: dict(totals) for name, totals in names.iteritems()}
+          for app_id, names in counts.iteritems()}
+
+
+def _decode_counts(counts):
+  """ Restores a statistics dictionary that was decoded from JSON.
+
+  Args:
+    counts: A dictionary with unicode keys.
+  Returns:
+    A dictionary with UTF-8 encoded string keys.
+  """
+  return {app_id.encode('utf-8'):
+            {name.encode('utf-8'): dict(totals)
+             for name, totals in names.iteritems()}
+          for app_id, names in counts.iteritems()}
+
+
+def _add_counts(counts, app_id, name, size, number):
+  """ Adds to the size and number of entities for a kind or namespace.
+
+  Args:
+    counts: A statistics dictionary.
+    app_id: A string specifying an application ID.
+    name: A string specifying a kind or namespace.
+    size: The number of bytes to add.
+    number: The number of entities to add.
+  """
+  totals = counts.setdefault(app_id, {}).setdefault(
+    name, {'size': 0, 'number': 0})
+  totals['size'] += size
+  totals['number'] += number
+
+
+class EntityShard(object):
+  """ A range of the entity table that is groomed by one worker at a time.
+
+  Shards are stored in ZooKeeper so that groomers on any node can claim them
+  and so that a pass can resume from each shard's last checkpoint.
+  """
+  def __init__(self, start_key, end_key, last_key=None, done=False,
+               stats=None, namespace_info=None, entities_checked=0):
+    """ Creates a new EntityShard.
+
+    Args:
+      start_key: A string specifying the key that the shard starts after.
+      end_key: A string specifying the last key in the shard.
+      last_key: A string specifying the last key that was groomed.
+      done: A boolean indicating that the whole shard has been groomed.
+      stats: A dictionary of kind statistics for the groomed entities.
+      namespace_info: A dictionary of namespace statistics for the groomed
+        entities.
+      entities_checked: The number of entities that have been groomed.
+    """
+    self.start_key = start_key
+    self.end_key = end_key
+    self.last_key = last_key
+    self.done = done
+    self.stats = stats or {}
+    self.namespace_info = namespace_info or {}
+    self.entities_checked = entities_checked
+
+  def add_entity(self, app_id, kind, namespace, size):
+    """ Adds an entity to the shard's statistics.
+
+    Args:
+      app_id: A string specifying the entity's application ID.
+      kind: A string specifying the entity's kind.
+      namespace: A string specifying the entity's namespace.
+      size: The number of bytes the entity uses.
+    """
+    _add_counts(self.stats, app_id, kind, size, 1)
+    _add_counts(self.namespace_info, app_id, namespace, size, 1)
+
+  def encode(self):
+    """ Encodes the shard for storage in ZooKeeper.
+
+    Returns:
+      A JSON string.
+    """
+    last_key = None
+    if self.last_key is not None:
+      last_key = base64.b64encode(self.last_key)
+
+    return json.dumps({
+      'start': base64.b64encode(self.start_key),
+      'end': base64.b64encode(self.end_key),
+      'last_key': last_key,
+      'done': self.done,
+      'stats': _encode_counts(self.stats),
+      'namespace_info': _encode_counts(self.namespace_info),
+      'entities_checked': self.entities_checked
+    })
+
+  @classmethod
+  def decode(cls, data):
+    """ Restores a shard from ZooKeeper.
+
+    Args:
+      data: A JSON string created by encode.
+    Returns:
+      An EntityShard object.
+    """
+    shard = json.loads(data)
+    last_key = None
+    if shard['last_key'] is not None:
+      last_key = base64.b64decode(shard['last_key'])
+
+    return cls(base64.b64decode(shard['start']),
+               base64.b64decode(shard['end']),
+               last_key=last_key,
+               done=shard['done'],
+               stats=_decode_counts(shard['stats']),
+               namespace_info=_decode_counts(shard['namespace_info']),
+               entities_checked=shard['entities_checked'])
+
+
 class DatastoreGroomer(threading.Thread):
   """ Scans the entire database for each application. """
 
@@ -61,11 +191,14 @@ class DatastoreGroomer(threading.Thread):
   # The number of entities retrieved in a datastore request.
   BATCH_SIZE = 100
 
+  # The number of index entries to check at a time.
+  INDEX_BATCH_SIZE = 500
+
   # Any kind that is of __*__ is private and should not have stats.
-  PRIVATE_KINDS = '__(.*)__'
+  PRIVATE_KINDS = PRIVATE_KINDS
 
   # Any kind that is of _*_ is protected and should not have stats.
-  PROTECTED_KINDS = '_(.*)_'
+  PROTECTED_KINDS = PROTECTED_KINDS
 
   # The amount of time in seconds before we want to clean up task name holders.
   TASK_NAME_TIMEOUT = 24 * 60 * 60
@@ -74,7 +207,7 @@ class DatastoreGroomer(threading.Thread):
   LOG_STORAGE_TIMEOUT = 24 * 60 * 60 * 7
 
   # Do not generate stats for AppScale internal apps.
-  APPSCALE_APPLICATIONS = ['apichecker', 'appscaledashboard']
+  APPSCALE_APPLICATIONS = APPSCALE_APPLICATIONS
 
   # A sentinel value to signify that this app does not have composite indexes.
   NO_COMPOSITES = "NO_COMPS_INDEXES_HERE"
@@ -109,6 +242,24 @@ class DatastoreGroomer(threading.Thread):
   # Log progress every time this many seconds have passed.
   LOG_PROGRESS_FREQUENCY = 60 * 5
 
+  # The ZooKeeper node that contains a node for each entity table shard.
+  SHARDS_PATH = GROOMER_STATE_PATH + '/shards'
+
+  # The number of threads in each groomer that work on entity shards.
+  SHARD_WORKERS = 4
+
+  # The number of seconds between saving the progress of a shard.
+  SHARD_CHECKPOINT_PERIOD = 30
+
+  # The number of seconds to wait for shards claimed by other groomers.
+  SHARD_POLL_PERIOD = 60
+
+  # The lock that allows one groomer at a time to publish statistics.
+  STATS_LOCK_PATH = '/appscale_datastore_stats'
+
+  # The number of seconds between publishing statistics from the counters.
+  STATS_PUBLISH_PERIOD = 60 * 5
+
   def __init__(self, zoo_keeper, table_name, ds_path):
     """ Constructor.
 
@@ -136,6 +287,7 @@ class DatastoreGroomer(threading.Thread):
     self.scatter_prop_vals_populated = 0
     self.last_logged = time.time()
     self.groomer_state = []
+    self.progress_lock = threading.Lock()
 
   def stop(self):
     """ Stops the groomer thread. """
@@ -159,9 +311,27 @@ class DatastoreGroomer(threading.Thread):
             format(str(zk_exception)))
       else:
         logger.info("Did not get the groomer lock.")
+        if self.assist_with_entity_shards():
+          # The pass is still running, so keep checking for shards that
+          # become available instead of waiting for the next pass.
+          time.sleep(self.SHARD_POLL_PERIOD)
+          continue
+
       sleep_time = random.randint(1, self.LOCK_POLL_PERIOD)
       logger.info('Sleeping for {:.1f} minutes.'.format(sleep_time/60.0))
-      time.sleep(sleep_time)
+      self.wait_and_publish_stats(sleep_time)
+
+  def wait_and_publish_stats(self, duration):
+    """ Publishes statistics from the counters while waiting for the next
+    pass.
+
+    Args:
+      duration: The number of seconds to wait.
+    """
+    deadline = time.time() + duration
+    while time.time() < deadline:
+      time.sleep(min(self.STATS_PUBLISH_PERIOD, deadline - time.time()))
+      self.publish_entity_stats()
 
   def get_groomer_lock(self):
     """ Tries to acquire the lock to the datastore groomer.
@@ -171,18 +341,6 @@ class DatastoreGroomer(threading.Thread):
     """
     return self.zoo_keeper.get_lock_with_path(zk.DS_GROOM_LOCK_PATH)
 
-  def get_entity_batch(self, last_key):
-    """ Gets a batch of entites to operate on.
-
-    Args:
-      last_key: The last key from a previous query.
-    Returns:
-      A list of entities.
-    """
-    return self.db_access.range_query_sync(
-      dbconstants.APP_ENTITY_TABLE, dbconstants.APP_ENTITY_SCHEMA,
-      last_key, "", self.BATCH_SIZE, start_inclusive=False)
-
   def reset_statistics(self):
     """ Reinitializes statistics. """
     self.stats = {}
@@ -276,81 +434,59 @@ class DatastoreGroomer(threading.Thread):
 
     return group
 
-  @tornado_synchronous
-  @gen.coroutine
-  def lock_and_delete_indexes(self, references, direction, entity_key):
-    """ For a list of index entries that have the same entity, lock the entity
-    and delete the indexes.
+  def group_references(self, references):
+    """ Groups index entries by the entity group of the entity they point to.
+
+    Args:
+      references: A list of index entries.
+    Returns:
+      A dictionary mapping encoded entity group Reference objects to lists of
+      index entries.
+    """
+    references_by_group = {}
+    for reference in references:
+      entity_key = reference.values()[0][self.ds_access.INDEX_REFERENCE_COLUMN]
+      group_key = self.guess_group_from_table_key(entity_key).Encode()
+      references_by_group.setdefault(group_key, []).append(reference)
+
+    return references_by_group
+
+  def lock_and_delete_group_indexes(self, encoded_group, references,
+                                    table_name, column_names, is_valid):
+    """ For a list of index entries that point to the same entity group, lock
+    the group once and delete the invalid entries with a single statement.
 
     Since another process can update an entity after we've determined that
     an index entry is invalid, we need to re-check the index entries after
-    locking their entity key.
+    locking their entity group.
 
     Args:
-      references: A list of references to an entity.
-      direction: The direction of the index.
-      entity_key: A string containing the entity key.
+      encoded_group: A string containing an encoded entity group Reference.
+      references: A list of index entries that were found to be invalid.
+      table_name: A string specifying the index table.
+      column_names: A list of the index table's columns.
+      is_valid: A function that takes an index entry and a dictionary of
+        entities and returns True if the entry is still valid.
     """
-    if direction == datastore_pb.Query_Order.ASCENDING:
-      table_name = dbconstants.ASC_PROPERTY_TABLE
-    else:
-      table_name = dbconstants.DSC_PROPERTY_TABLE
-
-    group_key = self.guess_group_from_table_key(entity_key)
+    group_key = entity_pb.Reference(encoded_group)
     entity_lock = EntityLock(self.zoo_keeper.handle, [group_key])
     with entity_lock:
       entities = self.fetch_entity_dict_for_references(references)
-
-      refs_to_delete = []
-      for reference in references:
-        index_elements = reference.keys()[0].split(self.ds_access._SEPARATOR)
-        prop = index_elements[self.ds_access.PROP_NAME_IN_SINGLE_PROP_INDEX]
-        if not self.ds_access._DatastoreDistributed__valid_index_entry(
-          reference, entities, direction, prop):
-          refs_to_delete.append(reference.keys()[0])
+      refs_to_delete = [reference.keys()[0] for reference in references
+                        if not is_valid(reference, entities)]
+      if not refs_to_delete:
+        return
 
       logger.debug('Removing {} indexes starting with {}'.
         format(len(refs_to_delete), [refs_to_delete[0]]))
       try:
-        self.db_access.batch_delete_sync(
-          table_name, refs_to_delete, column_names=dbconstants.PROPERTY_SCHEMA)
+        self.db_access.batch_delete_sync(table_name, refs_to_delete,
+                                         column_names=column_names)
         self.index_entries_cleaned += len(refs_to_delete)
-      except Exception:
+      except dbconstants.AppScaleDBConnectionError:
         logger.exception('Unable to delete indexes')
         self.index_entries_delete_failures += 1
 
-  @tornado_synchronous
-  @gen.coroutine
-  def lock_and_delete_kind_index(self, reference):
-    """ For a list of index entries that have the same entity, lock the entity
-    and delete the indexes.
-
-    Since another process can update an entity after we've determined that
-    an index entry is invalid, we need to re-check the index entries after
-    locking their entity key.
-
-    Args:
-      reference: A dictionary containing a kind reference.
-    """
-    table_name = dbconstants.APP_KIND_TABLE
-    entity_key = reference.values()[0].values()[0]
-
-    group_key = self.guess_group_from_table_key(entity_key)
-    entity_lock = EntityLock(self.zoo_keeper.handle, [group_key])
-    with entity_lock:
-      entities = self.fetch_entity_dict_for_references([reference])
-      if entity_key not in entities:
-        index_to_delete = reference.keys()[0]
-        logger.debug('Removing {}'.format([index_to_delete]))
-        try:
-          self.db_access.batch_delete_sync(
-            table_name, [index_to_delete],
-            column_names=dbconstants.APP_KIND_SCHEMA)
-          self.index_entries_cleaned += 1
-        except dbconstants.AppScaleDBConnectionError:
-          logger.exception('Unable to delete index.')
-          self.index_entries_delete_failures += 1
-
   def insert_scatter_indexes(self, entity_key, path, scatter_prop):
     """ Writes scatter property references to the index tables.
 
@@ -480,13 +616,20 @@ class DatastoreGroomer(threading.Thread):
         cassandra_interface.INDEX_STATE_KEY,
         cassandra_interface.IndexStates.SCRUB_IN_PROGRESS)
 
+    def is_valid(reference, entities):
+      index_elements = reference.keys()[0].split(self.ds_access._SEPARATOR)
+      prop_name = index_elements[
+        self.ds_access.PROP_NAME_IN_SINGLE_PROP_INDEX]
+      return self.ds_access._DatastoreDistributed__valid_index_entry(
+        reference, entities, direction, prop_name)
+
     while True:
       references = self.db_access.range_query_sync(
         table_name=table_name,
         column_names=dbconstants.PROPERTY_SCHEMA,
         start_key=start_key,
         end_key=end_key,
-        limit=self.BATCH_SIZE,
+        limit=self.INDEX_BATCH_SIZE,
         start_inclusive=False,
       )
       if len(references) == 0:
@@ -508,20 +651,16 @@ class DatastoreGroomer(threading.Thread):
           'An infinite loop was detected while fetching references.')
 
       entities = self.fetch_entity_dict_for_references(references)
+      invalid_refs = [reference for reference in references
+                      if not is_valid(reference, entities)]
+
+      # Group invalid references by entity group so we can minimize locks.
+      references_by_group = self.group_references(invalid_refs)
+      for encoded_group, group_refs in references_by_group.iteritems():
+        self.lock_and_delete_group_indexes(
+          encoded_group, group_refs, table_name, dbconstants.PROPERTY_SCHEMA,
+          is_valid)
 
-      # Group invalid references by entity key so we can minimize locks.
-      invalid_refs = {}
-      for reference in references:
-        prop_name = reference.keys()[0].split(self.ds_access._SEPARATOR)[3]
-        if not self.ds_access._DatastoreDistributed__valid_index_entry(
-          reference, entities, direction, prop_name):
-          entity_key = reference.values()[0][self.ds_access.INDEX_REFERENCE_COLUMN]
-          if entity_key not in invalid_refs:
-            invalid_refs[entity_key] = []
-          invalid_refs[entity_key].append(reference)
-
-      for entity_key in invalid_refs:
-        self.lock_and_delete_indexes(invalid_refs[entity_key], direction, entity_key)
       self.update_groomer_state([task_id, start_key])
 
   def clean_up_kind_indices(self):
@@ -538,13 +677,16 @@ class DatastoreGroomer(threading.Thread):
     if len(self.groomer_state) > 1:
       start_key = self.groomer_state[1]
 
+    def is_valid(reference, entities):
+      return reference.values()[0].values()[0] in entities
+
     while True:
       references = self.db_access.range_query_sync(
         table_name=table_name,
         column_names=dbconstants.APP_KIND_SCHEMA,
         start_key=start_key,
         end_key=end_key,
-        limit=self.BATCH_SIZE,
+        limit=self.INDEX_BATCH_SIZE,
         start_inclusive=False,
       )
       if len(references) == 0:
@@ -566,11 +708,14 @@ class DatastoreGroomer(threading.Thread):
           'An infinite loop was detected while fetching references.')
 
       entities = self.fetch_entity_dict_for_references(references)
+      invalid_refs = [reference for reference in references
+                      if not is_valid(reference, entities)]
 
-      for reference in references:
-        entity_key = reference.values()[0].values()[0]
-        if entity_key not in entities:
-          self.lock_and_delete_kind_index(reference)
+      references_by_group = self.group_references(invalid_refs)
+      for encoded_group, group_refs in references_by_group.iteritems():
+        self.lock_and_delete_group_indexes(
+          encoded_group, group_refs, table_name, dbconstants.APP_KIND_SCHEMA,
+          is_valid)
 
       self.update_groomer_state([task_id, start_key])
 
@@ -656,13 +801,14 @@ class DatastoreGroomer(threading.Thread):
     if namespace not in self.namespace_info[app_id]:
       self.stats[app_id][namespace] = {'size': 0, 'number': 0}
 
-  def process_statistics(self, key, entity, size):
+  def process_statistics(self, key, entity, size, shard=None):
     """ Processes an entity and adds to the global statistics.
 
     Args:
       key: The key to the entity table.
       entity: EntityProto entity.
       size: A int of the size of the entity.
+      shard: The EntityShard to add the statistics to instead.
     Returns:
       True on success, False otherwise.
     """
@@ -691,6 +837,10 @@ class DatastoreGroomer(threading.Thread):
     if app_id in self.APPSCALE_APPLICATIONS:
       return True
 
+    if shard is not None:
+      shard.add_entity(app_id, kind, namespace, size)
+      return True
+
     self.initialize_kind(app_id, kind)
     self.initialize_namespace(app_id, namespace)
     self.namespace_info[app_id][namespace]['size'] += size
@@ -709,12 +859,13 @@ class DatastoreGroomer(threading.Thread):
     #TODO implement
     return True
 
-  def process_entity(self, entity):
+  def process_entity(self, entity, shard=None):
     """ Processes an entity by updating statistics, indexes, and removes
         tombstones.
 
     Args:
       entity: The entity to operate on.
+      shard: The EntityShard that the entity belongs to.
     Returns:
       True on success, False otherwise.
     """
@@ -726,7 +877,7 @@ class DatastoreGroomer(threading.Thread):
 
     ent_proto = entity_pb.EntityProto()
     ent_proto.ParseFromString(one_entity)
-    self.process_statistics(key, ent_proto, len(one_entity))
+    self.process_statistics(key, ent_proto, len(one_entity), shard)
 
     return True
 
@@ -739,8 +890,17 @@ class DatastoreGroomer(threading.Thread):
       number: The total number of entities in a namespace.
       timestamp: A datetime.datetime object.
     """
+    # Statistics are overwritten each time they are published.
+    if namespace:
+      stat_key = db.Key.from_path(stats.NamespaceStat.STORED_KIND_NAME,
+                                  namespace)
+    else:
+      stat_key = db.Key.from_path(stats.NamespaceStat.STORED_KIND_NAME,
+                                  metadata.Namespace.EMPTY_NAMESPACE_ID)
+
     entities_to_write = []
-    namespace_stat = stats.NamespaceStat(subject_namespace=namespace,
+    namespace_stat = stats.NamespaceStat(key=stat_key,
+                               subject_namespace=namespace,
                                bytes=size,
                                count=number,
                                timestamp=timestamp)
@@ -763,7 +923,8 @@ class DatastoreGroomer(threading.Thread):
       number: The total number of entities.
       timestamp: A datetime.datetime object.
     """
-    kind_stat = stats.KindStat(kind_name=kind,
+    kind_stat = stats.KindStat(key_name=kind,
+                               kind_name=kind,
                                bytes=size,
                                count=number,
                                timestamp=timestamp)
@@ -830,37 +991,323 @@ class DatastoreGroomer(threading.Thread):
     logger.info("Removed {0} task name entities".format(counter))
     return True
 
-  def clean_up_entities(self):
-    # If we have state information beyond what function to use,
-    # load the last seen key.
-    if (len(self.groomer_state) > 1 and
-      self.groomer_state[0] == self.CLEAN_ENTITIES_TASK):
-      last_key = self.groomer_state[1]
-    else:
-      last_key = ""
-    while True:
+  def create_entity_shards(self):
+    """ Divides the entity table into shards unless a previous pass that did
+    not finish already has. """
+    handle = self.zoo_keeper.handle
+    handle.ensure_path(self.SHARDS_PATH)
+    if handle.get_children(self.SHARDS_PATH):
+      logger.info('Resuming entity shards from a previous pass')
+      return
+
+    # The shards are created together so that a pass never resumes with only
+    # part of the table.
+    token_ranges = self.db_access.get_token_ranges()
+    transaction = handle.transaction()
+    for index, (start_key, end_key) in enumerate(token_ranges):
+      shard_path = '{}/{:05d}'.format(self.SHARDS_PATH, index)
+      transaction.create(shard_path, EntityShard(start_key, end_key).encode())
+
+    transaction.commit()
+    logger.info('Divided the entity table into {} shards'.format(
+      len(token_ranges)))
+
+  def get_entity_shards(self):
+    """ Fetches every shard of the current pass.
+
+    Returns:
+      A list of (path, EntityShard) tuples.
+    """
+    handle = self.zoo_keeper.handle
+    try:
+      shard_names = sorted(handle.get_children(self.SHARDS_PATH))
+    except NoNodeError:
+      return []
+
+    shards = []
+    for shard_name in shard_names:
+      shard_path = '/'.join([self.SHARDS_PATH, shard_name])
       try:
-        logger.debug('Fetching {} entities'.format(self.BATCH_SIZE))
-        entities = self.get_entity_batch(last_key)
+        data, _ = handle.get(shard_path)
+      except NoNodeError:
+        continue
+
+      shards.append((shard_path, EntityShard.decode(data)))
 
-        if not entities:
-          break
+    return shards
 
-        for entity in entities:
-          self.process_entity(entity)
+  def claim_shard(self, shard_path):
+    """ Tries to claim a shard for this worker.
 
-        last_key = entities[-1].keys()[0]
-        self.entities_checked += len(entities)
-        if time.time() > self.last_logged + self.LOG_PROGRESS_FREQUENCY:
-          logger.info('Checked {} entities'.format(self.entities_checked))
-          self.last_logged = time.time()
-        self.update_groomer_state([self.CLEAN_ENTITIES_TASK, last_key])
+    The claim is an ephemeral node, so the shard can be claimed again if the
+    worker's groomer stops.
+
+    Args:
+      shard_path: A string specifying the shard's ZooKeeper node.
+    Returns:
+      True if the shard was claimed, False otherwise.
+    """
+    try:
+      self.zoo_keeper.handle.create(shard_path + '/claim', ephemeral=True)
+    except (NodeExistsError, NoNodeError):
+      return False
+
+    return True
+
+  def release_shard(self, shard_path):
+    """ Releases a shard that this worker claimed.
+
+    Args:
+      shard_path: A string specifying the shard's ZooKeeper node.
+    """
+    try:
+      self.zoo_keeper.handle.delete(shard_path + '/claim')
+    except KazooException:
+      logger.exception('Unable to release {}'.format(shard_path))
+
+  def save_shard(self, shard_path, shard):
+    """ Persists a shard's progress.
+
+    Args:
+      shard_path: A string specifying the shard's ZooKeeper node.
+      shard: An EntityShard object.
+    """
+    # We don't want to crash the groomer if we can't update the state. The
+    # shard will be resumed from its last checkpoint instead.
+    try:
+      self.zoo_keeper.handle.set(shard_path, shard.encode())
+    except KazooException:
+      logger.exception('Unable to save progress for {}'.format(shard_path))
+
+  def record_progress(self, entities_checked):
+    """ Counts groomed entities and periodically logs the total.
+
+    Args:
+      entities_checked: The number of entities that were groomed.
+    """
+    with self.progress_lock:
+      self.entities_checked += entities_checked
+      if time.time() > self.last_logged + self.LOG_PROGRESS_FREQUENCY:
+        logger.info('Checked {} entities'.format(self.entities_checked))
+        self.last_logged = time.time()
+
+  def groom_shard(self, shard_path):
+    """ Processes the entities in a claimed shard.
+
+    Args:
+      shard_path: A string specifying the shard's ZooKeeper node.
+    """
+    data, _ = self.zoo_keeper.handle.get(shard_path)
+    shard = EntityShard.decode(data)
+    if shard.done:
+      return
+
+    pager = self.db_access.range_pager(
+      dbconstants.APP_ENTITY_TABLE, dbconstants.APP_ENTITY_SCHEMA,
+      shard.start_key, shard.end_key, self.BATCH_SIZE,
+      page_token=shard.last_key, start_inclusive=False)
+    last_saved = time.time()
+    while True:
+      try:
+        logger.debug('Fetching {} entities'.format(self.BATCH_SIZE))
+        entities = pager.next_page_sync()
       except datastore_errors.Error, error:
         logger.error("Error getting a batch: {0}".format(error))
         time.sleep(self.DB_ERROR_PERIOD)
+        continue
       except dbconstants.AppScaleDBConnectionError, connection_error:
         logger.error("Error getting a batch: {0}".format(connection_error))
         time.sleep(self.DB_ERROR_PERIOD)
+        continue
+
+      if not entities:
+        break
+
+      for entity in entities:
+        self.process_entity(entity, shard)
+
+      shard.last_key = entities[-1].keys()[0]
+      shard.entities_checked += len(entities)
+      self.record_progress(len(entities))
+      if time.time() > last_saved + self.SHARD_CHECKPOINT_PERIOD:
+        self.save_shard(shard_path, shard)
+        last_saved = time.time()
+
+    shard.done = True
+    self.save_shard(shard_path, shard)
+
+  def groom_available_shards(self):
+    """ Grooms shards until every shard is either finished or claimed. """
+    for shard_path, shard in self.get_entity_shards():
+      if shard.done or not self.claim_shard(shard_path):
+        continue
+
+      try:
+        self.groom_shard(shard_path)
+      finally:
+        self.release_shard(shard_path)
+
+  def run_shard_workers(self):
+    """ Grooms available shards with a pool of worker threads.
+
+    Raises:
+      An exception that stopped one of the workers.
+    """
+    failures = []
+
+    def work():
+      try:
+        self.groom_available_shards()
+      except Exception as error:
+        logger.exception('Unable to groom entity shards')
+        failures.append(error)
+
+    workers = [threading.Thread(target=work)
+               for _ in range(self.SHARD_WORKERS)]
+    for worker in workers:
+      worker.start()
+
+    # Statistics from the counters stay current while a pass is running.
+    while any(worker.is_alive() for worker in workers):
+      workers[0].join(self.STATS_PUBLISH_PERIOD)
+      workers = [worker for worker in workers if worker.is_alive()]
+      if workers:
+        self.publish_entity_stats()
+
+    if failures:
+      raise failures[0]
+
+  def assist_with_entity_shards(self):
+    """ Helps the groomer that holds the lock with its entity shards.
+
+    Returns:
+      A boolean indicating whether or not a pass had open shards.
+    """
+    if not any(not shard.done for _, shard in self.get_entity_shards()):
+      return False
+
+    logger.info('Assisting with entity shards')
+    self.db_access = appscale_datastore_batch.DatastoreFactory.getDatastore(
+      self.table_name)
+    try:
+      self.run_shard_workers()
+    except Exception:
+      logger.exception('Stopped assisting with entity shards')
+    finally:
+      del self.db_access
+
+    return True
+
+  def clean_up_entities(self):
+    """ Grooms every shard of the entity table and merges the statistics
+    from each shard. """
+    self.create_entity_shards()
+    while True:
+      self.run_shard_workers()
+      unfinished = [shard_path for shard_path, shard
+                    in self.get_entity_shards() if not shard.done]
+      if not unfinished:
+        break
+
+      # Other groomers are still working on these shards. If one of them
+      # stops, its shards can be claimed by the next round of workers.
+      logger.info('Waiting for {} shards'.format(len(unfinished)))
+      time.sleep(self.SHARD_POLL_PERIOD)
+
+    entities_checked = 0
+    for _, shard in self.get_entity_shards():
+      for app_id, kinds in shard.stats.iteritems():
+        for kind, totals in kinds.iteritems():
+          _add_counts(self.stats, app_id, kind, totals['size'],
+                      totals['number'])
+
+      for app_id, namespaces in shard.namespace_info.iteritems():
+        for namespace, totals in namespaces.iteritems():
+          _add_counts(self.namespace_info, app_id, namespace, totals['size'],
+                      totals['number'])
+
+      entities_checked += shard.entities_checked
+
+    logger.info('Checked {} entities'.format(entities_checked))
+    self.zoo_keeper.handle.delete(self.SHARDS_PATH, recursive=True)
+
+    try:
+      self.reconcile_entity_stats()
+    except dbconstants.AppScaleDBConnectionError:
+      logger.exception('Unable to reconcile entity statistics')
+
+  def reconcile_entity_stats(self):
+    """ Corrects the statistics counters with the totals from a full pass.
+
+    Writes that happen during a pass can leave small errors in the counters.
+    The next pass corrects them.
+    """
+    counters = self.db_access.get_entity_stats_sync()
+    totals = {}
+    for category, counts in [(StatCategories.KIND, self.stats),
+                             (StatCategories.NAMESPACE, self.namespace_info)]:
+      for app_id, names in counts.iteritems():
+        for name, entry in names.iteritems():
+          totals[(app_id, category, name)] = (entry['size'], entry['number'])
+
+    corrections = {}
+    for stat_key in set(totals) | set(counters):
+      size, number = totals.get(stat_key, (0, 0))
+      counted_size, counted_number = counters.get(stat_key, (0, 0))
+      if (size, number) != (counted_size, counted_number):
+        corrections[stat_key] = (size - counted_size, number - counted_number)
+
+    self.db_access.update_entity_stats_sync(corrections)
+    self.db_access.set_metadata_sync(
+      cassandra_interface.ENTITY_STATS_KEY,
+      cassandra_interface.EntityStatsStates.RECONCILED)
+    logger.info('Corrected {} entity statistics counters'.format(
+      len(corrections)))
+
+  def publish_entity_stats(self):
+    """ Writes statistics entities using the counters that the datastore
+    servers update. """
+    if not self.zoo_keeper.get_lock_with_path(self.STATS_LOCK_PATH):
+      return
+
+    db_access = getattr(self, 'db_access', None)
+    owns_db_access = db_access is None
+    try:
+      if owns_db_access:
+        db_access = appscale_datastore_batch.DatastoreFactory.getDatastore(
+          self.table_name)
+
+      # Until a full pass has reconciled them, the counters do not include
+      # entities that were written before they existed.
+      stats_state = db_access.get_metadata_sync(
+        cassandra_interface.ENTITY_STATS_KEY)
+      if stats_state != cassandra_interface.EntityStatsStates.RECONCILED:
+        return
+
+      counters = db_access.get_entity_stats_sync()
+      kind_stats = {}
+      namespace_info = {}
+      for (app_id, category, name), (size, number) in counters.iteritems():
+        if category == StatCategories.KIND:
+          counts = kind_stats
+        else:
+          counts = namespace_info
+
+        _add_counts(counts, app_id, name, max(size, 0), max(number, 0))
+
+      timestamp = datetime.datetime.utcnow()
+      self.update_statistics(timestamp, kind_stats)
+      self.update_namespaces(timestamp, namespace_info)
+    except dbconstants.AppScaleDBConnectionError:
+      logger.exception('Unable to publish entity statistics')
+    finally:
+      if owns_db_access and db_access is not None:
+        db_access.close()
+
+      try:
+        self.zoo_keeper.release_lock_with_path(self.STATS_LOCK_PATH)
+      except zk.ZKTransactionException as zk_exception:
+        logger.error('Unable to release zk lock {}.'.format(zk_exception))
 
   def register_db_accessor(self, app_id):
     """ Gets a distributed datastore object to interact with
@@ -950,20 +1397,25 @@ class DatastoreGroomer(threading.Thread):
         entity.delete()
       logger.debug("Done removing old stats for app {0}".format(app_id))
 
-  def update_namespaces(self, timestamp):
+  def update_namespaces(self, timestamp, namespace_info=None):
     """ Puts the namespace information into the datastore for applications to
         access.
 
     Args:
       timestamp: A datetime time stamp to know which stat items belong
         together.
+      namespace_info: The namespace statistics to use instead of the ones
+        from the last pass.
     """
-    for app_id in self.namespace_info.keys():
+    if namespace_info is None:
+      namespace_info = self.namespace_info
+
+    for app_id in namespace_info.keys():
       ds_distributed = self.register_db_accessor(app_id)
-      namespaces = self.namespace_info[app_id].keys()
+      namespaces = namespace_info[app_id].keys()
       for namespace in namespaces:
-        size = self.namespace_info[app_id][namespace]['size']
-        number = self.namespace_info[app_id][namespace]['number']
+        size = namespace_info[app_id][namespace]['size']
+        number = namespace_info[app_id][namespace]['number']
         try:
           self.create_namespace_entry(namespace, size, number, timestamp)
         except (datastore_errors.BadRequestError,
@@ -971,25 +1423,30 @@ class DatastoreGroomer(threading.Thread):
           logger.error('Unable to insert namespace info: {}'.format(error))
 
       logger.info("Namespace for {0} are {1}"\
-        .format(app_id, self.namespace_info[app_id]))
+        .format(app_id, namespace_info[app_id]))
       del ds_distributed
 
-  def update_statistics(self, timestamp):
+  def update_statistics(self, timestamp, stats=None):
     """ Puts the statistics into the datastore for applications
         to access.
 
     Args:
       timestamp: A datetime time stamp to know which stat items belong
         together.
+      stats: The kind statistics to use instead of the ones from the last
+        pass.
     """
-    for app_id in self.stats.keys():
+    if stats is None:
+      stats = self.stats
+
+    for app_id in stats.keys():
       ds_distributed = self.register_db_accessor(app_id)
       total_size = 0
       total_number = 0
-      kinds = self.stats[app_id].keys()
+      kinds = stats[app_id].keys()
       for kind in kinds:
-        size = self.stats[app_id][kind]['size']
-        number = self.stats[app_id][kind]['number']
+        size = stats[app_id][kind]['size']
+        number = stats[app_id][kind]['number']
         total_size += size
         total_number += number
         try:
@@ -1006,7 +1463,7 @@ class DatastoreGroomer(threading.Thread):
         logger.error('Unable to insert global stat: {}'.format(error))
 
       logger.info("Kind stats for {0} are {1}"\
-        .format(app_id, self.stats[app_id]))
+        .format(app_id, stats[app_id]))
       logger.info("Global stats for {0} are total size of {1} with " \
         "{2} entities".format(app_id, total_size, total_number))
       logger.info("Number of hard deletes: {0}".format(self.num_deletes))
@@ -1030,8 +1487,8 @@ class DatastoreGroomer(threading.Thread):
     self.groomer_state = state
 
   def run_groomer(self):
-    """ Runs the grooming process. Loops on the entire dataset sequentially
-        and updates stats, indexes, and transactions.
+    """ Runs the grooming process. Loops on the entire dataset in parallel
+        shards and updates stats, indexes, and transactions.
     """
     self.db_access = appscale_datastore_batch.DatastoreFactory.getDatastore(
       self.table_name)
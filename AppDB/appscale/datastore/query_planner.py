@@ -0,0 +1,148 @@
+""" Estimates query strategy costs and records how queries were run. """
+
+import sys
+import time
+from contextlib import contextmanager
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore.datastore_pb import Query_Filter
+
+# The fraction of a kind's entities assumed to match an equality filter.
+EQUALITY_SELECTIVITY = 0.1
+
+# The fraction of a kind's entities assumed to match an inequality filter.
+INEQUALITY_SELECTIVITY = 0.3
+
+# The number of entities assumed for kinds without statistics.
+DEFAULT_KIND_SIZE = 10000
+
+
+class Strategies(object):
+  """ The ways a query can be run. """
+  SINGLE_PROPERTY = 'single_property'
+  KIND = 'kind'
+  ZIGZAG_MERGE_JOIN = 'zigzag_merge_join'
+  COMPOSITE = 'composite'
+
+
+def filter_selectivity(filter_info):
+  """ Estimates the fraction of entities that match a query's filters.
+
+  Args:
+    filter_info: A dictionary mapping property names to lists of
+      (operator, value) tuples.
+  Returns:
+    A float between 0 and 1.
+  """
+  selectivity = 1.0
+  for prop_name, filters in filter_info.iteritems():
+    if prop_name == '__key__':
+      continue
+
+    if any(op == Query_Filter.EQUAL for op, _ in filters):
+      selectivity *= EQUALITY_SELECTIVITY
+    elif filters:
+      selectivity *= INEQUALITY_SELECTIVITY
+
+  return selectivity
+
+
+def estimate_cost(strategy, filter_info, entity_count, limit):
+  """ Estimates the number of rows a strategy reads to satisfy a query.
+
+  Args:
+    strategy: A string specifying a strategy from Strategies.
+    filter_info: A dictionary mapping property names to lists of
+      (operator, value) tuples.
+    entity_count: The number of entities of the query's kind or None if it
+      is not known.
+    limit: The number of results the query needs.
+  Returns:
+    A float specifying the combined number of index rows and entities read.
+  """
+  if entity_count is None:
+    entity_count = DEFAULT_KIND_SIZE
+
+  matches = min(entity_count * filter_selectivity(filter_info), limit)
+  if strategy != Strategies.ZIGZAG_MERGE_JOIN:
+    # One index entry is read for each entity that is fetched.
+    return 2 * matches
+
+  # Each range has to be read until enough entities are common to all ranges.
+  equality_props = [prop_name for prop_name in filter_info
+                    if prop_name != '__key__']
+  per_range = min(entity_count * EQUALITY_SELECTIVITY,
+                  limit / EQUALITY_SELECTIVITY ** (len(equality_props) - 1))
+  return len(equality_props) * per_range + matches
+
+
+class QueryPlan(object):
+  """ Describes how a query was run. """
+  def __init__(self):
+    """ Creates a new QueryPlan. """
+    # The strategy that produced the results.
+    self.strategy = None
+
+    # The entity count the estimates were based on.
+    self.entity_count = None
+
+    # A list of (strategy, estimated cost) tuples in the order they were tried.
+    self.estimates = []
+
+    self.index_rows_read = 0
+    self.entities_fetched = 0
+
+    # A list of (phase name, seconds) tuples.
+    self.phases = []
+
+  def order_strategies(self, candidates, filter_info, limit):
+    """ Sorts strategies by their estimated cost.
+
+    Strategies with the same cost keep their original order.
+
+    Args:
+      candidates: A list of strategy names.
+      filter_info: A dictionary mapping property names to lists of
+        (operator, value) tuples.
+      limit: The number of results the query needs.
+    Returns:
+      A list of strategy names.
+    """
+    self.estimates = [
+      (strategy,
+       estimate_cost(strategy, filter_info, self.entity_count, limit))
+      for strategy in candidates]
+    self.estimates.sort(key=lambda estimate: estimate[1])
+    return [strategy for strategy, _ in self.estimates]
+
+  @contextmanager
+  def phase(self, name):
+    """ Records the time spent in a block.
+
+    Args:
+      name: A string specifying the phase.
+    """
+    start = time.time()
+    try:
+      yield
+    finally:
+      self.phases.append((name, time.time() - start))
+
+  def explain(self):
+    """ Summarizes the plan.
+
+    Returns:
+      A JSON-serializable dictionary.
+    """
+    return {
+      'strategy': self.strategy,
+      'entity_count': self.entity_count,
+      'estimates': [{'strategy': strategy, 'cost': cost}
+                    for strategy, cost in self.estimates],
+      'index_rows_read': self.index_rows_read,
+      'entities_fetched': self.entities_fetched,
+      'phases': [{'name': name, 'seconds': round(seconds, 6)}
+                 for name, seconds in self.phases]
+    }
@@ -1,5 +1,6 @@
 """ Iterates through a range of index entries. """
 
+import bisect
 import sys
 from collections import namedtuple
 
@@ -18,6 +19,10 @@ from google.appengine.datastore.datastore_pb import Path, Query_Filter
 IndexEntry = namedtuple('IndexEntry',
                         ['encoded_path', 'entity_reference', 'key', 'path'])
 
+# An index entry whose path has not been decoded.
+EncodedEntry = namedtuple('EncodedEntry',
+                          ['encoded_path', 'entity_reference', 'key'])
+
 
 class Cursor(object):
   """ Represents a position within a range. """
@@ -69,8 +74,13 @@ class RangeIterator(object):
     self._cursor = Cursor(self.prefix, inclusive=True)
 
     self._cache = []
+    self._encoded_cache = None
+    self._cache_keys = []
     self._index_exhausted = False
 
+    # The number of index entries fetched from the database.
+    self.rows_read = 0
+
   @property
   def prefix(self):
     """ The encoded reference without the path element. """
@@ -97,13 +107,7 @@ class RangeIterator(object):
       if self._index_exhausted:
         raise RangeExhausted()
 
-    self._cache = yield self._db.range_query(
-      ASC_PROPERTY_TABLE, PROPERTY_SCHEMA, self._cursor.key, self._range[-1],
-      self.CHUNK_SIZE, start_inclusive=self._cursor.inclusive)
-
-    if len(self._cache) < self.CHUNK_SIZE:
-      self._index_exhausted = True
-
+    yield self._fetch_chunk()
     if not self._cache:
       raise RangeExhausted()
 
@@ -111,6 +115,28 @@ class RangeIterator(object):
     self._cursor = Cursor(entry.key, inclusive=False)
     raise gen.Return(entry)
 
+  @gen.coroutine
+  def async_next_block(self):
+    """ Retrieves the fetched index entries that come after the cursor.
+
+    A new chunk is only fetched when none of the fetched entries come after
+    the cursor. The cursor is not moved.
+
+    Returns:
+      A list of EncodedEntry objects.
+    Raises:
+      RangeExhausted when there are no more entries in the range.
+    """
+    block = self._block_from_cache()
+    if not block and not self._index_exhausted:
+      yield self._fetch_chunk()
+      block = self._block_from_cache()
+
+    if not block:
+      raise RangeExhausted()
+
+    raise gen.Return(block)
+
   @classmethod
   def from_filter(cls, db, project_id, namespace, kind, pb_filter):
     """ Creates a new RangeIterator from a filter.
@@ -179,8 +205,20 @@ class RangeIterator(object):
     Raises:
       BadRequest if unable to set the cursor to the given path.
     """
+    self.set_encoded_cursor(str(encode_index_pb(path)), inclusive)
+
+  def set_encoded_cursor(self, encoded_path, inclusive):
+    """ Changes the range's cursor position.
+
+    Args:
+      encoded_path: A string specifying an encoded entity path.
+      inclusive: A boolean specifying that the next result can include the
+        given path.
+    Raises:
+      BadRequest if unable to set the cursor to the given path.
+    """
     range_start, range_end = self._range
-    cursor = Cursor(self.prefix + str(encode_index_pb(path)), inclusive)
+    cursor = Cursor(self.prefix + encoded_path, inclusive)
 
     if cursor.key < self._cursor.key:
       raise BadRequest(
@@ -209,6 +247,43 @@ class RangeIterator(object):
     self._range = (start_key, end_key)
     self._cursor.key = max(start_key, self._cursor.key)
 
+  @gen.coroutine
+  def _fetch_chunk(self):
+    """ Fetches the next chunk of index entries after the cursor. """
+    self._cache = yield self._db.range_query(
+      ASC_PROPERTY_TABLE, PROPERTY_SCHEMA, self._cursor.key, self._range[-1],
+      self.CHUNK_SIZE, start_inclusive=self._cursor.inclusive)
+    self._encoded_cache = None
+    self.rows_read += len(self._cache)
+
+    if len(self._cache) < self.CHUNK_SIZE:
+      self._index_exhausted = True
+
+  def _block_from_cache(self):
+    """ Retrieves the cached entries that come after the cursor.
+
+    Returns:
+      A list of EncodedEntry objects.
+    """
+    if self._encoded_cache is None:
+      # Each cached result is only split once no matter how often the cache
+      # is searched.
+      self._encoded_cache = []
+      for result in self._cache:
+        entry_key = result.keys()[0]
+        self._encoded_cache.append(EncodedEntry(
+          entry_key.rsplit(KEY_DELIMITER)[-1], result.values()[0]['reference'],
+          entry_key))
+
+      self._cache_keys = [entry.key for entry in self._encoded_cache]
+
+    if self._cursor.inclusive:
+      start = bisect.bisect_left(self._cache_keys, self._cursor.key)
+    else:
+      start = bisect.bisect_right(self._cache_keys, self._cursor.key)
+
+    return self._encoded_cache[start:]
+
   def _next_from_cache(self):
     """ Retrieves the next index entry from the cache.
 
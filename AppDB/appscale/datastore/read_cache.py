@@ -0,0 +1,93 @@
+""" Caches entity table reads for the duration of a single request. """
+
+from tornado import gen
+
+from appscale.datastore.dbconstants import APP_ENTITY_SCHEMA, APP_ENTITY_TABLE
+
+
+class EntityReadCache(object):
+  """ A read-through cache in front of entity table lookups.
+
+  A cache should only live as long as the request that created it. It does
+  not observe writes from other requests, so it must not be shared.
+  """
+  def __init__(self, db):
+    """ Creates a new EntityReadCache.
+
+    Args:
+      db: A database interface object.
+    """
+    self._db = db
+
+    # Maps entity table keys to the columns that were fetched for them.
+    self._rows = {}
+
+    # Maps entity table keys to futures for fetches that have not finished.
+    self._in_flight = {}
+
+    # The number of rows that were read from the database.
+    self.rows_fetched = 0
+
+  @gen.coroutine
+  def get(self, row_keys):
+    """ Fetches entity table rows, only reading keys that were not cached.
+
+    Args:
+      row_keys: A list of entity table keys.
+    Returns:
+      A dictionary mapping each key to a dictionary of its columns. Rows that
+      do not exist map to an empty dictionary.
+    """
+    results = {}
+    pending = {}
+    to_fetch = []
+    for row_key in set(row_keys):
+      if row_key in self._rows:
+        results[row_key] = self._rows[row_key]
+      elif row_key in self._in_flight:
+        pending[row_key] = self._in_flight[row_key]
+      else:
+        to_fetch.append(row_key)
+
+    if to_fetch:
+      future = self._db.batch_get_entity(APP_ENTITY_TABLE, to_fetch,
+                                         APP_ENTITY_SCHEMA)
+      self.rows_fetched += len(to_fetch)
+      for row_key in to_fetch:
+        self._in_flight[row_key] = future
+        pending[row_key] = future
+
+    for row_key, future in pending.iteritems():
+      try:
+        fetched = yield future
+      except Exception:
+        # Every key that shared the failed fetch should be fetched again by
+        # the next read.
+        failed = [key for key, in_flight in self._in_flight.iteritems()
+                  if in_flight is future]
+        for key in failed:
+          del self._in_flight[key]
+
+        raise
+
+      # A key that was invalidated while the fetch was in flight is no longer
+      # owned by this fetch.
+      owned = self._in_flight.get(row_key) is future
+      if owned:
+        del self._in_flight[row_key]
+
+      results[row_key] = fetched.get(row_key, {})
+      if owned:
+        self._rows[row_key] = results[row_key]
+
+    raise gen.Return(results)
+
+  def invalidate(self, row_keys):
+    """ Removes rows that the request has modified.
+
+    Args:
+      row_keys: An iterable containing entity table keys.
+    """
+    for row_key in row_keys:
+      self._rows.pop(row_key, None)
+      self._in_flight.pop(row_key, None)
@@ -10,8 +10,10 @@ import json
 import logging
 import os
 import sys
+import tempfile
 import time
 import tornado.httpserver
+import tornado.process
 import tornado.web
 
 from appscale.common import appscale_info
@@ -22,12 +24,13 @@ from kazoo.client import KazooState
 from kazoo.exceptions import NodeExistsError
 from tornado import gen
 from tornado.httpclient import AsyncHTTPClient
-from tornado.ioloop import IOLoop
+from tornado.ioloop import IOLoop, PeriodicCallback
 from tornado.options import options
 from .. import dbconstants
 from ..appscale_datastore_batch import DatastoreFactory
 from ..datastore_distributed import DatastoreDistributed
 from ..index_manager import IndexManager
+from ..query_planner import QueryPlan
 from ..utils import (clean_app_id,
                      logger,
                      UnprocessedQueryResult)
@@ -62,9 +65,36 @@ READ_ONLY = False
 # Global stats.
 STATS = {}
 
+# The index of this worker process, or None when running a single process.
+worker_id = None
+
+# The number of worker processes that share the server port.
+worker_count = 1
+
+# The time this worker last cleared its stats.
+stats_cleared = 0
+
+# The directory where worker processes share their stats.
+WORKER_STATS_DIR = os.path.join(tempfile.gettempdir(), 'appscale-datastore')
+
+# The number of seconds between each worker publishing its stats.
+WORKER_STATS_INTERVAL = 5
+
+# The stats response key that holds request counters.
+REQUESTS_KEY = 'requests'
+
+# The stats response key that holds prepared statement registry counters.
+PREPARED_STATEMENTS_KEY = 'prepared_statements'
+
 # The ZooKeeper path where a list of active datastore servers is stored.
 DATASTORE_SERVERS_NODE = '/appscale/datastore/servers'
 
+# The request header that asks for a description of how a query was run.
+EXPLAIN_HEADER = 'X-Appscale-Explain'
+
+# The response header that contains the JSON-encoded query plan.
+QUERY_PLAN_HEADER = 'X-Appscale-Query-Plan'
+
 
 class ClearHandler(tornado.web.RequestHandler):
   """ Defines what to do when the webserver receives a /clear HTTP request. """
@@ -75,8 +105,15 @@ class ClearHandler(tornado.web.RequestHandler):
   @tornado.web.asynchronous
   def post(self):
     """ Handles POST requests for clearing datastore server stats. """
-    global STATS
-    STATS = {}
+    clear_stats()
+    if worker_id is not None:
+      # Other workers clear their stats the next time they publish them.
+      marker = clear_marker_path(options.port)
+      with open(marker + '.tmp', 'w') as marker_file:
+        marker_file.write(repr(stats_cleared))
+
+      os.rename(marker + '.tmp', marker)
+
     self.write({"message": "Statistics for this server cleared."})
     self.finish()
 
@@ -180,7 +217,7 @@ class MainHandler(tornado.web.RequestHandler):
     """ Handles get request for the web server. Returns that it is currently
         up in json.
     """
-    self.write(json.dumps(STATS))
+    self.write(json.dumps(combined_stats()))
     self.finish()
 
   @gen.coroutine
@@ -388,8 +425,9 @@ class MainHandler(tornado.web.RequestHandler):
     global datastore_access
     query = datastore_pb.Query(http_request_data)
     clone_qr_pb = UnprocessedQueryResult()
+    plan = QueryPlan()
     try:
-      yield datastore_access._dynamic_run_query(query, clone_qr_pb)
+      yield datastore_access._dynamic_run_query(query, clone_qr_pb, plan)
     except dbconstants.BadRequest as error:
       raise gen.Return( ('', datastore_pb.Error.BAD_REQUEST, str(error)))
     except zktransaction.ZKBadRequest as error:
@@ -409,6 +447,10 @@ class MainHandler(tornado.web.RequestHandler):
     except dbconstants.NeedsIndex as error:
       raise gen.Return(('', datastore_pb.Error.NEED_INDEX, str(error)))
 
+    logger.debug('Query plan: {}'.format(plan.explain()))
+    if self.request.headers.get(EXPLAIN_HEADER):
+      self.set_header(QUERY_PLAN_HEADER, json.dumps(plan.explain()))
+
     raise gen.Return((clone_qr_pb.Encode(), 0, ''))
 
   @gen.coroutine
@@ -785,6 +827,158 @@ class MainHandler(tornado.web.RequestHandler):
          'Datastore connection error when adding transaction tasks.'))
 
 
+def clear_stats():
+  """ Resets this worker's request stats. """
+  global STATS
+  global stats_cleared
+  STATS = {}
+  stats_cleared = time.time()
+
+
+def worker_stats_path(port, worker):
+  """ Determines where a worker publishes its stats.
+
+  Args:
+    port: An integer specifying the server port.
+    worker: An integer specifying the worker index.
+  Returns:
+    A string specifying a file path.
+  """
+  return os.path.join(WORKER_STATS_DIR, '{}-{}.json'.format(port, worker))
+
+
+def clear_marker_path(port):
+  """ Determines the location of the file that records when stats were last
+  cleared for a server port.
+
+  Args:
+    port: An integer specifying the server port.
+  Returns:
+    A string specifying a file path.
+  """
+  return os.path.join(WORKER_STATS_DIR, '{}.cleared'.format(port))
+
+
+def reset_worker_stats(port):
+  """ Removes the stats that workers from a previous run published.
+
+  Args:
+    port: An integer specifying the server port.
+  """
+  if not os.path.isdir(WORKER_STATS_DIR):
+    os.makedirs(WORKER_STATS_DIR)
+    return
+
+  # Other servers on this machine share the directory.
+  prefix = '{}-'.format(port)
+  for file_name in os.listdir(WORKER_STATS_DIR):
+    path = os.path.join(WORKER_STATS_DIR, file_name)
+    if file_name.startswith(prefix) or path == clear_marker_path(port):
+      os.remove(path)
+
+
+def merge_stats(combined, stats):
+  """ Adds request stats to a combined set.
+
+  Args:
+    combined: A dictionary mapping methods to dictionaries of error codes and
+      (count, total time) tuples.
+    stats: A dictionary in the same format.
+  """
+  for method, errcodes in stats.iteritems():
+    method_stats = combined.setdefault(method, {})
+    for errcode, (count, time_taken) in errcodes.iteritems():
+      prev_count, prev_time = method_stats.get(str(errcode), (0, 0))
+      method_stats[str(errcode)] = (prev_count + count, prev_time + time_taken)
+
+
+def merge_counters(combined, counters):
+  """ Adds a set of counters to a combined set.
+
+  Args:
+    combined: A dictionary mapping counter names to integers.
+    counters: A dictionary in the same format.
+  """
+  for name, value in counters.iteritems():
+    combined[name] = combined.get(name, 0) + value
+
+
+def prepared_statement_stats():
+  """ Fetches this worker's prepared statement registry counters.
+
+  Returns:
+    A dictionary mapping counter names to integers.
+  """
+  try:
+    return datastore_access.datastore_batch.prepared_statement_stats()
+  except AttributeError:
+    # The server has not started yet, or the backend has no registry.
+    return {}
+
+
+def worker_stats():
+  """ Collects the stats that this worker shares with other workers.
+
+  Returns:
+    A dictionary containing request stats and prepared statement counters.
+  """
+  return {REQUESTS_KEY: STATS,
+          PREPARED_STATEMENTS_KEY: prepared_statement_stats()}
+
+
+def combined_stats():
+  """ Fetches the stats for every worker sharing the server port.
+
+  Stats from other workers are up to WORKER_STATS_INTERVAL seconds old.
+
+  Returns:
+    A dictionary in the same format as worker_stats. The REQUESTS_KEY entry
+    maps methods to dictionaries of error codes and (count, total time)
+    tuples. The PREPARED_STATEMENTS_KEY entry contains the prepared statement
+    registry counters.
+  """
+  requests = {}
+  prepared_statements = {}
+  merge_stats(requests, STATS)
+  merge_counters(prepared_statements, prepared_statement_stats())
+  if worker_id is not None:
+    for worker in range(worker_count):
+      if worker == worker_id:
+        continue
+
+      try:
+        with open(worker_stats_path(options.port, worker)) as stats_file:
+          stats = json.load(stats_file)
+      except (IOError, ValueError):
+        # The worker may not have published its stats yet.
+        continue
+
+      merge_stats(requests, stats[REQUESTS_KEY])
+      merge_counters(prepared_statements, stats[PREPARED_STATEMENTS_KEY])
+
+  return {REQUESTS_KEY: requests,
+          PREPARED_STATEMENTS_KEY: prepared_statements}
+
+
+def publish_stats():
+  """ Writes this worker's stats where other workers can read them. """
+  try:
+    with open(clear_marker_path(options.port)) as marker_file:
+      last_cleared = float(marker_file.read())
+  except (IOError, ValueError):
+    last_cleared = 0
+
+  if last_cleared > stats_cleared:
+    clear_stats()
+
+  stats_path = worker_stats_path(options.port, worker_id)
+  with open(stats_path + '.tmp', 'w') as stats_file:
+    json.dump(worker_stats(), stats_file)
+
+  # Renaming ensures that readers never see a partially-written file.
+  os.rename(stats_path + '.tmp', stats_path)
+
+
 def create_server_node():
   """ Creates a server registration entry in ZooKeeper. """
   try:
@@ -848,6 +1042,8 @@ def main():
 
   global datastore_access
   global server_node
+  global worker_count
+  global worker_id
   global zookeeper
   zookeeper_locations = appscale_info.get_zk_locations_string()
 
@@ -860,6 +1056,8 @@ def main():
                       help='Datastore server port')
   parser.add_argument('-v', '--verbose', action='store_true',
                       help='Output debug-level logging')
+  parser.add_argument('-w', '--workers', type=int, default=1,
+                      help='The number of processes that share the port')
   args = parser.parse_args()
 
   if args.verbose:
@@ -872,17 +1070,28 @@ def main():
   server_node = '{}/{}:{}'.format(DATASTORE_SERVERS_NODE, options.private_ip,
                                   options.port)
 
+  if args.workers > 1:
+    # Each worker needs its own database and ZooKeeper connections, so the
+    # processes are forked before any are created.
+    reset_worker_stats(options.port)
+
+    worker_count = args.workers
+    worker_id = tornado.process.fork_processes(worker_count)
+
   datastore_batch = DatastoreFactory.getDatastore(
     args.type, log_level=logger.getEffectiveLevel())
   zookeeper = zktransaction.ZKTransaction(
     host=zookeeper_locations, db_access=datastore_batch,
     log_level=logger.getEffectiveLevel())
 
-  zookeeper.handle.add_listener(zk_state_listener)
   zookeeper.handle.ensure_path(DATASTORE_SERVERS_NODE)
-  # Since the client was started before adding the listener, make sure the
-  # server node gets created.
-  zk_state_listener(zookeeper.handle.state)
+  # The workers sharing a port are registered as a single server.
+  if worker_id in (None, 0):
+    zookeeper.handle.add_listener(zk_state_listener)
+    # Since the client was started before adding the listener, make sure the
+    # server node gets created.
+    zk_state_listener(zookeeper.handle.state)
+
   zookeeper.handle.ChildrenWatch(DATASTORE_SERVERS_NODE, update_servers_watch)
 
   transaction_manager = TransactionManager(zookeeper.handle)
@@ -893,8 +1102,16 @@ def main():
   index_manager = IndexManager(zookeeper.handle, datastore_access,
                                perform_admin=True)
   datastore_access.index_manager = index_manager
+  datastore_access.stats_buffer.start()
 
   server = tornado.httpserver.HTTPServer(pb_application)
-  server.listen(args.port)
+  if worker_id is None:
+    server.listen(args.port)
+  else:
+    # Each worker has its own socket, and the kernel balances connections
+    # between them.
+    server.bind(args.port, reuse_port=True)
+    server.start()
+    PeriodicCallback(publish_stats, WORKER_STATS_INTERVAL * 1000).start()
 
   IOLoop.current().start()
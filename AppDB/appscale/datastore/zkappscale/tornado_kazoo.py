@@ -533,6 +533,19 @@ class TornadoKazoo(object):
     zk_future.rawlink(tornado_future.handle_zk_result)
     return tornado_future
 
+  def commit(self, transaction):
+    """ Commits a set of operations atomically.
+
+    Args:
+      transaction: A kazoo TransactionRequest.
+    Returns:
+      A TornadoKazooFuture.
+    """
+    tornado_future = TornadoKazooFuture()
+    zk_future = transaction.commit_async()
+    zk_future.rawlink(tornado_future.handle_zk_result)
+    return tornado_future
+
   @staticmethod
   def _wrap_in_io_loop(watch):
     """ Returns a function that runs the given function in the main IO loop.
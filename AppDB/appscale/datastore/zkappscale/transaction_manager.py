@@ -7,6 +7,7 @@ import time
 
 from kazoo.exceptions import KazooException
 from kazoo.exceptions import NodeExistsError
+from tornado import gen
 from tornado.ioloop import IOLoop
 
 from appscale.common.async_retrying import retry_children_watch_coroutine
@@ -15,6 +16,7 @@ from .constants import COUNTER_NODE_PREFIX
 from .constants import MAX_SEQUENCE_COUNTER
 from .constants import OFFSET_NODE
 from .entity_lock import zk_group_path
+from .tornado_kazoo import TornadoKazoo
 from ..dbconstants import BadRequest
 from ..dbconstants import InternalError
 
@@ -26,6 +28,10 @@ XG_PREFIX = 'xg'
 
 class ProjectTransactionManager(object):
   """ Generates and keeps track of transaction IDs for a project. """
+
+  # The maximum number of counter nodes to create in one ZooKeeper request.
+  MAX_COUNTER_BATCH = 100
+
   def __init__(self, project_id, zk_client):
     """ Creates a new ProjectTransactionManager.
 
@@ -34,6 +40,10 @@ class ProjectTransactionManager(object):
     """
     self.project_id = project_id
     self.zk_client = zk_client
+    self._tornado_zk = TornadoKazoo(self.zk_client)
+
+    # Futures for new counter nodes that have not been requested yet.
+    self._pending_counters = []
 
     self._project_node = '/appscale/apps/{}'.format(self.project_id)
 
@@ -52,7 +62,57 @@ class ProjectTransactionManager(object):
     # Containers that do not need to be checked for open transactions.
     self._inactive_containers = set()
 
+  @gen.coroutine
   def create_transaction_id(self, xg):
+    """ Generates a new transaction ID without blocking the IOLoop.
+
+    The counter nodes for IDs requested during the same IOLoop iteration are
+    created with a single ZooKeeper request.
+
+    Args:
+      xg: A boolean indicating a cross-group transaction.
+    Returns:
+      An integer specifying the created transaction ID.
+    Raises:
+      InternalError if unable to create a new transaction ID.
+    """
+    current_time = time.time()
+    counter_future = gen.Future()
+    self._pending_counters.append(counter_future)
+    if len(self._pending_counters) == 1:
+      IOLoop.current().add_callback(self._create_pending_counters)
+
+    new_path = yield counter_future
+    counter = int(new_path.split('/')[-1].lstrip(COUNTER_NODE_PREFIX))
+
+    if counter < 0:
+      logger.debug('Removing invalid counter')
+      yield self._delete_counter_async(new_path)
+      container_path = new_path.rsplit('/', 1)[0]
+      yield self._update_auto_offset_async(container_path)
+      txid = yield self.create_transaction_id(xg)
+      raise gen.Return(txid)
+
+    txid = self._txid_manual_offset + self._txid_automatic_offset + counter
+
+    if txid == 0:
+      yield self._delete_counter_async(new_path)
+      txid = yield self.create_transaction_id(xg)
+      raise gen.Return(txid)
+
+    if xg:
+      xg_path = '/'.join([new_path, XG_PREFIX])
+      try:
+        yield self._tornado_zk.create(xg_path, value=str(current_time))
+      except KazooException:
+        message = 'Unable to create new cross-group transaction ID'
+        logger.exception(message)
+        raise InternalError(message)
+
+    self._last_txid_created = txid
+    raise gen.Return(txid)
+
+  def create_transaction_id_sync(self, xg):
     """ Generates a new transaction ID.
 
     Args:
@@ -78,13 +138,13 @@ class ProjectTransactionManager(object):
       logger.debug('Removing invalid counter')
       self._delete_counter(new_path)
       self._update_auto_offset()
-      return self.create_transaction_id(xg)
+      return self.create_transaction_id_sync(xg)
 
     txid = self._txid_manual_offset + self._txid_automatic_offset + counter
 
     if txid == 0:
       self._delete_counter(new_path)
-      return self.create_transaction_id(xg)
+      return self.create_transaction_id_sync(xg)
 
     if xg:
       xg_path = '/'.join([new_path, XG_PREFIX])
@@ -158,6 +218,42 @@ class ProjectTransactionManager(object):
       logger.exception(message)
       raise InternalError(message)
 
+  def _create_pending_counters(self):
+    """ Requests counter nodes for the waiting transaction ID requests. """
+    pending = self._pending_counters
+    self._pending_counters = []
+    for index in range(0, len(pending), self.MAX_COUNTER_BATCH):
+      IOLoop.current().spawn_callback(
+        self._create_counters, pending[index:index + self.MAX_COUNTER_BATCH])
+
+  @gen.coroutine
+  def _create_counters(self, counter_futures):
+    """ Creates counter nodes in a single ZooKeeper request.
+
+    Args:
+      counter_futures: A list of futures to resolve with the new node paths.
+    """
+    counter_path_prefix = '/'.join([self._counter_path, COUNTER_NODE_PREFIX])
+    transaction = self.zk_client.transaction()
+    current_time = time.time()
+    for _ in counter_futures:
+      transaction.create(counter_path_prefix, value=str(current_time),
+                         sequence=True)
+
+    try:
+      new_paths = yield self._tornado_zk.commit(transaction)
+    except KazooException:
+      new_paths = [None] * len(counter_futures)
+
+    for counter_future, new_path in zip(counter_futures, new_paths):
+      if isinstance(new_path, basestring):
+        counter_future.set_result(new_path)
+        continue
+
+      message = 'Unable to create new transaction ID'
+      logger.error('{}: {}'.format(message, new_path))
+      counter_future.set_exception(InternalError(message))
+
   def _delete_counter(self, path):
     """ Removes a counter node.
 
@@ -170,6 +266,19 @@ class ProjectTransactionManager(object):
       # Let the transaction groomer clean it up.
       logger.exception('Unable to delete counter')
 
+  @gen.coroutine
+  def _delete_counter_async(self, path):
+    """ Removes a counter node that does not have any children.
+
+    Args:
+      path: A string specifying a ZooKeeper path.
+    """
+    try:
+      yield self._tornado_zk.delete(path)
+    except KazooException:
+      # Let the transaction groomer clean it up.
+      logger.exception('Unable to delete counter')
+
   def _active_containers(self):
     """ Determines the containers that need to be checked for transactions.
 
@@ -209,12 +318,57 @@ class ProjectTransactionManager(object):
     node_name = COUNTER_NODE_PREFIX + str(counter_value).zfill(10)
     return '/'.join([container_path, node_name])
 
-  def _update_auto_offset(self):
-    """ Ensures there is a usable sequence container. """
-    container_name = self._counter_path.split('/')[-1]
+  def _next_container_path(self, container_path):
+    """ Determines the path of the container that follows a given one.
+
+    Args:
+      container_path: A string specifying a container's ZooKeeper path.
+    Returns:
+      A string specifying a ZooKeeper path.
+    """
+    container_name = container_path.split('/')[-1]
     container_count = int(container_name[len(CONTAINER_PREFIX):] or 1)
     next_node = CONTAINER_PREFIX + str(container_count + 1)
-    next_path = '/'.join([self._project_node, next_node])
+    return '/'.join([self._project_node, next_node])
+
+  @gen.coroutine
+  def _update_auto_offset_async(self, exhausted_path):
+    """ Ensures there is a usable sequence container without blocking the
+    IOLoop.
+
+    Args:
+      exhausted_path: A string specifying the path of the container that ran
+        out of counters.
+    Raises:
+      InternalError if unable to move to a new container.
+    """
+    # Other requests from the same batch may have already moved on.
+    if exhausted_path != self._counter_path:
+      return
+
+    next_path = self._next_container_path(exhausted_path)
+    try:
+      yield self._tornado_zk.create(next_path)
+    except NodeExistsError:
+      # Another process may have already created the new counter.
+      pass
+    except KazooException:
+      message = 'Unable to create transaction ID counter'
+      logger.exception(message)
+      raise InternalError(message)
+
+    try:
+      node_list = yield self._tornado_zk.get_children(self._project_node)
+    except KazooException:
+      message = 'Unable to find transaction ID counter'
+      logger.exception(message)
+      raise InternalError(message)
+
+    self._update_project_sync(node_list)
+
+  def _update_auto_offset(self):
+    """ Ensures there is a usable sequence container. """
+    next_path = self._next_container_path(self._counter_path)
 
     try:
       self.zk_client.create(next_path)
@@ -279,7 +433,28 @@ class TransactionManager(object):
 
     self.zk_client.ChildrenWatch('/appscale/projects', self._update_projects)
 
+  @gen.coroutine
   def create_transaction_id(self, project_id, xg=False):
+    """ Generates a new transaction ID without blocking the IOLoop.
+
+    Args:
+      project_id: A string specifying a project ID.
+      xg: A boolean indicating a cross-group transaction.
+    Returns:
+      An integer specifying the created transaction ID.
+    Raises:
+      BadRequest if the project does not exist.
+      InternalError if unable to create a new transaction ID.
+    """
+    try:
+      project_tx_manager = self.projects[project_id]
+    except KeyError:
+      raise BadRequest('The project {} was not found'.format(project_id))
+
+    txid = yield project_tx_manager.create_transaction_id(xg)
+    raise gen.Return(txid)
+
+  def create_transaction_id_sync(self, project_id, xg=False):
     """ Generates a new transaction ID.
 
     Args:
@@ -296,7 +471,7 @@ class TransactionManager(object):
     except KeyError:
       raise BadRequest('The project {} was not found'.format(project_id))
 
-    return project_tx_manager.create_transaction_id(xg)
+    return project_tx_manager.create_transaction_id_sync(xg)
 
   def delete_transaction_id(self, project_id, txid):
     """ Removes a transaction ID from the list of active transactions.
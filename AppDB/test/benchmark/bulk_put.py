@@ -0,0 +1,157 @@
+""" Compares bulk put throughput with and without concurrent group commits.
+
+Each entity is in its own entity group. Writing one group at a time takes a
+lock, a read, and a batch round trip for every group. Writing groups in
+chunks shares those round trips across the chunk and applies the group
+batches concurrently. Every database and ZooKeeper call waits for a simulated
+round trip.
+
+Usage: python bulk_put.py [--entities N] [--latency SECONDS]
+"""
+
+import argparse
+import sys
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.datastore_distributed import DatastoreDistributed
+from appscale.datastore.zkappscale import entity_lock
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import entity_pb
+
+
+class SimulatedDatastore(object):
+  """ Accepts reads and batches after a delay. """
+  def __init__(self, latency):
+    self.latency = latency
+    self.round_trips = 0
+
+  def valid_data_version_sync(self):
+    return True
+
+  @gen.coroutine
+  def batch_get_entity(self, table, keys, schema):
+    self.round_trips += 1
+    yield gen.sleep(self.latency)
+    raise gen.Return({key: {} for key in keys})
+
+  @gen.coroutine
+  def normal_batch(self, mutations, txid):
+    self.round_trips += 1
+    yield gen.sleep(self.latency)
+
+  @gen.coroutine
+  def large_batch(self, app, mutations, entity_changes, txid):
+    self.round_trips += 4
+    yield gen.sleep(4 * self.latency)
+
+
+class SimulatedTransactionManager(object):
+  """ Allocates transaction IDs without a round trip. """
+  def __init__(self):
+    self.last_txid = 0
+
+  @gen.coroutine
+  def create_transaction_id(self, project, xg):
+    self.last_txid += 1
+    raise gen.Return(self.last_txid)
+
+  def set_groups(self, project, txid, groups):
+    pass
+
+  def delete_transaction_id(self, project, txid):
+    pass
+
+
+class SimulatedZooKeeper(object):
+  """ Provides the handle that DatastoreDistributed registers with. """
+  class Handle(object):
+    def add_listener(self, listener):
+      pass
+
+  def __init__(self):
+    self.handle = self.Handle()
+
+
+class SimulatedLock(object):
+  """ A lock that takes one ZooKeeper round trip to acquire or release. """
+  latency = 0
+
+  def __init__(self, client, keys, txid=None):
+    self.keys = keys
+
+  @gen.coroutine
+  def acquire(self):
+    yield gen.sleep(self.latency)
+    raise gen.Return(True)
+
+  def release(self):
+    time.sleep(self.latency)
+
+  def ensure_release_tornado_lock(self):
+    pass
+
+
+def build_entities(entity_count):
+  """ Creates entities that are each in their own entity group. """
+  entities = []
+  for entity_id in range(1, entity_count + 1):
+    entity = entity_pb.EntityProto()
+    key = entity.mutable_key()
+    key.set_app('project')
+    element = key.mutable_path().add_element()
+    element.set_type('Kind')
+    element.set_id(entity_id)
+    entity.mutable_entity_group().MergeFrom(key.path())
+    prop = entity.add_property()
+    prop.set_name('prop')
+    prop.set_multiple(False)
+    prop.mutable_value().set_int64value(entity_id)
+    entities.append(entity)
+
+  return entities
+
+
+def run(groups_per_lock, entities, latency):
+  """ Puts all of the entities.
+
+  Returns:
+    A tuple containing the elapsed time and the number of database round
+    trips.
+  """
+  db = SimulatedDatastore(latency)
+  datastore = DatastoreDistributed(db, SimulatedTransactionManager(),
+                                   SimulatedZooKeeper())
+  datastore.get_indexes = lambda project_id: []
+  datastore._MAX_WRITE_GROUPS = groups_per_lock
+
+  start = time.time()
+  IOLoop.current().run_sync(
+    lambda: datastore.put_entities('project', entities))
+  return time.time() - start, db.round_trips
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--entities', type=int, default=500)
+  parser.add_argument('--latency', type=float, default=0.002)
+  args = parser.parse_args()
+
+  SimulatedLock.latency = args.latency
+  entity_lock.EntityLock = SimulatedLock
+
+  entities = build_entities(args.entities)
+  modes = [('per group', 1),
+           ('chunked', DatastoreDistributed._MAX_WRITE_GROUPS)]
+  for name, groups_per_lock in modes:
+    elapsed, round_trips = run(groups_per_lock, entities, args.latency)
+    print('{}: {:.3f}s, {:.0f} entities/s, {} database round trips'.format(
+      name, elapsed, len(entities) / elapsed, round_trips))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,171 @@
+""" Compares merge join strategies against an in-memory property index.
+
+The stepwise join advances one range entry at a time. The block join fetches
+a block for every range concurrently and intersects the blocks in memory.
+Each index fetch waits for a simulated round trip.
+
+Usage: python merge_join.py [--entities N] [--latency SECONDS]
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.datastore_distributed import DatastoreDistributed
+from appscale.datastore.range_iterator import RangeExhausted, RangeIterator
+from appscale.datastore.utils import encode_index_pb
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import entity_pb
+
+
+class SimulatedIndex(object):
+  """ Serves property index entries from memory after a delay. """
+  def __init__(self, latency):
+    self.latency = latency
+    self.rows = []
+    self.queries = 0
+
+  @gen.coroutine
+  def range_query(self, table, columns, start, end, limit,
+                  start_inclusive=True):
+    self.queries += 1
+    yield gen.sleep(self.latency)
+    results = []
+    for key, reference in self.rows:
+      if len(results) == limit:
+        break
+
+      if key > end:
+        break
+
+      if key > start or (start_inclusive and key == start):
+        results.append({key: {'reference': reference}})
+
+    raise gen.Return(results)
+
+
+@gen.coroutine
+def stepwise_common_refs(ranges, limit):
+  """ The join that advances each range one entry at a time. """
+  reference_hash = {}
+  min_common_path = ranges[0].get_cursor()
+  entries_exhausted = False
+  while True:
+    common_keys = []
+    entry = None
+    for range_ in ranges:
+      try:
+        entry = yield range_.async_next()
+      except RangeExhausted:
+        entries_exhausted = True
+        break
+
+      if entry.encoded_path > str(encode_index_pb(min_common_path)):
+        min_common_path = entry.path
+        break
+
+      common_keys.append({'index': entry.key, 'prop_name': range_.prop_name})
+
+    if entries_exhausted:
+      break
+
+    if len(common_keys) < len(ranges):
+      for range_ in ranges:
+        range_.set_cursor(min_common_path, inclusive=True)
+
+      continue
+
+    reference_hash[entry.entity_reference] = common_keys
+
+    for range_ in ranges:
+      range_.set_cursor(min_common_path, inclusive=False)
+
+    if len(reference_hash) == limit:
+      break
+
+  raise gen.Return(reference_hash)
+
+
+def build_ranges(db, entity_count, selectivities):
+  """ Populates the index with one range per property.
+
+  Args:
+    db: A SimulatedIndex.
+    entity_count: The number of entities of the kind.
+    selectivities: A list of the fraction of entities each property matches.
+  Returns:
+    A list of RangeIterator objects.
+  """
+  value = entity_pb.PropertyValue()
+  value.set_int64value(1)
+  random.seed(0)
+  ranges = []
+  for index, selectivity in enumerate(selectivities):
+    range_ = RangeIterator(db, 'project', '', 'Kind', 'prop{}'.format(index),
+                           value)
+    for entity_id in range(1, entity_count + 1):
+      if random.random() >= selectivity:
+        continue
+
+      path = entity_pb.Path()
+      element = path.add_element()
+      element.set_type('Kind')
+      element.set_id(entity_id)
+      db.rows.append((range_.prefix + str(encode_index_pb(path)),
+                      'ref-{}'.format(entity_id)))
+
+    ranges.append(range_)
+
+  db.rows.sort()
+  return ranges
+
+
+def run(join, entity_count, latency, selectivities, limit):
+  """ Runs a join until the ranges are exhausted.
+
+  Returns:
+    A tuple containing the elapsed time, the number of index fetches, and the
+    number of references found.
+  """
+  db = SimulatedIndex(latency)
+  ranges = build_ranges(db, entity_count, selectivities)
+
+  @gen.coroutine
+  def join_all():
+    found = 0
+    while True:
+      reference_hash = yield join(ranges, limit)
+      found += len(reference_hash)
+      if len(reference_hash) < limit:
+        raise gen.Return(found)
+
+  start = time.time()
+  found = IOLoop.current().run_sync(join_all)
+  return time.time() - start, db.queries, found
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--entities', type=int, default=20000)
+  parser.add_argument('--latency', type=float, default=0.002)
+  parser.add_argument('--limit', type=int, default=100)
+  args = parser.parse_args()
+
+  selectivities = [0.5, 0.2, 0.05]
+  joins = [('stepwise', stepwise_common_refs),
+           ('block', DatastoreDistributed._common_refs_from_ranges)]
+  for name, join in joins:
+    elapsed, queries, found = run(join, args.entities, args.latency,
+                                  selectivities, args.limit)
+    print('{}: {:.3f}s, {} index fetches, {} references'.format(
+      name, elapsed, queries, found))
+
+
+if __name__ == '__main__':
+  main()
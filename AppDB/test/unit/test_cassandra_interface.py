@@ -30,6 +30,8 @@ class TestCassandra(testing.AsyncTestCase):
     self.connect_mock = mock.MagicMock(return_value=self.session_mock)
     self.cluster_mock = mock.MagicMock(connect=self.connect_mock)
     self.cluster_class_mock.return_value = self.cluster_mock
+    self.session_mock.prepare = mock.MagicMock(
+      side_effect=lambda query_str: mock.MagicMock(query_string=query_str))
 
     # Instantiate Datastore proxy
     self.db = cassandra_interface.DatastoreProxy()
@@ -61,7 +63,7 @@ class TestCassandra(testing.AsyncTestCase):
     parameters = self.execute_mock.call_args[1]["parameters"]
     self.assertEqual(
       query.query_string,
-      'SELECT * FROM "table" WHERE key IN %s and column1 IN %s')
+      'SELECT * FROM "table" WHERE key IN ? and column1 IN ?')
     self.assertEqual(parameters, ([b'a', b'b', b'c'], ['c1', 'c2', 'c3']) )
     # And result matches expectation
     self.assertEqual(result, {
@@ -149,12 +151,13 @@ class TestCassandra(testing.AsyncTestCase):
     self.assertEqual(
       query.query_string,
       'SELECT * FROM "tableZ" WHERE '
-      'token(key) >= %s AND '
-      'token(key) <= %s AND '
-      'column1 IN %s '
-      'LIMIT 10 '    # 5 * number of columns
+      'token(key) >= ? AND '
+      'token(key) <= ? AND '
+      'column1 IN ? '
+      'LIMIT ? '
       'ALLOW FILTERING')
-    self.assertEqual(parameters, (b'keyA', b'keyC', ['c1', 'c2']) )
+    # The limit is 5 * number of columns.
+    self.assertEqual(parameters, [b'keyA', b'keyC', ['c1', 'c2'], 10])
     # And result matches expectation
     self.assertEqual(result, [
       {'keyA': {'c1': '1', 'c2': '2'}},
@@ -162,6 +165,102 @@ class TestCassandra(testing.AsyncTestCase):
       {'keyC': {'c1': '7', 'c2': '8'}}
     ])
 
+  @testing.gen_test
+  def test_range_query_offset(self):
+    async_response = Future()
+    async_response.set_result([
+      ('keyA', 'c1', '1'), ('keyA', 'c2', '2'),
+      ('keyB', 'c1', '4'), ('keyB', 'c2', '5'),
+      ('keyC', 'c1', '7'), ('keyC', 'c2', '8')
+    ])
+    self.execute_mock.return_value = async_response
+
+    columns = ['c1', 'c2']
+    result = yield self.db.range_query("tableZ", columns, "keyA", "keyC", 5,
+                                       offset=1)
+    self.assertEqual(result, [
+      {'keyB': {'c1': '4', 'c2': '5'}},
+      {'keyC': {'c1': '7', 'c2': '8'}}
+    ])
+
+    result = yield self.db.range_query("tableZ", columns, "keyA", "keyC", 5,
+                                       offset=1, keys_only=True)
+    self.assertEqual(result, ['keyB', 'keyC'])
+
+  @testing.gen_test
+  def test_range_pager(self):
+    pages = [
+      ([('keyA', 'c1', '1'), ('keyA', 'c2', '2'), ('keyB', 'c1', '4')],
+       'state1'),
+      ([('keyB', 'c2', '5'), ('keyC', 'c1', '7')], 'state2'),
+      ([('keyC', 'c2', '8')], None)
+    ]
+
+    def execute_page(query, parameters, paging_state=None):
+      self.assertEqual(query.fetch_size, 4)
+      response = Future()
+      response.set_result(pages.pop(0))
+      return response
+
+    with mock.patch.object(cassandra_interface.TornadoCassandra,
+                           'execute_page', side_effect=execute_page) as \
+        execute_page_mock:
+      pager = self.db.range_pager("tableZ", ['c1', 'c2'], "keyA", "keyC", 2)
+      page = yield pager.async_next_page()
+      self.assertEqual(page, [{'keyA': {'c1': '1', 'c2': '2'}}])
+      self.assertEqual(pager.page_token, 'keyA')
+
+      # Rows that span pages are only returned once they are complete.
+      page = yield pager.async_next_page()
+      self.assertEqual(page, [{'keyB': {'c1': '4', 'c2': '5'}}])
+
+      page = yield pager.async_next_page()
+      self.assertEqual(page, [{'keyC': {'c1': '7', 'c2': '8'}}])
+      self.assertTrue(pager.exhausted)
+
+      page = yield pager.async_next_page()
+      self.assertEqual(page, [])
+
+    paging_states = [call[1]['paging_state']
+                     for call in execute_page_mock.call_args_list]
+    self.assertListEqual(paging_states, [None, 'state1', 'state2'])
+
+    # A page token resumes the range after the last returned key.
+    self.db.range_pager("tableZ", ['c1', 'c2'], "keyA", "keyC", 2,
+                        page_token='keyB')
+    prepared = self.db.prepared_statements[
+      ('tableZ', 'range', False, True, False)]
+    self.assertIn('token(key) > ?', prepared.query_string)
+    self.assertEqual(prepared.bind.call_args[0][0][0], bytearray('keyB'))
+
+  @testing.gen_test
+  def test_prepared_statement_registry(self):
+    async_response = Future()
+    async_response.set_result([])
+    self.execute_mock.return_value = async_response
+
+    yield self.db.batch_get_entity('table', ['a'], ['c1'])
+    yield self.db.batch_get_entity('table', ['b'], ['c1'])
+    yield self.db.range_query('table', ['c1'], 'a', 'b', 5)
+    yield self.db.range_query('table', ['c1'], 'a', 'b', 5,
+                              start_inclusive=False)
+    yield self.db.batch_delete('table', ['a'])
+    yield self.db.batch_delete('table', ['b'])
+
+    self.assertEqual(self.session_mock.prepare.call_count, 4)
+    self.assertDictEqual(self.db.prepared_statement_stats(),
+                         {'statements': 4, 'hits': 2, 'misses': 4})
+
+
+  def test_get_token_ranges(self):
+    tokens = [mock.MagicMock(value=value) for value in ['m', 'c', 'm', 't']]
+    self.cluster_mock.metadata.token_map.ring = tokens
+    self.assertListEqual(self.db.get_token_ranges(),
+                         [('', 'c'), ('c', 'm'), ('m', 't'), ('t', '')])
+
+    self.cluster_mock.metadata.token_map = None
+    self.assertListEqual(self.db.get_token_ranges(), [('', '')])
+
 
 if __name__ == "__main__":
   unittest.main()
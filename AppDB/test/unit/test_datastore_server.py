@@ -48,6 +48,9 @@ class Item(db.Model):
 ASYNC_NONE = gen.Future()
 ASYNC_NONE.set_result(None)
 
+ASYNC_TXID = gen.Future()
+ASYNC_TXID.set_result(1)
+
 
 class TestDatastoreServer(testing.AsyncTestCase):
   """
@@ -362,7 +365,7 @@ class TestDatastoreServer(testing.AsyncTestCase):
     db_batch.should_receive('batch_get_entity').and_return(async_result)
     db_batch.should_receive('normal_batch').and_return(ASYNC_NONE)
     transaction_manager = flexmock(
-      create_transaction_id=lambda project, xg: 1,
+      create_transaction_id=lambda project, xg: ASYNC_TXID,
       delete_transaction_id=lambda project, txid: None,
       set_groups=lambda project, txid, groups: None)
     dd = DatastoreDistributed(db_batch, transaction_manager,
@@ -383,8 +386,10 @@ class TestDatastoreServer(testing.AsyncTestCase):
     entity_lock.should_receive('acquire').and_return(async_true)
     entity_lock.should_receive('release')
 
-    flexmock(ScatteredAllocator).should_receive('next').\
-      and_return(random.randint(1, 500))
+    allocated_ids = gen.Future()
+    allocated_ids.set_result([random.randint(1, 500)])
+    flexmock(ScatteredAllocator).should_receive('next_n').\
+      and_return(allocated_ids)
 
     yield dd.dynamic_put('test', putreq_pb, putresp_pb)
     self.assertEquals(len(putresp_pb.key_list()), 2)
@@ -408,7 +413,7 @@ class TestDatastoreServer(testing.AsyncTestCase):
     db_batch.should_receive('batch_get_entity').and_return(async_result)
     db_batch.should_receive('normal_batch').and_return(ASYNC_NONE)
     transaction_manager = flexmock(
-      create_transaction_id=lambda project, xg: 1,
+      create_transaction_id=lambda project, xg: ASYNC_TXID,
       delete_transaction_id=lambda project, txid: None,
       set_groups=lambda project, txid, groups: None)
     dd = DatastoreDistributed(db_batch, transaction_manager,
@@ -424,6 +429,54 @@ class TestDatastoreServer(testing.AsyncTestCase):
 
     yield dd.put_entities(app_id, entity_list)
 
+  @testing.gen_test
+  def test_put_entities_across_groups(self):
+    app_id = 'test'
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+
+    group_count = DatastoreDistributed._MAX_WRITE_GROUPS + 5
+    entity_list = [
+      self.get_new_entity_proto(app_id, 'test_kind', 'entity{}'.format(index),
+                                'prop1name', 'prop1val', ns='blah')
+      for index in range(group_count)]
+
+    def batch_get_entity(table, keys, schema):
+      result = gen.Future()
+      result.set_result({key: {} for key in keys})
+      return result
+
+    db_batch.should_receive('batch_get_entity').replace_with(batch_get_entity)
+    db_batch.should_receive('normal_batch').and_return(ASYNC_NONE).\
+      times(group_count)
+
+    txids = []
+
+    @gen.coroutine
+    def create_transaction_id(project, xg):
+      txids.append(xg)
+      raise gen.Return(len(txids))
+
+    transaction_manager = flexmock(
+      create_transaction_id=create_transaction_id,
+      delete_transaction_id=lambda project, txid: None,
+      set_groups=lambda project, txid, groups: None)
+    dd = DatastoreDistributed(db_batch, transaction_manager,
+                              self.get_zookeeper())
+    dd.index_manager = flexmock(
+      projects={app_id: flexmock(indexes_pb=[])})
+
+    async_true = gen.Future()
+    async_true.set_result(True)
+    entity_lock = flexmock(EntityLock)
+    entity_lock.should_receive('acquire').and_return(async_true).twice()
+    entity_lock.should_receive('release').twice()
+
+    yield dd.put_entities(app_id, entity_list)
+
+    # Each chunk of groups shares a lock and a transaction ID.
+    self.assertListEqual(txids, [True, True])
+
   def test_acquire_locks_for_trans(self):
     zk_client = flexmock()
     zk_client.should_receive('add_listener')
@@ -476,30 +529,47 @@ class TestDatastoreServer(testing.AsyncTestCase):
   @testing.gen_test
   def test_delete_entities(self):
     app_id = 'test'
-    entity_proto1 = self.get_new_entity_proto(
-      app_id, "test_kind", "bob", "prop1name", "prop1val", ns="blah")
-    row_key = "test\x00blah\x00test_kind:bob\x01"
-    row_values = {row_key: {APP_ENTITY_SCHEMA[0]: entity_proto1.Encode(),
-                            APP_ENTITY_SCHEMA[1]: '1'}}
+    row_values = {}
+    row_keys = []
+    for name in ['bob', 'nancy', 'sam']:
+      entity_proto = self.get_new_entity_proto(
+        app_id, "test_kind", "root", "prop1name", "prop1val", ns="blah")
+      element = entity_proto.mutable_key().mutable_path().add_element()
+      element.set_type('child_kind')
+      element.set_name(name)
+      row_key = "test\x00blah\x00test_kind:root\x01child_kind:{}\x01".\
+        format(name)
+      row_values[row_key] = {APP_ENTITY_SCHEMA[0]: entity_proto.Encode(),
+                             APP_ENTITY_SCHEMA[1]: '1'}
+      row_keys.append(entity_proto.key())
+
     async_result = gen.Future()
     async_result.set_result(row_values)
 
-    zk_client = flexmock()
-    zk_client.should_receive('add_listener')
-
-    zookeeper = flexmock(handle=zk_client)
-    zookeeper.should_receive("get_valid_transaction_id").and_return(1)
     db_batch = flexmock()
     db_batch.should_receive('valid_data_version_sync').and_return(True)
     db_batch.should_receive("batch_get_entity").and_return(async_result)
-    db_batch.should_receive('normal_batch').and_return(ASYNC_NONE)
 
-    transaction_manager = flexmock()
-    dd = DatastoreDistributed(db_batch, transaction_manager, zookeeper)
+    # All of the deletions for a group are applied in a single batch.
+    db_batch.should_receive('normal_batch').and_return(ASYNC_NONE).once()
 
-    row_keys = [entity_proto1.key()]
+    transaction_manager = flexmock(
+      create_transaction_id=lambda project, xg: ASYNC_TXID,
+      delete_transaction_id=lambda project, txid: None,
+      set_groups=lambda project, txid, groups: None)
+    dd = DatastoreDistributed(db_batch, transaction_manager,
+                              self.get_zookeeper())
 
-    yield dd.delete_entities(entity_proto1.key(), 1, row_keys)
+    async_true = gen.Future()
+    async_true.set_result(True)
+    entity_lock = flexmock(EntityLock)
+    entity_lock.should_receive('acquire').and_return(async_true).once()
+    entity_lock.should_receive('release').once()
+
+    yield dd.delete_entities(app_id, row_keys)
+    self.assertEqual(dd.batch_counts['normal'], 1)
+    self.assertEqual(dd.mutations_per_batch(), dd.batch_counts['mutations'])
+    self.assertGreater(dd.mutations_per_batch(), len(row_keys))
 
   def test_release_put_locks_for_nontrans(self):
     zk_client = flexmock()
@@ -677,9 +747,11 @@ class TestDatastoreServer(testing.AsyncTestCase):
     async_result_1.set_result([entity_proto1, tombstone1])
     async_result_2 = gen.Future()
     async_result_2.set_result([])
-    db_batch.should_receive("range_query").\
+    pager = flexmock()
+    pager.should_receive('async_next_page').\
       and_return(async_result_1).\
       and_return(async_result_2)
+    db_batch.should_receive('range_pager').and_return(pager)
 
     zk_client = flexmock()
     zk_client.should_receive('add_listener')
@@ -695,6 +767,146 @@ class TestDatastoreServer(testing.AsyncTestCase):
     }
     yield dd.kindless_query(query, filter_info)
 
+  @testing.gen_test
+  def test_kindless_query_offset(self):
+    entities = [self.get_new_entity_proto('test', 'test_kind', name, 'prop',
+                                          'value')
+                for name in ['a', 'b', 'c']]
+    rows = [{'test\x00\x00test_kind:{}\x01'.format(name):
+               {APP_ENTITY_SCHEMA[0]: entity.Encode(),
+                APP_ENTITY_SCHEMA[1]: '1'}}
+            for name, entity in zip(['a', 'b', 'c'], entities)]
+
+    def remaining_rows(start, start_inclusive):
+      return [row for row in rows
+              if row.keys()[0] > start or
+              (start_inclusive and row.keys()[0] == start)]
+
+    def range_query(table, columns, start, end, limit, offset=0,
+                    start_inclusive=True, end_inclusive=True,
+                    keys_only=False):
+      # Skipped results should only be read from the txnID column.
+      self.assertTrue(keys_only)
+      self.assertListEqual(columns, [APP_ENTITY_SCHEMA[1]])
+      response = gen.Future()
+      response.set_result([row.keys()[0] for row in
+                           remaining_rows(start, start_inclusive)[:limit]])
+      return response
+
+    def range_pager(table, columns, start, end, page_size,
+                    start_inclusive=True, end_inclusive=True):
+      pages = [remaining_rows(start, start_inclusive)[:page_size], []]
+
+      def async_next_page():
+        page = pages.pop(0)
+        fetched.extend(row.keys()[0] for row in page)
+        response = gen.Future()
+        response.set_result(page)
+        return response
+
+      return flexmock(async_next_page=async_next_page)
+
+    fetched = []
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    db_batch.should_receive('range_query').replace_with(range_query)
+    db_batch.should_receive('range_pager').replace_with(range_pager)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    query = datastore_pb.Query()
+    query.set_app('test')
+    query.set_offset(2)
+    query.set_limit(5)
+    query_result = datastore_pb.QueryResult()
+    yield dd._dynamic_run_query(query, query_result)
+
+    self.assertEqual(query_result.skipped_results(), 2)
+    self.assertEqual(query_result.result_size(), 1)
+    self.assertEqual(query_result.result(0), entities[2].Encode())
+    self.assertFalse(query_result.more_results())
+    self.assertListEqual(fetched, [rows[2].keys()[0]])
+    self.assertEqual(query.offset(), 2)
+
+  @testing.gen_test
+  def test_get_kind_count(self):
+    stat = self.get_new_entity_proto('test', '__Stat_Kind__', 'test_kind',
+                                     'kind_name', 'test_kind')
+    prop = stat.add_property()
+    prop.set_name('count')
+    prop.set_multiple(0)
+    prop.mutable_value().set_int64value(5)
+
+    stats_response = gen.Future()
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+    flexmock(dd).should_receive('_DatastoreDistributed__kind_query').\
+      and_return(stats_response).once()
+
+    # Queries do not wait for the statistics to be fetched.
+    self.assertIsNone(dd._get_kind_count('test', 'test_kind'))
+    yield gen.moment
+    self.assertIsNone(dd._get_kind_count('test', 'test_kind'))
+
+    stats_response.set_result([stat.Encode()])
+    yield gen.moment
+    self.assertEqual(dd._get_kind_count('test', 'test_kind'), 5)
+    self.assertIsNone(dd._get_kind_count('test', 'other_kind'))
+
+  @testing.gen_test
+  def test_kind_query_offset_with_stale_index(self):
+    entities = {name: self.get_new_entity_proto('test', 'test_kind', name,
+                                                'prop', 'value')
+                for name in ['b', 'c']}
+    # The kind index still has an entry for the deleted entity 'a'.
+    references = [
+      {'test\x00\x00test_kind\x01test_kind:{}\x01'.format(name):
+         {'reference': 'test\x00\x00test_kind:{}\x01'.format(name)}}
+      for name in ['a', 'b', 'c']]
+
+    def range_query(table, columns, start, end, limit, offset=0,
+                    start_inclusive=True, end_inclusive=True,
+                    keys_only=False):
+      self.assertEqual(table, dbconstants.APP_KIND_TABLE)
+      self.assertFalse(keys_only)
+      in_range = [ref for ref in references
+                  if ref.keys()[0] > start or
+                  (start_inclusive and ref.keys()[0] == start)]
+      response = gen.Future()
+      response.set_result(in_range[:limit])
+      return response
+
+    def batch_get_entity(table, row_keys, columns):
+      rows = {}
+      for row_key in row_keys:
+        name = row_key.split(':')[-1][:-1]
+        if name in entities:
+          rows[row_key] = {APP_ENTITY_SCHEMA[0]: entities[name].Encode(),
+                           APP_ENTITY_SCHEMA[1]: '1'}
+
+      response = gen.Future()
+      response.set_result(rows)
+      return response
+
+    db_batch = flexmock()
+    db_batch.should_receive('valid_data_version_sync').and_return(True)
+    db_batch.should_receive('range_query').replace_with(range_query)
+    db_batch.should_receive('batch_get_entity').replace_with(batch_get_entity)
+    dd = DatastoreDistributed(db_batch, flexmock(), self.get_zookeeper())
+
+    query = datastore_pb.Query()
+    query.set_app('test')
+    query.set_kind('test_kind')
+    query.set_offset(1)
+    query.set_limit(1)
+    query_result = datastore_pb.QueryResult()
+    yield dd._dynamic_run_query(query, query_result)
+
+    # The stale entry does not count towards the offset.
+    self.assertEqual(query_result.skipped_results(), 1)
+    self.assertEqual(query_result.result_size(), 1)
+    self.assertEqual(query_result.result(0), entities['c'].Encode())
+
   @testing.gen_test
   def test_dynamic_delete(self):
     async_true = gen.Future()
@@ -710,7 +922,7 @@ class TestDatastoreServer(testing.AsyncTestCase):
     db_batch = flexmock()
     db_batch.should_receive('valid_data_version_sync').and_return(True)
     transaction_manager = flexmock(
-      create_transaction_id=lambda project, xg: 1,
+      create_transaction_id=lambda project, xg: ASYNC_TXID,
       delete_transaction_id=lambda project, txid: None,
       set_groups=lambda project_id, txid, groups: None)
     dd = DatastoreDistributed(db_batch, transaction_manager,
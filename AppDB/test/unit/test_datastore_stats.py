@@ -0,0 +1,133 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from flexmock import flexmock
+from tornado.testing import AsyncHTTPTestCase
+
+from appscale.datastore.scripts import datastore
+
+
+class StatsStateMixin(object):
+  """ Isolates the module-level stats state that a test modifies. """
+  def save_stats_state(self):
+    self.stats_dir = tempfile.mkdtemp()
+    self.original_state = (datastore.datastore_access, datastore.options,
+                           datastore.STATS, datastore.worker_id,
+                           datastore.worker_count, datastore.WORKER_STATS_DIR)
+    db = flexmock(prepared_statement_stats=lambda: {
+      'statements': 3, 'hits': 10, 'misses': 3})
+    datastore.datastore_access = flexmock(datastore_batch=db)
+    datastore.options = flexmock(port=4000)
+    datastore.STATS = {'Put': {0: (2, 0.5)}}
+    datastore.WORKER_STATS_DIR = self.stats_dir
+
+  def restore_stats_state(self):
+    (datastore.datastore_access, datastore.options, datastore.STATS,
+     datastore.worker_id, datastore.worker_count,
+     datastore.WORKER_STATS_DIR) = self.original_state
+    shutil.rmtree(self.stats_dir, ignore_errors=True)
+
+  def publish_worker(self, worker, requests, prepared_statements):
+    stats = {datastore.REQUESTS_KEY: requests,
+             datastore.PREPARED_STATEMENTS_KEY: prepared_statements}
+    with open(datastore.worker_stats_path(4000, worker), 'w') as stats_file:
+      json.dump(stats, stats_file)
+
+
+class TestStatsHelpers(StatsStateMixin, unittest.TestCase):
+  def setUp(self):
+    self.save_stats_state()
+
+  def tearDown(self):
+    self.restore_stats_state()
+
+  def test_merge_stats(self):
+    combined = {}
+    datastore.merge_stats(combined, {'Put': {0: (2, 0.5)},
+                                     'Get': {0: (1, 0.1)}})
+    # Stats loaded from JSON use string error codes and lists.
+    datastore.merge_stats(combined, {'Put': {'0': [1, 0.25], '4': [1, 2]}})
+    self.assertDictEqual(combined, {'Put': {'0': (3, 0.75), '4': (1, 2)},
+                                    'Get': {'0': (1, 0.1)}})
+
+  def test_combined_stats(self):
+    datastore.worker_id = 1
+    datastore.worker_count = 3
+    self.publish_worker(0, {'Put': {'0': [1, 0.25]}},
+                        {'statements': 2, 'hits': 5, 'misses': 2})
+    # This worker's own file is ignored in favour of its current stats.
+    self.publish_worker(1, {'Put': {'0': [10, 10]}},
+                        {'statements': 10, 'hits': 10, 'misses': 10})
+    # A partially-written file is skipped.
+    with open(datastore.worker_stats_path(4000, 2), 'w') as stats_file:
+      stats_file.write('{"requests": ')
+
+    stats = datastore.combined_stats()
+    self.assertDictEqual(stats[datastore.REQUESTS_KEY],
+                         {'Put': {'0': (3, 0.75)}})
+    self.assertDictEqual(stats[datastore.PREPARED_STATEMENTS_KEY],
+                         {'statements': 5, 'hits': 15, 'misses': 5})
+
+  def test_reset_worker_stats(self):
+    self.publish_worker(0, {}, {})
+    with open(datastore.clear_marker_path(4000), 'w') as marker_file:
+      marker_file.write('1')
+
+    other_server = datastore.worker_stats_path(4001, 0)
+    with open(other_server, 'w') as stats_file:
+      json.dump({}, stats_file)
+
+    datastore.reset_worker_stats(4000)
+    self.assertListEqual(os.listdir(self.stats_dir),
+                         [os.path.basename(other_server)])
+
+    shutil.rmtree(self.stats_dir)
+    datastore.reset_worker_stats(4000)
+    self.assertTrue(os.path.isdir(self.stats_dir))
+
+
+class TestDatastoreStats(StatsStateMixin, AsyncHTTPTestCase):
+  def get_app(self):
+    return datastore.pb_application
+
+  def setUp(self):
+    super(TestDatastoreStats, self).setUp()
+    self.save_stats_state()
+
+  def tearDown(self):
+    self.restore_stats_state()
+    super(TestDatastoreStats, self).tearDown()
+
+  def fetch_stats(self):
+    response = self.fetch('/')
+    self.assertEqual(response.code, 200)
+    return json.loads(response.body)
+
+  def test_single_process(self):
+    datastore.worker_id = None
+    stats = self.fetch_stats()
+    self.assertListEqual(stats[datastore.REQUESTS_KEY]['Put']['0'], [2, 0.5])
+    self.assertNotIn(datastore.PREPARED_STATEMENTS_KEY,
+                     stats[datastore.REQUESTS_KEY])
+    self.assertDictEqual(stats[datastore.PREPARED_STATEMENTS_KEY],
+                         {'statements': 3, 'hits': 10, 'misses': 3})
+
+  def test_combines_workers(self):
+    datastore.worker_id = 0
+    datastore.worker_count = 3
+    self.publish_worker(1, {'Put': {'0': [1, 0.25]}},
+                        {'statements': 2, 'hits': 5, 'misses': 2})
+
+    # The third worker has not published its stats yet.
+    stats = self.fetch_stats()
+    self.assertListEqual(stats[datastore.REQUESTS_KEY]['Put']['0'],
+                         [3, 0.75])
+    self.assertDictEqual(stats[datastore.PREPARED_STATEMENTS_KEY],
+                         {'statements': 5, 'hits': 15, 'misses': 5})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,64 @@
+import sys
+import unittest
+
+from flexmock import flexmock
+from tornado import gen, testing
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.cassandra_env.entity_id_allocator import (
+  DEFAULT_RESERVATION_SIZE, MIN_RESERVATION_SIZE, ScatteredAllocator)
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore.datastore_stub_util import ToScatteredId
+
+
+class TestScatteredAllocator(testing.AsyncTestCase):
+  def setUp(self):
+    super(TestScatteredAllocator, self).setUp()
+    self.allocator = ScatteredAllocator(flexmock(), 'guestbook')
+    self.reservations = []
+    self.last_reserved = 0
+
+    @gen.coroutine
+    def allocate_size(size, retries=5, min_counter=None):
+      self.reservations.append(size)
+      yield gen.moment
+      start_id = self.last_reserved + 1
+      self.last_reserved += size
+      raise gen.Return((start_id, self.last_reserved))
+
+    self.allocator.allocate_size = allocate_size
+
+  @testing.gen_test
+  def test_next_n(self):
+    new_ids = yield self.allocator.next_n(3)
+    self.assertListEqual(new_ids, [ToScatteredId(counter)
+                                   for counter in range(1, 4)])
+    self.assertListEqual(self.reservations, [DEFAULT_RESERVATION_SIZE])
+
+    # Concurrent requests share a reservation.
+    self.allocator.start_id = None
+    results = yield [self.allocator.next_n(2), self.allocator.next()]
+    self.assertEqual(len(self.reservations), 2)
+    self.assertEqual(len(set(results[0] + [results[1]])), 3)
+
+    # Requests larger than the remaining block reserve what is missing.
+    self.allocator.end_id = self.allocator.start_id + 1
+    large_count = DEFAULT_RESERVATION_SIZE * 2
+    new_ids = yield self.allocator.next_n(large_count)
+    self.assertEqual(len(new_ids), large_count)
+    self.assertEqual(len(set(new_ids)), large_count)
+    self.assertEqual(self.reservations[-1], large_count - 2)
+
+  @testing.gen_test
+  def test_adaptive_reservation_size(self):
+    # A slow allocation rate results in smaller blocks.
+    yield self.allocator.next_n(1)
+    self.allocator._block_time -= 100
+    self.allocator.start_id = self.allocator.end_id + 1
+    yield self.allocator.next()
+    self.assertEqual(self.reservations[-1], MIN_RESERVATION_SIZE)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,106 @@
+import sys
+import unittest
+
+from flexmock import flexmock
+from tornado import gen, testing
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.dbconstants import AppScaleDBConnectionError
+from appscale.datastore.entity_stats import (StatCategories, StatsBuffer,
+                                             stat_deltas)
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import entity_pb
+
+
+def new_entity(app_id, kind, namespace='', value=''):
+  entity = entity_pb.EntityProto()
+  key = entity.mutable_key()
+  key.set_app(app_id)
+  if namespace:
+    key.set_name_space(namespace)
+
+  element = key.mutable_path().add_element()
+  element.set_type(kind)
+  element.set_id(1)
+  entity.mutable_entity_group().MergeFrom(key.path())
+  if value:
+    prop = entity.add_property()
+    prop.set_name('prop')
+    prop.set_multiple(False)
+    prop.mutable_value().set_stringvalue(value)
+
+  return entity
+
+
+class TestStatDeltas(unittest.TestCase):
+  def test_stat_deltas(self):
+    old = new_entity('app', 'Kind', 'ns')
+    new = new_entity('app', 'Kind', 'ns', value='abc')
+    created = new_entity('app', 'Other')
+    changes = [{'key': old.key(), 'old': old, 'new': new},
+               {'key': created.key(), 'old': None, 'new': created}]
+    growth = new.ByteSize() - old.ByteSize()
+    self.assertDictEqual(stat_deltas(changes), {
+      ('app', StatCategories.KIND, 'Kind'): (growth, 0),
+      ('app', StatCategories.NAMESPACE, 'ns'): (growth, 0),
+      ('app', StatCategories.KIND, 'Other'): (created.ByteSize(), 1),
+      ('app', StatCategories.NAMESPACE, ''): (created.ByteSize(), 1)
+    })
+
+    deleted = new_entity('app', 'Kind', 'ns')
+    changes = [{'key': deleted.key(), 'old': deleted, 'new': None}]
+    self.assertDictEqual(stat_deltas(changes), {
+      ('app', StatCategories.KIND, 'Kind'): (-deleted.ByteSize(), -1),
+      ('app', StatCategories.NAMESPACE, 'ns'): (-deleted.ByteSize(), -1)
+    })
+
+    # Internal kinds and applications are not counted.
+    internal = [new_entity('app', '__Stat_Kind__'),
+                new_entity('appscaledashboard', 'Kind')]
+    changes = [{'key': entity.key(), 'old': None, 'new': entity}
+               for entity in internal]
+    self.assertDictEqual(stat_deltas(changes), {})
+
+
+class TestStatsBuffer(testing.AsyncTestCase):
+  @testing.gen_test
+  def test_flush(self):
+    updates = []
+    failures = [AppScaleDBConnectionError('Timeout')]
+
+    def update_entity_stats(deltas):
+      response = gen.Future()
+      if failures:
+        response.set_exception(failures.pop())
+      else:
+        updates.append(deltas)
+        response.set_result(None)
+
+      return response
+
+    db = flexmock(update_entity_stats=update_entity_stats)
+    stats_buffer = StatsBuffer(db)
+    entity = new_entity('app', 'Kind')
+    change = {'key': entity.key(), 'old': None, 'new': entity}
+    stats_buffer.add([change])
+
+    # Changes that could not be written are kept for the next flush.
+    yield stats_buffer.flush()
+    self.assertListEqual(updates, [])
+
+    stats_buffer.add([change])
+    yield stats_buffer.flush()
+    size = entity.ByteSize()
+    self.assertListEqual(updates, [{
+      ('app', StatCategories.KIND, 'Kind'): (2 * size, 2),
+      ('app', StatCategories.NAMESPACE, ''): (2 * size, 2)
+    }])
+
+    # Nothing is written when there are no changes.
+    yield stats_buffer.flush()
+    self.assertEqual(len(updates), 1)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -12,6 +12,7 @@ from appscale.datastore import entity_utils
 from appscale.datastore import groomer
 from appscale.datastore import utils
 from flexmock import flexmock
+from kazoo.exceptions import NodeExistsError, NoNodeError
 
 sys.path.append(APPSCALE_PYTHON_APPSERVER)
 from google.appengine.api import apiproxy_stub_map
@@ -75,6 +76,66 @@ class FakeEntity():
     return FakeQuery()
 
 
+class FakeTransaction():
+  def __init__(self, handle):
+    self.handle = handle
+    self.nodes = []
+  def create(self, path, value=''):
+    self.nodes.append((path, value))
+  def commit(self):
+    for path, value in self.nodes:
+      self.handle.create(path, value)
+
+
+class FakeZooKeeperHandle():
+  def __init__(self):
+    self.nodes = {}
+  def ensure_path(self, path):
+    self.nodes.setdefault(path, '')
+  def create(self, path, value='', ephemeral=False):
+    if path in self.nodes:
+      raise NodeExistsError()
+    if path.rsplit('/', 1)[0] not in self.nodes:
+      raise NoNodeError()
+    self.nodes[path] = value
+  def get(self, path):
+    if path not in self.nodes:
+      raise NoNodeError()
+    return self.nodes[path], None
+  def set(self, path, value):
+    self.get(path)
+    self.nodes[path] = value
+  def get_children(self, path):
+    self.get(path)
+    return [node.rsplit('/', 1)[1] for node in self.nodes
+            if node.rsplit('/', 1)[0] == path]
+  def delete(self, path, recursive=False):
+    for node in self.nodes.keys():
+      if node == path or (recursive and node.startswith(path + '/')):
+        del self.nodes[node]
+  def transaction(self):
+    return FakeTransaction(self)
+
+
+class FakePager():
+  def __init__(self, pages):
+    self.pages = pages
+  def next_page_sync(self):
+    if not self.pages:
+      return []
+    return self.pages.pop(0)
+
+
+class FakeEntityLock():
+  acquired = []
+  def __init__(self, client, keys):
+    self.keys = keys
+  def __enter__(self):
+    FakeEntityLock.acquired.append(self.keys[0].path().element(0).id())
+  def __exit__(self, exc_type, exc_value, traceback):
+    pass
+
+
 class TestGroomer(unittest.TestCase):
   """
   A set of test cases for the datastore groomer service.
@@ -107,8 +168,7 @@ class TestGroomer(unittest.TestCase):
     zookeeper = flexmock()
     dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
     dsg = flexmock(dsg)
-    dsg.should_receive("get_entity_batch").and_return([])
-    dsg.should_receive("process_entity")
+    dsg.should_receive("clean_up_entities")
     dsg.should_receive("update_statistics").and_raise(Exception)
     dsg.should_receive("remove_old_logs").and_return()
     dsg.should_receive("remove_old_tasks_entities").and_return()
@@ -127,6 +187,157 @@ class TestGroomer(unittest.TestCase):
       dsg.process_entity({'key':{dbconstants.APP_ENTITY_SCHEMA[0]:'ent',
       dbconstants.APP_ENTITY_SCHEMA[1]:'version'}}))
 
+  def test_entity_shard_encoding(self):
+    shard = groomer.EntityShard('\x00', '\xff', last_key='app\x00key')
+    shard.add_entity('app', 'kind', '', 10)
+    shard.add_entity('app', 'kind', 'ns', 5)
+
+    decoded = groomer.EntityShard.decode(shard.encode())
+    self.assertEquals(decoded.start_key, '\x00')
+    self.assertEquals(decoded.end_key, '\xff')
+    self.assertEquals(decoded.last_key, 'app\x00key')
+    self.assertFalse(decoded.done)
+    self.assertEquals(decoded.stats,
+                      {'app': {'kind': {'size': 15, 'number': 2}}})
+    self.assertEquals(decoded.namespace_info,
+                      {'app': {'': {'size': 10, 'number': 1},
+                               'ns': {'size': 5, 'number': 1}}})
+
+  def test_clean_up_entities(self):
+    handle = FakeZooKeeperHandle()
+    zookeeper = flexmock(handle=handle)
+    dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
+    dsg = flexmock(dsg)
+    dsg.SHARD_WORKERS = 2
+
+    pages = {'': [[{'a1': {}}, {'a2': {}}], [{'a3': {}}]],
+             'm': [[{'n1': {}}]]}
+    dsg.db_access = flexmock(
+      get_token_ranges=lambda: [('', 'm'), ('m', '')])
+    dsg.db_access.should_receive('range_pager').replace_with(
+      lambda table, columns, start_key, end_key, batch_size, page_token,
+             start_inclusive: FakePager(pages[start_key]))
+
+    def process_entity(entity, shard):
+      shard.add_entity('app', 'kind', '', 1)
+
+    dsg.should_receive('process_entity').replace_with(process_entity)
+    dsg.should_receive('publish_entity_stats')
+    dsg.should_receive('reconcile_entity_stats').once()
+
+    # A shard finished by a previous pass is not groomed again.
+    handle.ensure_path(dsg.SHARDS_PATH)
+    finished = groomer.EntityShard('m', '', last_key='n1', done=True)
+    finished.add_entity('app', 'kind', 'ns', 1)
+    handle.create(dsg.SHARDS_PATH + '/00001', finished.encode())
+    handle.create(dsg.SHARDS_PATH + '/00000',
+                  groomer.EntityShard('', 'm').encode())
+
+    dsg.clean_up_entities()
+    self.assertEquals(dsg.stats, {'app': {'kind': {'size': 4, 'number': 4}}})
+    self.assertEquals(dsg.namespace_info,
+                      {'app': {'': {'size': 3, 'number': 3},
+                               'ns': {'size': 1, 'number': 1}}})
+    self.assertEquals(dsg.entities_checked, 3)
+    self.assertNotIn(dsg.SHARDS_PATH, handle.nodes)
+
+  def test_create_entity_shards(self):
+    handle = FakeZooKeeperHandle()
+    zookeeper = flexmock(handle=handle)
+    dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
+    dsg.db_access = flexmock(
+      get_token_ranges=lambda: [('', 'g'), ('g', 'p'), ('p', '')])
+    dsg.create_entity_shards()
+
+    shards = dsg.get_entity_shards()
+    self.assertEquals([(shard.start_key, shard.end_key)
+                       for _, shard in shards],
+                      [('', 'g'), ('g', 'p'), ('p', '')])
+
+    # A claimed shard cannot be claimed by another worker.
+    shard_path = shards[0][0]
+    self.assertTrue(dsg.claim_shard(shard_path))
+    self.assertFalse(dsg.claim_shard(shard_path))
+    dsg.release_shard(shard_path)
+    self.assertTrue(dsg.claim_shard(shard_path))
+
+  def test_assist_with_entity_shards(self):
+    handle = FakeZooKeeperHandle()
+    zookeeper = flexmock(handle=handle)
+    dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
+    dsg = flexmock(dsg)
+    flexmock(appscale_datastore_batch.DatastoreFactory).\
+      should_receive('getDatastore').and_return(flexmock())
+
+    # There is nothing to assist with when no pass is running.
+    dsg.should_receive('run_shard_workers').never()
+    self.assertFalse(dsg.assist_with_entity_shards())
+
+    # Open shards are polled until the pass finishes.
+    handle.ensure_path(dsg.SHARDS_PATH)
+    handle.create(dsg.SHARDS_PATH + '/00000',
+                  groomer.EntityShard('', '').encode())
+    dsg.should_receive('run_shard_workers').once()
+    self.assertTrue(dsg.assist_with_entity_shards())
+
+    handle.set(dsg.SHARDS_PATH + '/00000',
+               groomer.EntityShard('', '', done=True).encode())
+    self.assertFalse(dsg.assist_with_entity_shards())
+
+  def test_reconcile_entity_stats(self):
+    zookeeper = flexmock()
+    dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
+    dsg.stats = {'app': {'Kind': {'size': 10, 'number': 2}}}
+    dsg.namespace_info = {'app': {'': {'size': 10, 'number': 2}}}
+
+    counters = {('app', 'kind', 'Kind'): (7, 1),
+                ('app', 'namespace', ''): (10, 2),
+                ('app', 'kind', 'Deleted'): (5, 1)}
+    dsg.db_access = flexmock(get_entity_stats_sync=lambda: counters)
+    dsg.db_access.should_receive('update_entity_stats_sync').with_args(
+      {('app', 'kind', 'Kind'): (3, 1),
+       ('app', 'kind', 'Deleted'): (-5, -1)}).once()
+    dsg.db_access.should_receive('set_metadata_sync').once()
+    dsg.reconcile_entity_stats()
+
+  def test_clean_up_kind_indices(self):
+    zookeeper = flexmock(handle=None)
+    dsg = groomer.DatastoreGroomer(zookeeper, "cassandra", "localhost:8888")
+    dsg.ds_access = flexmock(INDEX_REFERENCE_COLUMN='reference',
+                             _SEPARATOR=dbconstants.KEY_DELIMITER)
+    flexmock(groomer).should_receive('EntityLock').replace_with(FakeEntityLock)
+    FakeEntityLock.acquired = []
+
+    def entity_key(group_id, child_id):
+      return 'app\x00\x00Parent:{}\x01Child:{}\x01'.format(group_id,
+                                                           child_id)
+
+    entity_keys = [entity_key(group_id, child_id)
+                   for group_id in (1, 2) for child_id in range(3)]
+    references = [{'index-{}'.format(index): {'reference': key}}
+                  for index, key in enumerate(entity_keys)]
+    pages = [references, []]
+    existing = {entity_keys[0]: {'entity': 'value'}}
+
+    deleted = []
+    dsg.db_access = flexmock(
+      range_query_sync=lambda **kwargs: pages.pop(0),
+      batch_get_entity_sync=lambda table, keys, columns: {
+        key: existing.get(key, {}) for key in keys},
+      batch_delete_sync=lambda table, keys, column_names: deleted.append(
+        sorted(keys)),
+      get_metadata_sync=lambda key: None)
+    flexmock(dsg).should_receive('update_groomer_state')
+
+    dsg.clean_up_kind_indices()
+
+    # Each group is locked once, and its entries are deleted together.
+    self.assertEquals(sorted(FakeEntityLock.acquired), [1, 2])
+    self.assertEquals(sorted(deleted),
+                      [['index-1', 'index-2'],
+                       ['index-3', 'index-4', 'index-5']])
+    self.assertEquals(dsg.index_entries_cleaned, 5)
+
   def test_process_statistics(self):
     zookeeper = flexmock()
     flexmock(utils).should_receive("get_entity_kind").and_return("kind")
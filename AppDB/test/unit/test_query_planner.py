@@ -0,0 +1,73 @@
+import json
+import sys
+import unittest
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.query_planner import (DEFAULT_KIND_SIZE, QueryPlan,
+                                              Strategies, estimate_cost,
+                                              filter_selectivity)
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore.datastore_pb import Query_Filter
+
+
+class TestQueryPlanner(unittest.TestCase):
+  EQUALITY_FILTERS = {
+    'a': [(Query_Filter.EQUAL, 'x')],
+    'b': [(Query_Filter.EQUAL, 'y')],
+    'c': [(Query_Filter.EQUAL, 'z')]
+  }
+
+  def test_filter_selectivity(self):
+    self.assertEqual(filter_selectivity({}), 1.0)
+    self.assertAlmostEqual(
+      filter_selectivity({'a': [(Query_Filter.EQUAL, 'x')],
+                          'b': [(Query_Filter.GREATER_THAN, 1)]}),
+      0.03)
+
+    # Key filters do not reduce the estimate.
+    self.assertEqual(
+      filter_selectivity({'__key__': [(Query_Filter.EQUAL, 'key')]}), 1.0)
+
+  def test_estimate_cost(self):
+    composite = estimate_cost(Strategies.COMPOSITE, self.EQUALITY_FILTERS,
+                              100000, 20)
+    zigzag = estimate_cost(Strategies.ZIGZAG_MERGE_JOIN,
+                           self.EQUALITY_FILTERS, 100000, 20)
+    self.assertEqual(composite, 40)
+    self.assertGreater(zigzag, composite)
+
+    # Unknown kinds use the default size.
+    self.assertEqual(
+      estimate_cost(Strategies.KIND, {}, None, 10 ** 9),
+      2 * DEFAULT_KIND_SIZE)
+
+  def test_order_strategies(self):
+    plan = QueryPlan()
+    plan.entity_count = 100000
+    ordered = plan.order_strategies(
+      [Strategies.ZIGZAG_MERGE_JOIN, Strategies.COMPOSITE],
+      self.EQUALITY_FILTERS, 20)
+    self.assertListEqual(ordered,
+                         [Strategies.COMPOSITE, Strategies.ZIGZAG_MERGE_JOIN])
+
+  def test_explain(self):
+    plan = QueryPlan()
+    plan.order_strategies([Strategies.KIND], {}, 10)
+    with plan.phase('execute'):
+      plan.strategy = Strategies.KIND
+      plan.index_rows_read = 10
+      plan.entities_fetched = 10
+
+    explanation = json.loads(json.dumps(plan.explain()))
+    self.assertEqual(explanation['strategy'], Strategies.KIND)
+    self.assertListEqual(explanation['estimates'],
+                         [{'strategy': Strategies.KIND, 'cost': 20}])
+    self.assertEqual(explanation['index_rows_read'], 10)
+    self.assertEqual(explanation['entities_fetched'], 10)
+    self.assertListEqual([phase['name'] for phase in explanation['phases']],
+                         ['execute'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,106 @@
+import sys
+import unittest
+
+from tornado import gen, testing
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.datastore.datastore_distributed import DatastoreDistributed
+from appscale.datastore.dbconstants import ASC_PROPERTY_TABLE
+from appscale.datastore.range_iterator import RangeExhausted, RangeIterator
+from appscale.datastore.utils import encode_index_pb
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.datastore import entity_pb
+
+
+class FakeIndex(object):
+  """ Serves ascending property index entries from memory. """
+  def __init__(self):
+    self.rows = []
+    self.queries = 0
+
+  def add(self, range_, entity_id):
+    path = entity_pb.Path()
+    element = path.add_element()
+    element.set_type(range_.kind)
+    element.set_id(entity_id)
+    key = range_.prefix + str(encode_index_pb(path))
+    self.rows.append((key, 'ref-{}'.format(entity_id)))
+    self.rows.sort()
+
+  def range_query(self, table, columns, start, end, limit,
+                  start_inclusive=True):
+    assert table == ASC_PROPERTY_TABLE
+    self.queries += 1
+    results = [{key: {'reference': reference}}
+               for key, reference in self.rows
+               if (key > start or (start_inclusive and key == start)) and
+               key <= end]
+    response = gen.Future()
+    response.set_result(results[:limit])
+    return response
+
+
+class TestRangeIterator(testing.AsyncTestCase):
+  def new_range(self, db, prop_name):
+    value = entity_pb.PropertyValue()
+    value.set_int64value(1)
+    range_ = RangeIterator(db, 'project', '', 'Kind', prop_name, value)
+    range_.CHUNK_SIZE = 3
+    return range_
+
+  @testing.gen_test
+  def test_async_next_block(self):
+    db = FakeIndex()
+    range_ = self.new_range(db, 'prop')
+    for entity_id in range(1, 6):
+      db.add(range_, entity_id)
+
+    block = yield range_.async_next_block()
+    self.assertListEqual([entry.entity_reference for entry in block],
+                         ['ref-1', 'ref-2', 'ref-3'])
+
+    # The cached chunk is used until the cursor moves past it.
+    range_.set_encoded_cursor(block[1].encoded_path, inclusive=False)
+    block = yield range_.async_next_block()
+    self.assertListEqual([entry.entity_reference for entry in block],
+                         ['ref-3'])
+    self.assertEqual(db.queries, 1)
+
+    range_.set_encoded_cursor(block[0].encoded_path, inclusive=False)
+    block = yield range_.async_next_block()
+    self.assertListEqual([entry.entity_reference for entry in block],
+                         ['ref-4', 'ref-5'])
+    self.assertEqual(db.queries, 2)
+
+    range_.set_encoded_cursor(block[-1].encoded_path, inclusive=False)
+    with self.assertRaises(RangeExhausted):
+      yield range_.async_next_block()
+
+  @testing.gen_test
+  def test_common_refs_from_ranges(self):
+    db = FakeIndex()
+    ranges = [self.new_range(db, prop_name)
+              for prop_name in ['a', 'b', 'c']]
+    ids_by_range = [range(1, 40), range(2, 40, 2), range(3, 40, 3)]
+    for range_, entity_ids in zip(ranges, ids_by_range):
+      for entity_id in entity_ids:
+        db.add(range_, entity_id)
+
+    reference_hash = yield DatastoreDistributed._common_refs_from_ranges(
+      ranges, 4)
+    self.assertListEqual(sorted(reference_hash.keys()),
+                         ['ref-12', 'ref-18', 'ref-24', 'ref-6'])
+    self.assertListEqual(
+      [entry['prop_name'] for entry in reference_hash['ref-6']],
+      ['a', 'b', 'c'])
+
+    # The next call resumes after the last common reference.
+    reference_hash = yield DatastoreDistributed._common_refs_from_ranges(
+      ranges, 4)
+    self.assertListEqual(sorted(reference_hash.keys()),
+                         ['ref-30', 'ref-36'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,104 @@
+import unittest
+
+from flexmock import flexmock
+from tornado import gen, testing
+
+from appscale.datastore.dbconstants import APP_ENTITY_SCHEMA, APP_ENTITY_TABLE
+from appscale.datastore.read_cache import EntityReadCache
+
+
+class TestEntityReadCache(testing.AsyncTestCase):
+  @staticmethod
+  def rows_for(row_keys):
+    return {row_key: {APP_ENTITY_SCHEMA[0]: 'entity-' + row_key}
+            for row_key in row_keys}
+
+  @testing.gen_test
+  def test_get(self):
+    fetched = []
+
+    def batch_get_entity(table, row_keys, columns):
+      self.assertEqual(table, APP_ENTITY_TABLE)
+      fetched.append(row_keys)
+      response = gen.Future()
+      response.set_result(self.rows_for(row_keys))
+      return response
+
+    db = flexmock(batch_get_entity=batch_get_entity)
+    cache = EntityReadCache(db)
+
+    # Duplicate keys are only fetched once.
+    result = yield cache.get(['a', 'a'])
+    self.assertDictEqual(result, self.rows_for(['a']))
+
+    result = yield cache.get(['a', 'b'])
+    self.assertDictEqual(result, self.rows_for(['a', 'b']))
+    self.assertListEqual(fetched, [['a'], ['b']])
+
+    # Invalidated keys are fetched again.
+    cache.invalidate(['a'])
+    yield cache.get(['a', 'b'])
+    self.assertListEqual(fetched, [['a'], ['b'], ['a']])
+
+  @testing.gen_test
+  def test_concurrent_get(self):
+    responses = []
+
+    def batch_get_entity(table, row_keys, columns):
+      response = gen.Future()
+      responses.append((response, row_keys))
+      return response
+
+    db = flexmock(batch_get_entity=batch_get_entity)
+    cache = EntityReadCache(db)
+
+    # Concurrent requests for the same key share a fetch.
+    first = cache.get(['a'])
+    second = cache.get(['a', 'b'])
+    self.assertListEqual([row_keys for _, row_keys in responses],
+                         [['a'], ['b']])
+
+    for response, row_keys in responses:
+      response.set_result(self.rows_for(row_keys))
+
+    results = yield [first, second]
+    self.assertDictEqual(results[0], self.rows_for(['a']))
+    self.assertDictEqual(results[1], self.rows_for(['a', 'b']))
+
+    # A fetch that was invalidated while in flight does not populate the cache.
+    pending = cache.get(['c'])
+    cache.invalidate(['c'])
+    responses[-1][0].set_result(self.rows_for(['c']))
+    yield pending
+    cache.get(['c'])
+    self.assertListEqual(responses[-1][1], ['c'])
+    self.assertEqual(len(responses), 4)
+
+  @testing.gen_test
+  def test_failed_get(self):
+    responses = []
+
+    def batch_get_entity(table, row_keys, columns):
+      response = gen.Future()
+      responses.append((response, row_keys))
+      return response
+
+    db = flexmock(batch_get_entity=batch_get_entity)
+    cache = EntityReadCache(db)
+
+    first = cache.get(['a', 'b'])
+    responses[0][0].set_exception(Exception('Timeout'))
+    with self.assertRaises(Exception):
+      yield first
+
+    # Every key from the failed fetch is fetched again.
+    second = cache.get(['a', 'b'])
+    self.assertEqual(len(responses), 2)
+    self.assertSetEqual(set(responses[1][1]), {'a', 'b'})
+    responses[1][0].set_result(self.rows_for(['a', 'b']))
+    result = yield second
+    self.assertDictEqual(result, self.rows_for(['a', 'b']))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -3,13 +3,20 @@ import unittest
 from mock import ANY
 from mock import call
 from mock import MagicMock
+from tornado import gen, testing
 
 from appscale.datastore.zkappscale.transaction_manager import (
   ProjectTransactionManager)
 
 
+def completed(result):
+  future = gen.Future()
+  future.set_result(result)
+  return future
+
+
 class TestDatastoreServer(unittest.TestCase):
-  def test_create_transaction_id(self):
+  def test_create_transaction_id_sync(self):
     project_id = 'guestbook'
     project_node = '/appscale/apps/{}'.format(project_id)
 
@@ -20,7 +27,7 @@ class TestDatastoreServer(unittest.TestCase):
     created_nodes = ['{}/txids/tx0000000000'.format(project_node),
                      '{}/txids/tx0000000001'.format(project_node)]
     zk_client.create = MagicMock(side_effect=created_nodes)
-    self.assertEqual(tx_manager.create_transaction_id(xg=False), 1)
+    self.assertEqual(tx_manager.create_transaction_id_sync(xg=False), 1)
     calls = [
       call('{}/txids/tx'.format(project_node), value=ANY, sequence=True),
       call('{}/txids/tx'.format(project_node), value=ANY, sequence=True)]
@@ -30,7 +37,7 @@ class TestDatastoreServer(unittest.TestCase):
     tx_manager._txid_manual_offset = 10
     created_nodes = ['{}/txids/tx0000000015'.format(project_node)]
     zk_client.create = MagicMock(side_effect=created_nodes)
-    self.assertEqual(tx_manager.create_transaction_id(xg=False), 25)
+    self.assertEqual(tx_manager.create_transaction_id_sync(xg=False), 25)
     calls = [
       call('{}/txids/tx'.format(project_node), value=ANY, sequence=True)]
     zk_client.create.assert_has_calls(calls)
@@ -42,7 +49,7 @@ class TestDatastoreServer(unittest.TestCase):
                      '{}/txids2/tx0000000000'.format(project_node)]
     zk_client.create = MagicMock(side_effect=created_nodes)
     zk_client.get_children = MagicMock(return_value=['txids', 'txids2'])
-    self.assertEqual(tx_manager.create_transaction_id(xg=False), 2147483648)
+    self.assertEqual(tx_manager.create_transaction_id_sync(xg=False), 2147483648)
     calls = [
       call('{}/txids/tx'.format(project_node), value=ANY, sequence=True),
       call('{}/txids2'.format(project_node)),
@@ -105,3 +112,61 @@ class TestDatastoreServer(unittest.TestCase):
     open_txids = [11, 12]
     self.assertListEqual(tx_manager.get_open_transactions(), open_txids)
     tx_manager._txid_manual_offset = 0
+
+
+class TestAsyncTransactionManager(testing.AsyncTestCase):
+  @testing.gen_test
+  def test_create_transaction_id(self):
+    project_id = 'guestbook'
+    project_node = '/appscale/apps/{}'.format(project_id)
+
+    zk_client = MagicMock()
+    tx_manager = ProjectTransactionManager(project_id, zk_client)
+    tornado_zk = MagicMock()
+    tx_manager._tornado_zk = tornado_zk
+
+    # Concurrent requests share a single ZooKeeper request.
+    created_nodes = ['{}/txids/tx0000000005'.format(project_node),
+                     '{}/txids/tx0000000006'.format(project_node)]
+    tornado_zk.commit = MagicMock(return_value=completed(created_nodes))
+    tornado_zk.create = MagicMock(return_value=completed(None))
+    txids = yield [tx_manager.create_transaction_id(xg=False),
+                   tx_manager.create_transaction_id(xg=True)]
+    self.assertListEqual(txids, [5, 6])
+    self.assertEqual(tornado_zk.commit.call_count, 1)
+    transaction = zk_client.transaction.return_value
+    transaction.create.assert_has_calls(
+      [call('{}/txids/tx'.format(project_node), value=ANY, sequence=True)] * 2)
+
+    # Only the cross-group transaction needs an extra node.
+    tornado_zk.create.assert_called_once_with(
+      '{}/txids/tx0000000006/xg'.format(project_node), value=ANY)
+
+    # Ensure the first created node is ignored.
+    created_nodes = [['{}/txids/tx0000000000'.format(project_node)],
+                     ['{}/txids/tx0000000001'.format(project_node)]]
+    tornado_zk.commit = MagicMock(
+      side_effect=[completed(nodes) for nodes in created_nodes])
+    tornado_zk.delete = MagicMock(return_value=completed(None))
+    txid = yield tx_manager.create_transaction_id(xg=False)
+    self.assertEqual(txid, 1)
+    tornado_zk.delete.assert_called_once_with(
+      '{}/txids/tx0000000000'.format(project_node))
+
+    # Requests that exhaust a container in the same batch only move to one
+    # new container.
+    created_nodes = [['{}/txids/tx-2147483647'.format(project_node),
+                      '{}/txids/tx-2147483646'.format(project_node)],
+                     ['{}/txids2/tx0000000000'.format(project_node),
+                      '{}/txids2/tx0000000001'.format(project_node)]]
+    tornado_zk.commit = MagicMock(
+      side_effect=[completed(nodes) for nodes in created_nodes])
+    tornado_zk.create = MagicMock(return_value=completed(None))
+    tornado_zk.get_children = MagicMock(
+      return_value=completed(['txids', 'txids2']))
+    txids = yield [tx_manager.create_transaction_id(xg=False),
+                   tx_manager.create_transaction_id(xg=False)]
+    self.assertListEqual(sorted(txids), [2147483648, 2147483649])
+    tornado_zk.create.assert_called_once_with(
+      '{}/txids2'.format(project_node))
+    self.assertEqual(zk_client.create.call_count, 0)
@@ -172,6 +172,31 @@ class RPC(object):
         self._exception._appengine_apiproxy_rpc = self
         raise
 
+# AppScale: Notified whenever a RealRPC call finishes.
+_finished = threading.Condition()
+
+
+def WaitAny(rpcs):
+  """ Blocks until one of the given low-level RPCs finishes.
+
+  Args:
+    rpcs: A list of running RPC instances.
+  Returns:
+    The first RPC found that has finished, or None if one of the RPCs cannot
+    report when it finishes.
+  """
+  if not rpcs or not all(isinstance(rpc, RealRPC) for rpc in rpcs):
+    return None
+
+  with _finished:
+    while True:
+      for rpc in rpcs:
+        if rpc.done():
+          return rpc
+
+      _finished.wait()
+
+
 # AppScale: Use thread to start RPC during _MakeCallImpl instead of during
 # _WaitImpl.
 class RealRPC(RPC):
@@ -187,6 +212,7 @@ class RealRPC(RPC):
     super(RealRPC, self).__init__(stub=stub)
     self._exc_info = None
     self._exc_info_lock = threading.Lock()
+    self._done = None
 
   def _MakeCallImpl(self):
     """ Starts the thread which calls upon the service RPC."""
@@ -197,10 +223,20 @@ class RealRPC(RPC):
     if hasattr(self.stub, '_GetRequestId'):
       args.extend([self.stub._GetRequestId(), os.environ.copy()])
 
-    self._thread = threading.Thread(target=self._make_sync_call, args=args)
+    # Clones share attributes, so each call gets its own event.
+    self._done = threading.Event()
+    self._thread = threading.Thread(target=self._run, args=args)
     self._thread.start()
     self._state = RPC.RUNNING
 
+  def done(self):
+    """ Checks if the service call has finished.
+
+    Returns:
+      A boolean.
+    """
+    return self._done is not None and self._done.is_set()
+
   def _WaitImpl(self):
     """ Waiting on an RPC call thread to complete """
     self._thread.join()
@@ -212,6 +248,19 @@ class RealRPC(RPC):
     self._Callback()
     return True
 
+  def _run(self, *args):
+    """ Makes the service call and lets waiters know when it finishes.
+
+    Args:
+      args: The arguments for _make_sync_call.
+    """
+    try:
+      self._make_sync_call(*args)
+    finally:
+      with _finished:
+        self._done.set()
+        _finished.notify_all()
+
   def _make_sync_call(self, service, call, request, response, request_id=None,
                       os_environ=None):
     """ A wrapper for MakeSyncCall that handles exceptions.
@@ -680,6 +680,14 @@ class UserRPC(object):
       return finished
     if running is None:
       return None
+
+    # AppScale: RPCs that run in the background can finish in any order, so
+    # wait for whichever one finishes first.
+    low_level_rpcs = [rpc.__rpc for rpc in rpcs]
+    first_done = apiproxy_rpc.WaitAny(low_level_rpcs)
+    if first_done is not None:
+      running = list(rpcs)[low_level_rpcs.index(first_done)]
+
     try:
       cls.__local.may_interrupt_wait = True
       try:
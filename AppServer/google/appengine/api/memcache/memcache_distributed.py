@@ -19,11 +19,14 @@
 Uses the python-memcached library to interface with memcached.
 """
 import base64
+import collections
 import cPickle
 import logging
 import hashlib
 import memcache
 import os
+import socket
+import threading
 import time
 
 from google.appengine.api import apiproxy_stub
@@ -37,9 +40,138 @@ MemcacheIncrementResponse = memcache_service_pb.MemcacheIncrementResponse
 MemcacheDeleteResponse = memcache_service_pb.MemcacheDeleteResponse
 
 from google.appengine.api.memcache import TYPE_INT
-from google.appengine.api.memcache import TYPE_LONG
 from google.appengine.api.memcache import MAX_KEY_SIZE
 
+# AppScale: Values are stored in memcached as they are, with the application's
+# flags and this bit in the memcached flags field. Entries without it were
+# written by earlier versions as pickled [flags, cas_id, value] lists.
+NATIVE_FLAG = 1 << 15
+
+# The memcached storage command for each set policy.
+STORE_COMMANDS = {
+  MemcacheSetRequest.SET: 'set',
+  MemcacheSetRequest.ADD: 'add',
+  MemcacheSetRequest.REPLACE: 'replace',
+  MemcacheSetRequest.CAS: 'cas'
+}
+
+# The set status for each memcached storage reply.
+STORE_STATUSES = {
+  'STORED': MemcacheSetResponse.STORED,
+  'NOT_STORED': MemcacheSetResponse.NOT_STORED,
+  'EXISTS': MemcacheSetResponse.EXISTS,
+  'NOT_FOUND': MemcacheSetResponse.NOT_STORED
+}
+
+# The memcached command for each increment direction.
+INCREMENT_COMMANDS = {
+  MemcacheIncrementRequest.INCREMENT: 'incr',
+  MemcacheIncrementRequest.DECREMENT: 'decr'
+}
+
+# The delete status for each memcached delete reply.
+DELETE_STATUSES = {
+  'DELETED': MemcacheDeleteResponse.DELETED,
+  'NOT_FOUND': MemcacheDeleteResponse.NOT_FOUND
+}
+
+
+class MemcachedError(Exception):
+  """ Indicates that a memcached server sent an unexpected reply. """
+  pass
+
+
+class LocalCache(object):
+  """ A size-bounded LRU cache of items that were fetched by this process. """
+  def __init__(self, max_size, ttl, gettime=time.time):
+    """ Creates a new LocalCache.
+
+    Args:
+      max_size: An integer specifying the maximum number of items to keep.
+      ttl: A float specifying how many seconds an item can be served for.
+      gettime: time.time()-like function used for testing.
+    """
+    self.max_size = max_size
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self.byte_hits = 0
+    self._gettime = gettime
+    self._items = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+    # Incremented whenever items are invalidated, so that values fetched
+    # before the invalidation are not cached.
+    self._generation = 0
+
+  @property
+  def generation(self):
+    return self._generation
+
+  def get_many(self, server_keys):
+    """ Fetches the items that are cached and have not expired.
+
+    Args:
+      server_keys: A list of memcached keys.
+    Returns:
+      A dictionary mapping memcached keys to (flags, value, cas_id) tuples.
+    """
+    now = self._gettime()
+    values = {}
+    with self._lock:
+      for server_key in server_keys:
+        expiration, entry = self._items.pop(server_key, (None, None))
+        if entry is None or expiration <= now:
+          self.misses += 1
+          continue
+
+        # Move the item to the end so that it is evicted last.
+        self._items[server_key] = (expiration, entry)
+        values[server_key] = entry
+        self.hits += 1
+        self.byte_hits += len(entry[1])
+
+    return values
+
+  def put_many(self, values, generation):
+    """ Caches items that were fetched from memcached.
+
+    Args:
+      values: A dictionary mapping memcached keys to (flags, value, cas_id)
+        tuples.
+      generation: The generation that the cache had before the items were
+        fetched.
+    """
+    expiration = self._gettime() + self.ttl
+    with self._lock:
+      if generation != self._generation:
+        return
+
+      for server_key, entry in values.iteritems():
+        self._items.pop(server_key, None)
+        self._items[server_key] = (expiration, entry)
+
+      while len(self._items) > self.max_size:
+        self._items.popitem(last=False)
+
+  def invalidate(self, server_keys):
+    """ Removes items that are being changed.
+
+    Args:
+      server_keys: A list of memcached keys.
+    """
+    with self._lock:
+      self._generation += 1
+      for server_key in server_keys:
+        self._items.pop(server_key, None)
+
+  def clear(self):
+    """ Removes all items. """
+    with self._lock:
+      self._generation += 1
+      self._items.clear()
+
+
 class MemcacheService(apiproxy_stub.APIProxyStub):
   """Python only memcache service.
 
@@ -56,16 +188,39 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
   # down).
   UPDATE_WINDOW = 60  # seconds
 
-  def __init__(self, gettime=time.time, service_name='memcache'):
+  # The number of times to retry a read-modify-write that loses a race.
+  CAS_RETRIES = 10
+
+  # The default number of items to keep in the local cache.
+  DEFAULT_L1_SIZE = 1000
+
+  # The default number of seconds that locally cached items are served for.
+  DEFAULT_L1_TTL = 1
+
+  def __init__(self, gettime=time.time, service_name='memcache',
+               l1_namespaces=(), l1_size=DEFAULT_L1_SIZE,
+               l1_ttl=DEFAULT_L1_TTL):
     """Initializer.
 
     Args:
       gettime: time.time()-like function used for testing.
       service_name: Service name expected for all calls.
+      l1_namespaces: A list of namespaces whose items are cached in this
+        process. Items in other namespaces are always fetched from memcached.
+      l1_size: An integer specifying the maximum number of locally cached
+        items.
+      l1_ttl: A float specifying how many seconds locally cached items are
+        served for. Changes made by other processes can take this long to be
+        seen.
     """
     super(MemcacheService, self).__init__(service_name)
     self._gettime = gettime
     self._memcache = None
+    self._l1_namespaces = set(l1_namespaces)
+    self._local_cache = None
+    if self._l1_namespaces:
+      self._local_cache = LocalCache(l1_size, l1_ttl, gettime)
+
     self.setupMemcacheClient()
 
   def setupMemcacheClient(self):
@@ -83,70 +238,77 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
 
   def _Dynamic_Get(self, request, response):
     """Implementation of gets for memcache.
-     
+
+    The keys for each memcached server are fetched with a single command.
+    Items in namespaces that are cached locally are only fetched if they
+    are not in the local cache.
+
     Args:
       request: A MemcacheGetRequest protocol buffer.
       response: A MemcacheGetResponse protocol buffer.
     """
-    for key in set(request.key_list()):
-      internal_key = self._GetKey(request.name_space(), key)
-      value = self._memcache.get(internal_key)
-      if value is None:
+    keys = list(set(request.key_list()))
+    server_keys = [self._GetKey(request.name_space(), key) for key in keys]
+    if self._UsesLocalCache(request.name_space()) and not request.for_cas():
+      generation = self._local_cache.generation
+      values = self._local_cache.get_many(server_keys)
+      fetched = self._GetValues(
+        [server_key for server_key in server_keys if server_key not in values])
+      self._local_cache.put_many(fetched, generation)
+      values.update(fetched)
+    else:
+      values = self._GetValues(server_keys, request.for_cas())
+    for key, server_key in zip(keys, server_keys):
+      if server_key not in values:
         continue
-      flags = 0
-      stored_flags, cas_id, stored_value = cPickle.loads(value)
-      flags |= stored_flags
+
+      flags, value, cas_id = values[server_key]
       item = response.add_item()
       item.set_key(key)
-      item.set_value(stored_value)
+      item.set_value(value)
       item.set_flags(flags)
       if request.for_cas():
         item.set_cas_id(cas_id)
 
   def _Dynamic_Set(self, request, response):
-    """Implementation of sets for memcache. 
+    """Implementation of sets for memcache.
+
+    The items for each memcached server are sent before any replies are read.
+    Compare-and-set uses memcached's own CAS IDs.
 
     Args:
       request: A MemcacheSetRequest.
       response: A MemcacheSetResponse.
     """
-    for item in request.item_list():
-      key = self._GetKey(request.name_space(), item.key())
-      set_policy = item.set_policy()
-      old_entry = self._memcache.get(key)
-      cas_id = 0
-      if old_entry:
-        _, cas_id, _ = cPickle.loads(old_entry)
-      set_status = MemcacheSetResponse.NOT_STORED
-
-      if ((set_policy == MemcacheSetRequest.SET) or
-        (set_policy == MemcacheSetRequest.ADD and old_entry is None) or
-        (set_policy == MemcacheSetRequest.REPLACE and
-        old_entry is not None)):
-
-        if (old_entry is None or set_policy == MemcacheSetRequest.SET):
-          set_status = MemcacheSetResponse.STORED
-
-      elif (set_policy == MemcacheSetRequest.CAS and item.for_cas() and
-        item.has_cas_id()):
-        if old_entry is None:
-          set_status = MemcacheSetResponse.NOT_STORED
-        elif cas_id != item.cas_id():
-          set_status = MemcacheSetResponse.EXISTS
-        else:
-          set_status = MemcacheSetResponse.STORED
-
-      if (set_status == MemcacheSetResponse.STORED
-        or set_policy == MemcacheSetRequest.REPLACE):
-
-        set_value = cPickle.dumps(
-          [item.flags(), cas_id + 1, item.value()])
-        if set_policy == MemcacheSetRequest.REPLACE:
-          self._memcache.replace(key, set_value)
-        else:
-          self._memcache.set(key, set_value, item.expiration_time())
-
-      response.add_set_status(set_status)
+    items = request.item_list()
+    server_keys = [self._GetKey(request.name_space(), item.key())
+                   for item in items]
+    statuses = [MemcacheSetResponse.ERROR] * len(items)
+    server_commands = {}
+    for server, entries in self._GroupByServer(server_keys).iteritems():
+      for index, server_key in entries:
+        item = items[index]
+        if (item.set_policy() == MemcacheSetRequest.CAS and
+            not item.has_cas_id()):
+          statuses[index] = MemcacheSetResponse.NOT_STORED
+          continue
+
+        command = self._StoreCommand(
+          STORE_COMMANDS[item.set_policy()], server_key, item.flags(),
+          item.expiration_time(), item.value(), item.cas_id())
+        server_commands.setdefault(server, []).append(
+          (index, command, self._ReadStoreStatus))
+
+    for index, status in self._RunCommands(server_commands):
+      statuses[index] = status
+
+    # Invalidate after the change, so gets that are already in progress can't
+    # cache the previous values.
+    if self._UsesLocalCache(request.name_space()):
+      self._local_cache.invalidate(server_keys)
+
+    for status in statuses:
+      response.add_set_status(status)
 
   def _Dynamic_Delete(self, request, response):
     """Implementation of delete in memcache.
@@ -155,62 +317,169 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheDeleteRequest protocol buffer.
       response: A MemcacheDeleteResponse protocol buffer.
     """
-    for item in request.item_list():
-      key = self._GetKey(request.name_space(), item.key())
-      entry = self._memcache.get(key)
-      delete_status = MemcacheDeleteResponse.DELETED
+    items = request.item_list()
+    server_keys = [self._GetKey(request.name_space(), item.key())
+                   for item in items]
+    statuses = [MemcacheDeleteResponse.NOT_FOUND] * len(items)
+    server_commands = {}
+    for server, entries in self._GroupByServer(server_keys).iteritems():
+      server_commands[server] = [
+        (index, 'delete %s\r\n' % server_key, self._ReadDeleteStatus)
+        for index, server_key in entries]
 
-      if entry is None:
-        delete_status = MemcacheDeleteResponse.NOT_FOUND
-      else:
-        self._memcache.delete(key)
+    for index, status in self._RunCommands(server_commands):
+      statuses[index] = status
+
+    if self._UsesLocalCache(request.name_space()):
+      self._local_cache.invalidate(server_keys)
 
-      response.add_delete_status(delete_status)
+    for status in statuses:
+      response.add_delete_status(status)
 
-  def _Increment(self, namespace, request):
-    """Internal function for incrementing from a MemcacheIncrementRequest.
+  def _Increment(self, namespace, requests):
+    """Applies increments with memcached's incr and decr commands.
+
+    The commands for each memcached server are sent before any replies are
+    read. Missing keys with an initial value are created with add, and the
+    increment is retried if another client creates the key first.
 
     Args:
-      namespace: A string containing the namespace for the request,
+      namespace: A string containing the namespace for the requests,
         if any. Pass an empty string if there is no namespace.
+      requests: A list of MemcacheIncrementRequest instances.
+
+    Returns:
+      A list containing an integer or long for each increment that was
+      successful and None for each one that failed.
+    """
+    server_keys = [self._GetKey(namespace, request.key())
+                   for request in requests]
+    new_values = [None] * len(requests)
+    pending = range(len(requests))
+    for _ in range(self.CAS_RETRIES):
+      if not pending:
+        break
+
+      server_commands = {}
+      groups = self._GroupByServer([server_keys[index] for index in pending])
+      for server, entries in groups.iteritems():
+        for position, server_key in entries:
+          request = requests[pending[position]]
+          command = INCREMENT_COMMANDS[request.direction()]
+          server_commands.setdefault(server, []).append(
+            (pending[position],
+             '%s %s %d\r\n' % (command, server_key, request.delta()),
+             self._ReadIncrement))
+
+      missing = []
+      for index, result in self._RunCommands(server_commands):
+        if result == 'NOT_FOUND':
+          if requests[index].has_initial_value():
+            missing.append(index)
+        elif result == 'CLIENT_ERROR':
+          # Values written by earlier versions are pickled.
+          new_values[index] = self._IncrementWithCas(server_keys[index],
+                                                     requests[index])
+        else:
+          new_values[index] = result
+
+      server_commands = {}
+      initial_values = {}
+      groups = self._GroupByServer([server_keys[index] for index in missing])
+      for server, entries in groups.iteritems():
+        for position, server_key in entries:
+          index = missing[position]
+          request = requests[index]
+          initial_values[index] = self._ApplyDelta(request.initial_value(),
+                                                   request)
+          flags = TYPE_INT
+          if request.has_initial_flags():
+            flags = request.initial_flags()
+
+          command = self._StoreCommand('add', server_key, flags, 0,
+                                       str(initial_values[index]))
+          server_commands.setdefault(server, []).append(
+            (index, command, self._ReadStoreStatus))
+
+      pending = []
+      for index, status in self._RunCommands(server_commands):
+        if status == MemcacheSetResponse.STORED:
+          new_values[index] = initial_values[index]
+        elif status == MemcacheSetResponse.NOT_STORED:
+          pending.append(index)
+
+    for index in pending:
+      logging.error('Unable to update {} after {} attempts'.format(
+        requests[index].key(), self.CAS_RETRIES))
+
+    if self._UsesLocalCache(namespace):
+      self._local_cache.invalidate(server_keys)
+
+    return new_values
+
+  def _IncrementWithCas(self, server_key, request):
+    """Increments a value that memcached can't increment itself.
+
+    The value is rewritten in the native format, so later increments can use
+    incr and decr.
+
+    Args:
+      server_key: A string specifying the memcached key.
       request: A MemcacheIncrementRequest instance.
 
     Returns:
       An integer or long if the offset was successful, None on error.
     """
-    if not request.delta():
+    server, _ = self._memcache._get_server(server_key)
+    if server is None:
       return None
 
-    cas_id = 0
+    for _ in range(self.CAS_RETRIES):
+      values = self._GetValues([server_key], for_cas=True)
+      if server_key not in values:
+        return None
 
-    key = self._GetKey(namespace, request.key())
-    value = self._memcache.get(key)
-    if value is None:
-      if not request.has_initial_value():
+      flags, stored_value, cas_id = values[server_key]
+      try:
+        old_value = long(stored_value)
+      except ValueError:
         return None
-      flags, cas_id, stored_value = (
-        TYPE_INT, cas_id, str(request.initial_value()))
-    else:
-      flags, cas_id, stored_value = cPickle.loads(value)
-
-    if flags == TYPE_INT:
-      new_value = int(stored_value)
-    elif flags == TYPE_LONG:
-      new_value = long(stored_value)
-
-    if request.direction() == MemcacheIncrementRequest.INCREMENT:
-      new_value += request.delta()
-    elif request.direction() == MemcacheIncrementRequest.DECREMENT:
-      new_value = max(new_value-request.delta(), 0)
-
-    new_stored_value = cPickle.dumps([flags, cas_id + 1, str(new_value)])
-    try:
-      self._memcache.cas(key, new_stored_value)
-    except Exception, e:
-      logging.error(str(e))
-      return None
 
-    return new_value
+      if old_value < 0:
+        return None
+
+      new_value = self._ApplyDelta(old_value, request)
+      command = self._StoreCommand('cas', server_key, flags, 0,
+                                   str(new_value), cas_id)
+      results = self._RunCommands(
+        {server: [(None, command, self._ReadStoreStatus)]})
+      if not results:
+        return None
+
+      if results[0][1] == MemcacheSetResponse.STORED:
+        return new_value
+
+      if results[0][1] != MemcacheSetResponse.EXISTS:
+        return None
+
+    logging.error('Unable to update {} after {} attempts'.format(
+      request.key(), self.CAS_RETRIES))
+    return None
+
+  def _ApplyDelta(self, value, request):
+    """Offsets a value the way memcached does.
+
+    Args:
+      value: An integer or long containing the current value.
+      request: A MemcacheIncrementRequest instance.
+    Returns:
+      An integer or long. Decrements stop at zero and increments wrap around
+      at 2^64.
+    """
+    if request.direction() == MemcacheIncrementRequest.DECREMENT:
+      return max(value - request.delta(), 0)
+
+    return (value + request.delta()) % 2 ** 64
 
   def _Dynamic_Increment(self, request, response):
     """Implementation of increment for memcache.
@@ -219,7 +488,7 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheIncrementRequest protocol buffer.
       response: A MemcacheIncrementResponse protocol buffer.
     """
-    new_value = self._Increment(request.name_space(), request)
+    new_value = self._Increment(request.name_space(), [request])[0]
     if new_value is None:
       raise apiproxy_errors.ApplicationError(
         memcache_service_pb.MemcacheServiceError.UNSPECIFIED_ERROR)
@@ -233,9 +502,8 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheBatchIncrementRequest protocol buffer.
       response: A MemcacheBatchIncrementResponse protocol buffer.
     """
-    namespace = request.name_space()
-    for request_item in request.item_list():
-      new_value = self._Increment(namespace, request_item)
+    new_values = self._Increment(request.name_space(), request.item_list())
+    for new_value in new_values:
       item = response.add_item()
       if new_value is None:
         item.set_increment_status(MemcacheIncrementResponse.NOT_CHANGED)
@@ -250,6 +518,9 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       request: A MemcacheFlushRequest.
       response: A MemcacheFlushResponse.
     """
+    if self._local_cache is not None:
+      self._local_cache.clear()
+
     self._memcache.flush_all()
 
   def _Dynamic_Stats(self, request, response):
@@ -284,6 +555,12 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
       bytes_total += get_stats_value(server_stats, 'bytes') 
       time_total += get_stats_value(server_stats, 'time', float) 
    
+    # Gets that were served locally did not reach memcached. The local misses
+    # are not added because memcached counts those gets.
+    if self._local_cache is not None:
+      hits_total += self._local_cache.hits
+      byte_hits_total += self._local_cache.byte_hits
+
     stats.set_hits(hits_total)
     stats.set_misses(misses_total)
     stats.set_byte_hits(byte_hits_total)
@@ -295,6 +572,208 @@ class MemcacheService(apiproxy_stub.APIProxyStub):
     # may not be expecting an int.
     stats.set_oldest_item_age(int(time.time() - time_total / num_servers))
    
+  def _UsesLocalCache(self, namespace):
+    """Checks if items in a namespace are cached in this process.
+
+    Args:
+      namespace: A string containing the namespace.
+    Returns:
+      A boolean.
+    """
+    return namespace in self._l1_namespaces
+
+  def _GetValues(self, server_keys, for_cas=False):
+    """Fetches values with one get or gets command for each server.
+
+    Args:
+      server_keys: A list of memcached keys.
+      for_cas: A boolean indicating that CAS IDs are needed.
+    Returns:
+      A dictionary mapping memcached keys to (flags, value, cas_id) tuples.
+    """
+    command = 'gets' if for_cas else 'get'
+    server_commands = {}
+    for server, entries in self._GroupByServer(server_keys).iteritems():
+      keys = ' '.join(server_key for _, server_key in entries)
+      server_commands[server] = [
+        (None, '%s %s\r\n' % (command, keys), self._ReadValues)]
+
+    values = {}
+    for _, server_values in self._RunCommands(server_commands):
+      values.update(server_values)
+
+    return values
+
+  def _GroupByServer(self, server_keys):
+    """Finds the memcached server for each key.
+
+    Args:
+      server_keys: A list of memcached keys.
+    Returns:
+      A dictionary mapping servers to lists of (index, key) tuples. Keys
+      without an available server are left out.
+    """
+    groups = {}
+    for index, server_key in enumerate(server_keys):
+      server, _ = self._memcache._get_server(server_key)
+      if server is not None:
+        groups.setdefault(server, []).append((index, server_key))
+
+    return groups
+
+  def _RunCommands(self, server_commands):
+    """Sends commands to each server before reading any of the replies.
+
+    Args:
+      server_commands: A dictionary mapping servers to lists of
+        (index, command, reader) tuples. The reader is a function that takes
+        the server and returns the parsed reply.
+    Returns:
+      A list of (index, result) tuples for the replies that were read.
+    """
+    sent = []
+    for server, commands in server_commands.iteritems():
+      try:
+        server.send_cmds(''.join(command for _, command, _ in commands))
+      except socket.error as error:
+        server.mark_dead(str(error))
+        continue
+
+      sent.append((server, commands))
+
+    results = []
+    for server, commands in sent:
+      try:
+        for index, _, reader in commands:
+          results.append((index, reader(server)))
+      except (MemcachedError, memcache._Error) as error:
+        # The remaining replies can't be matched with their commands.
+        logging.error('Unexpected reply from {}: {}'.format(server, error))
+        server.close_socket()
+      except socket.error as error:
+        server.mark_dead(str(error))
+
+    return results
+
+  def _StoreCommand(self, command, server_key, flags, expiration_time, value,
+                    cas_id=None):
+    """Formats a memcached storage command.
+
+    Args:
+      command: A string specifying the storage command.
+      server_key: A string specifying the memcached key.
+      flags: An integer containing the application's flags for the value.
+      expiration_time: An integer specifying when the value expires.
+      value: A string containing the value to store.
+      cas_id: An integer specifying the CAS ID for cas commands.
+    Returns:
+      A string containing the command.
+    """
+    header = '%s %s %d %d %d' % (command, server_key, flags | NATIVE_FLAG,
+                                 expiration_time, len(value))
+    if command == 'cas':
+      header += ' %d' % cas_id
+
+    return '%s\r\n%s\r\n' % (header, value)
+
+  def _ReadLine(self, server):
+    """Reads a reply line from a server.
+
+    Args:
+      server: A memcache server.
+    Returns:
+      A string containing the line.
+    Raises:
+      MemcachedError if the connection was closed.
+    """
+    line = server.readline()
+    if not line:
+      raise MemcachedError('Connection closed')
+
+    return line
+
+  def _ReadValues(self, server):
+    """Reads the reply to a get or gets command.
+
+    Args:
+      server: A memcache server.
+    Returns:
+      A dictionary mapping memcached keys to (flags, value, cas_id) tuples.
+    """
+    values = {}
+    while True:
+      line = self._ReadLine(server)
+      if line == 'END':
+        return values
+
+      parts = line.split()
+      if parts[0] != 'VALUE':
+        raise MemcachedError(line)
+
+      server_key, flags, length = parts[1], int(parts[2]), int(parts[3])
+      cas_id = int(parts[4]) if len(parts) > 4 else 0
+      data = server.recv(length + 2)[:-2]
+      if flags & NATIVE_FLAG:
+        values[server_key] = (flags & ~NATIVE_FLAG, data, cas_id)
+      else:
+        stored_flags, _, stored_value = cPickle.loads(data)
+        values[server_key] = (stored_flags, stored_value, cas_id)
+
+  def _ReadStoreStatus(self, server):
+    """Reads the reply to a storage command.
+
+    Args:
+      server: A memcache server.
+    Returns:
+      A MemcacheSetResponse status.
+    """
+    line = self._ReadLine(server)
+    if line in STORE_STATUSES:
+      return STORE_STATUSES[line]
+
+    if line.startswith('SERVER_ERROR'):
+      # The server rejected the value, but the connection is still usable.
+      logging.warning('Unable to store value: {}'.format(line))
+      return MemcacheSetResponse.ERROR
+
+    raise MemcachedError(line)
+
+  def _ReadIncrement(self, server):
+    """Reads the reply to an incr or decr command.
+
+    Args:
+      server: A memcache server.
+    Returns:
+      An integer or long containing the new value, 'NOT_FOUND' if the key
+      does not exist, or 'CLIENT_ERROR' if the value is not an unsigned
+      integer.
+    """
+    line = self._ReadLine(server).rstrip()
+    if line.isdigit():
+      return int(line)
+
+    if line == 'NOT_FOUND':
+      return line
+
+    if line.startswith('CLIENT_ERROR'):
+      return 'CLIENT_ERROR'
+
+    raise MemcachedError(line)
+
+  def _ReadDeleteStatus(self, server):
+    """Reads the reply to a delete command.
+
+    Args:
+      server: A memcache server.
+    Returns:
+      A MemcacheDeleteResponse status.
+    """
+    line = self._ReadLine(server)
+    if line not in DELETE_STATUSES:
+      raise MemcachedError(line)
+
+    return DELETE_STATUSES[line]
+
   def _GetKey(self, namespace, key):
     """Used to get the Memcache key. It is encoded because the sdk
     allows special characters but the Memcache client does not.
@@ -0,0 +1,149 @@
+""" A memcached server that keeps items in memory for tests and benchmarks.
+
+It implements the text protocol commands that the memcache stub uses.
+"""
+import SocketServer
+import threading
+
+
+class FakeMemcachedHandler(SocketServer.StreamRequestHandler):
+  """ Handles commands from one client connection. """
+  # Like memcached, reply without waiting to fill a packet.
+  disable_nagle_algorithm = True
+
+  def handle(self):
+    while True:
+      line = self.rfile.readline()
+      if not line:
+        return
+
+      parts = line.split()
+      if not parts:
+        self.wfile.write('ERROR\r\n')
+        continue
+
+      self.server.commands += 1
+      handler = getattr(self, 'do_' + parts[0], None)
+      if handler is None:
+        self.wfile.write('ERROR\r\n')
+        continue
+
+      self.wfile.write(handler(*parts[1:]))
+
+  def do_get(self, *keys):
+    return self._values(keys, with_cas=False)
+
+  def do_gets(self, *keys):
+    return self._values(keys, with_cas=True)
+
+  def _values(self, keys, with_cas):
+    reply = []
+    with self.server.lock:
+      for key in keys:
+        if key not in self.server.items:
+          continue
+
+        flags, value, cas_id = self.server.items[key]
+        header = 'VALUE %s %d %d' % (key, flags, len(value))
+        if with_cas:
+          header += ' %d' % cas_id
+
+        reply.append('%s\r\n%s\r\n' % (header, value))
+
+    reply.append('END\r\n')
+    return ''.join(reply)
+
+  def _store(self, command, key, flags, exptime, length, cas_id=None):
+    value = self.rfile.read(int(length) + 2)[:-2]
+    with self.server.lock:
+      existing = self.server.items.get(key)
+      if command == 'add' and existing is not None:
+        return 'NOT_STORED\r\n'
+
+      if command == 'replace' and existing is None:
+        return 'NOT_STORED\r\n'
+
+      if command == 'cas':
+        if existing is None:
+          return 'NOT_FOUND\r\n'
+
+        if existing[2] != int(cas_id):
+          return 'EXISTS\r\n'
+
+      self.server.items[key] = (int(flags), value, self.server.next_cas())
+
+    return 'STORED\r\n'
+
+  def do_set(self, *args):
+    return self._store('set', *args)
+
+  def do_add(self, *args):
+    return self._store('add', *args)
+
+  def do_replace(self, *args):
+    return self._store('replace', *args)
+
+  def do_cas(self, *args):
+    return self._store('cas', *args)
+
+  def do_delete(self, key, *args):
+    with self.server.lock:
+      if self.server.items.pop(key, None) is None:
+        return 'NOT_FOUND\r\n'
+
+    return 'DELETED\r\n'
+
+  def _incrdecr(self, key, delta, direction):
+    with self.server.lock:
+      if key not in self.server.items:
+        return 'NOT_FOUND\r\n'
+
+      flags, value, _ = self.server.items[key]
+      if not value.isdigit():
+        return ('CLIENT_ERROR cannot increment or decrement non-numeric '
+                'value\r\n')
+
+      new_value = int(value) + direction * int(delta)
+      new_value = max(new_value, 0) % 2 ** 64
+      self.server.items[key] = (flags, str(new_value), self.server.next_cas())
+
+    return '%d\r\n' % new_value
+
+  def do_incr(self, key, delta):
+    return self._incrdecr(key, delta, 1)
+
+  def do_decr(self, key, delta):
+    return self._incrdecr(key, delta, -1)
+
+  def do_flush_all(self, *args):
+    with self.server.lock:
+      self.server.items.clear()
+
+    return 'OK\r\n'
+
+
+class FakeMemcached(SocketServer.ThreadingTCPServer):
+  """ A memcached server that listens on a local port. """
+  daemon_threads = True
+  allow_reuse_address = True
+
+  def __init__(self, port=0):
+    SocketServer.ThreadingTCPServer.__init__(self, ('127.0.0.1', port),
+                                             FakeMemcachedHandler)
+    self.items = {}
+    self.commands = 0
+    self.lock = threading.Lock()
+    self._cas_id = 0
+
+  @property
+  def location(self):
+    return '127.0.0.1:%d' % self.server_address[1]
+
+  def next_cas(self):
+    self._cas_id += 1
+    return self._cas_id
+
+  def start(self):
+    thread = threading.Thread(target=self.serve_forever)
+    thread.daemon = True
+    thread.start()
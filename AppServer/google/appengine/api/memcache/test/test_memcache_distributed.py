@@ -0,0 +1,264 @@
+import cPickle
+import os
+import sys
+import threading
+import unittest
+
+import memcache
+
+appserver = "{0}/../../../../..".format(os.path.dirname(__file__))
+sys.path.append(appserver)
+sys.path.append(os.path.dirname(__file__))
+from fake_memcached import FakeMemcached
+from google.appengine.api.memcache import memcache_distributed
+from google.appengine.api.memcache import memcache_service_pb
+from google.appengine.api.memcache import TYPE_INT
+
+MemcacheSetRequest = memcache_service_pb.MemcacheSetRequest
+MemcacheSetResponse = memcache_service_pb.MemcacheSetResponse
+MemcacheDeleteResponse = memcache_service_pb.MemcacheDeleteResponse
+MemcacheIncrementResponse = memcache_service_pb.MemcacheIncrementResponse
+
+
+class TestMemcacheService(unittest.TestCase):
+  def setUp(self):
+    os.environ['APPNAME'] = 'guestbook'
+    self.servers = [FakeMemcached(), FakeMemcached()]
+    for server in self.servers:
+      server.start()
+      self.addCleanup(server.server_close)
+      self.addCleanup(server.shutdown)
+
+    self.stub = memcache_distributed.MemcacheService()
+    self.stub._memcache = memcache.Client(
+      [server.location for server in self.servers])
+    self.addCleanup(self.stub._memcache.disconnect_all)
+
+  def set(self, items, policy=MemcacheSetRequest.SET):
+    request = memcache_service_pb.MemcacheSetRequest()
+    for key, value, cas_id in items:
+      item = request.add_item()
+      item.set_key(key)
+      item.set_value(value)
+      item.set_flags(TYPE_INT)
+      item.set_set_policy(policy)
+      if cas_id is not None:
+        item.set_cas_id(cas_id)
+
+    response = memcache_service_pb.MemcacheSetResponse()
+    self.stub._Dynamic_Set(request, response)
+    return response.set_status_list()
+
+  def get(self, keys, for_cas=False):
+    request = memcache_service_pb.MemcacheGetRequest()
+    for key in keys:
+      request.add_key(key)
+
+    request.set_for_cas(for_cas)
+    response = memcache_service_pb.MemcacheGetResponse()
+    self.stub._Dynamic_Get(request, response)
+    return {item.key(): item for item in response.item_list()}
+
+  def commands(self):
+    return sum(server.commands for server in self.servers)
+
+  def test_multi(self):
+    keys = ['key{}'.format(index) for index in range(20)]
+    statuses = self.set([(key, key, None) for key in keys])
+    self.assertEqual(statuses, [MemcacheSetResponse.STORED] * len(keys))
+
+    # Each server gets one command for all of its keys.
+    commands = self.commands()
+    items = self.get(keys + ['missing'])
+    self.assertEqual(self.commands() - commands, len(self.servers))
+    self.assertItemsEqual(items.keys(), keys)
+    self.assertEqual(items['key1'].value(), 'key1')
+    self.assertEqual(items['key1'].flags(), TYPE_INT)
+
+    request = memcache_service_pb.MemcacheDeleteRequest()
+    request.add_item().set_key('key1')
+    request.add_item().set_key('missing')
+    response = memcache_service_pb.MemcacheDeleteResponse()
+    self.stub._Dynamic_Delete(request, response)
+    self.assertEqual(response.delete_status_list(),
+                     [MemcacheDeleteResponse.DELETED,
+                      MemcacheDeleteResponse.NOT_FOUND])
+    self.assertNotIn('key1', self.get(['key1']))
+
+  def test_policies(self):
+    self.set([('key1', '1', None)])
+    self.assertEqual(
+      self.set([('key1', '2', None), ('key2', '2', None)],
+               MemcacheSetRequest.ADD),
+      [MemcacheSetResponse.NOT_STORED, MemcacheSetResponse.STORED])
+    self.assertEqual(
+      self.set([('key1', '3', None), ('key3', '3', None)],
+               MemcacheSetRequest.REPLACE),
+      [MemcacheSetResponse.STORED, MemcacheSetResponse.NOT_STORED])
+    self.assertEqual(self.get(['key1'])['key1'].value(), '3')
+
+  def test_cas(self):
+    self.set([('key1', '1', None)])
+    cas_id = self.get(['key1'], for_cas=True)['key1'].cas_id()
+
+    # A CAS set fails if the item changed after it was fetched.
+    self.assertEqual(self.set([('key1', '2', cas_id)], MemcacheSetRequest.CAS),
+                     [MemcacheSetResponse.STORED])
+    self.assertEqual(self.set([('key1', '3', cas_id)], MemcacheSetRequest.CAS),
+                     [MemcacheSetResponse.EXISTS])
+    self.assertEqual(self.set([('missing', '3', 1)], MemcacheSetRequest.CAS),
+                     [MemcacheSetResponse.NOT_STORED])
+    self.assertEqual(self.get(['key1'])['key1'].value(), '2')
+
+  def test_increment(self):
+    self.set([('counter', '5', None)])
+    request = memcache_service_pb.MemcacheIncrementRequest()
+    request.set_key('counter')
+    request.set_delta(3)
+    response = memcache_service_pb.MemcacheIncrementResponse()
+    self.stub._Dynamic_Increment(request, response)
+    self.assertEqual(response.new_value(), 8)
+
+    # Decrements stop at zero.
+    request.set_direction(
+      memcache_service_pb.MemcacheIncrementRequest.DECREMENT)
+    request.set_delta(10)
+    self.stub._Dynamic_Increment(request, response)
+    self.assertEqual(response.new_value(), 0)
+
+    # Missing keys start at the initial value.
+    request = memcache_service_pb.MemcacheIncrementRequest()
+    request.set_key('missing')
+    request.set_delta(2)
+    request.set_initial_value(10)
+    self.stub._Dynamic_Increment(request, response)
+    self.assertEqual(response.new_value(), 12)
+    self.assertEqual(self.get(['missing'])['missing'].value(), '12')
+
+  def test_batch_increment(self):
+    self.set([('key{}'.format(index), '5', None) for index in range(10)])
+    self.set([('text', 'abc', None)])
+    request = memcache_service_pb.MemcacheBatchIncrementRequest()
+    for index in range(10):
+      item = request.add_item()
+      item.set_key('key{}'.format(index))
+      item.set_delta(index)
+
+    request.add_item().set_key('text')
+    request.add_item().set_key('missing')
+
+    # Each key takes one incr, and the value that memcached can't increment
+    # is checked with one gets.
+    commands = self.commands()
+    response = memcache_service_pb.MemcacheBatchIncrementResponse()
+    self.stub._Dynamic_BatchIncrement(request, response)
+    self.assertEqual(self.commands() - commands, 13)
+    self.assertEqual([item.new_value() for item in response.item_list()[:10]],
+                     [5 + index for index in range(10)])
+    self.assertEqual(
+      [item.increment_status() for item in response.item_list()[10:]],
+      [MemcacheIncrementResponse.NOT_CHANGED] * 2)
+
+  def test_concurrent_increments(self):
+    self.set([('counter', '0', None)])
+
+    def increment():
+      request = memcache_service_pb.MemcacheIncrementRequest()
+      request.set_key('counter')
+      stub = memcache_distributed.MemcacheService()
+      stub._memcache = memcache.Client(
+        [server.location for server in self.servers])
+      for _ in range(50):
+        stub._Dynamic_Increment(
+          request, memcache_service_pb.MemcacheIncrementResponse())
+
+      stub._memcache.disconnect_all()
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(self.get(['counter'])['counter'].value(), '200')
+
+  def test_legacy_entries(self):
+    # Values written by earlier versions are still readable.
+    server_key = self.stub._GetKey('', 'legacy')
+    self.stub._memcache.set(server_key, cPickle.dumps([TYPE_INT, 3, '5']))
+    item = self.get(['legacy'])['legacy']
+    self.assertEqual(item.value(), '5')
+    self.assertEqual(item.flags(), TYPE_INT)
+
+    # Incrementing a legacy entry stores it in the native format.
+    request = memcache_service_pb.MemcacheIncrementRequest()
+    request.set_key('legacy')
+    response = memcache_service_pb.MemcacheIncrementResponse()
+    self.stub._Dynamic_Increment(request, response)
+    self.assertEqual(response.new_value(), 6)
+    self.stub._Dynamic_Increment(request, response)
+    self.assertEqual(response.new_value(), 7)
+
+  def test_local_cache(self):
+    now = [1000.0]
+    stub = memcache_distributed.MemcacheService(
+      gettime=lambda: now[0], l1_namespaces=[''], l1_ttl=5)
+    stub._memcache = self.stub._memcache
+    self.stub = stub
+    self.set([('key1', '1', None)])
+    self.assertEqual(self.get(['key1'])['key1'].value(), '1')
+
+    # Repeated gets are served locally.
+    commands = self.commands()
+    self.assertEqual(self.get(['key1'])['key1'].value(), '1')
+    self.assertEqual(self.commands(), commands)
+
+    # Local changes invalidate the cached item.
+    self.set([('key1', '2', None)])
+    self.assertEqual(self.get(['key1'])['key1'].value(), '2')
+
+    # Changes made elsewhere are seen once the item expires.
+    self.servers[0].items.clear()
+    self.servers[1].items.clear()
+    self.assertIn('key1', self.get(['key1']))
+    now[0] += 5
+    self.assertNotIn('key1', self.get(['key1']))
+
+    self.assertEqual(stub._local_cache.hits, 2)
+
+  def test_local_cache_namespaces(self):
+    stub = memcache_distributed.MemcacheService(l1_namespaces=['config'])
+    stub._memcache = self.stub._memcache
+    self.stub = stub
+    self.set([('key1', '1', None)])
+    self.get(['key1'])
+    commands = self.commands()
+    self.get(['key1'])
+    self.assertEqual(self.commands() - commands, 1)
+
+
+class TestLocalCache(unittest.TestCase):
+  def test_eviction(self):
+    cache = memcache_distributed.LocalCache(max_size=2, ttl=10)
+    cache.put_many({'key1': (0, '1', 0), 'key2': (0, '2', 0)},
+                   cache.generation)
+
+    # The least recently used item is evicted first.
+    cache.get_many(['key1'])
+    cache.put_many({'key3': (0, '3', 0)}, cache.generation)
+    self.assertItemsEqual(cache.get_many(['key1', 'key2', 'key3']).keys(),
+                          ['key1', 'key3'])
+
+  def test_invalidation(self):
+    cache = memcache_distributed.LocalCache(max_size=10, ttl=10)
+    generation = cache.generation
+    cache.invalidate(['key1'])
+
+    # Values fetched before an invalidation are not cached.
+    cache.put_many({'key1': (0, '1', 0)}, generation)
+    self.assertEqual(cache.get_many(['key1']), {})
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,93 @@
+import os
+import sys
+import threading
+import unittest
+
+appserver = "{0}/../../../..".format(os.path.dirname(__file__))
+sys.path.append(appserver)
+sys.path.append(os.path.join(appserver, 'lib', 'fancy_urllib'))
+sys.path.append(os.path.join(appserver, 'lib', 'protorpc'))
+from google.appengine.api import apiproxy_rpc
+from google.appengine.api import apiproxy_stub_map
+from google.appengine.api import api_base_pb
+from google.appengine.ext.remote_api import remote_api_stub
+from google.appengine.tools.devappserver2.python import request_state
+from google.appengine.tools.devappserver2.python import sandbox
+
+
+class FakeStub(object):
+  """ Finishes each call when its event is set. """
+  def __init__(self):
+    self.events = {}
+
+  def CreateRPC(self):
+    return apiproxy_rpc.RealRPC(stub=self)
+
+  def MakeSyncCall(self, service, call, request, response):
+    self.events[request.value()].wait()
+    if request.value() == 'error':
+      raise ValueError('error')
+
+    response.set_value(request.value())
+
+
+class TestRealRPC(unittest.TestCase):
+  def setUp(self):
+    self.stub = FakeStub()
+    self.stubmap = apiproxy_stub_map.APIProxyStubMap()
+    self.stubmap.RegisterStub('fake', self.stub)
+
+  def call(self, value):
+    self.stub.events[value] = threading.Event()
+    request = api_base_pb.StringProto()
+    request.set_value(value)
+    rpc = apiproxy_stub_map.UserRPC('fake', stubmap=self.stubmap)
+    rpc.make_call('Call', request, api_base_pb.StringProto())
+    return rpc
+
+  def test_wait_any(self):
+    slow = self.call('slow')
+    fast = self.call('fast')
+
+    # The RPC that finishes first is returned even if it is listed last.
+    self.stub.events['fast'].set()
+    self.assertIs(apiproxy_stub_map.UserRPC.wait_any([slow, fast]), fast)
+    self.assertEqual(fast.get_result(), None)
+    self.assertEqual(fast.response.value(), 'fast')
+
+    self.stub.events['slow'].set()
+    self.assertIs(apiproxy_stub_map.UserRPC.wait_any([slow]), slow)
+    self.assertEqual(slow.response.value(), 'slow')
+
+  def test_error(self):
+    rpc = self.call('error')
+    self.stub.events['error'].set()
+    with self.assertRaises(ValueError):
+      rpc.check_success()
+
+  def test_request_ends(self):
+    def handle_request():
+      remote_api_stub.RemoteStub._SetRequestId('request-1')
+      request_state.start_request('request-1')
+      base_start_new_thread = threading._start_new_thread
+      # The sandbox makes each request wait for the threads it starts.
+      threading._start_new_thread = \
+        sandbox._make_request_id_aware_start_new_thread(base_start_new_thread)
+      try:
+        rpc = self.call('value')
+      finally:
+        threading._start_new_thread = base_start_new_thread
+
+      self.stub.events['value'].set()
+      rpc.wait()
+      request_state.end_request('request-1')
+
+    request = threading.Thread(target=handle_request)
+    request.daemon = True
+    request.start()
+    request.join(5)
+    self.assertFalse(request.is_alive())
+
+
+if __name__ == '__main__':
+  unittest.main()
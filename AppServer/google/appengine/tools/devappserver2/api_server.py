@@ -235,7 +235,10 @@ def setup_stubs(
     user_logout_url,
     default_gcs_bucket_name,
     uaserver_path,
-    xmpp_path):
+    xmpp_path,
+    memcache_l1_namespaces,
+    memcache_l1_size,
+    memcache_l1_ttl):
   """Configures the APIs hosted by this server.
 
   Args:
@@ -292,6 +295,12 @@ def setup_stubs(
         of the machine that runs a UserAppServer.
     xmpp_path: (AppScale-specific) A str containing the FQDN or IP address of
         the machine that runs ejabberd, where XMPP clients should connect to.
+    memcache_l1_namespaces: (AppScale-specific) A list of memcache namespaces
+        whose items should also be cached in this process.
+    memcache_l1_size: (AppScale-specific) An int specifying the maximum number
+        of memcache items to cache in this process.
+    memcache_l1_ttl: (AppScale-specific) A float specifying how many seconds
+        memcache items cached in this process can be served for.
   """
 
   identity_stub = app_identity_stub.AppIdentityServiceStub()
@@ -362,7 +371,10 @@ def setup_stubs(
 
   apiproxy_stub_map.apiproxy.RegisterStub(
       'memcache',
-      memcache_distributed.MemcacheService())
+      memcache_distributed.MemcacheService(
+          l1_namespaces=memcache_l1_namespaces,
+          l1_size=memcache_l1_size,
+          l1_ttl=memcache_l1_ttl))
 
   apiproxy_stub_map.apiproxy.RegisterStub(
       'search',
@@ -488,7 +500,10 @@ def test_setup_stubs(
     user_logout_url='/_ah/login?continue=%s',
     default_gcs_bucket_name=None,
     uaserver_path='localhost',
-    xmpp_path='localhost'):
+    xmpp_path='localhost',
+    memcache_l1_namespaces=(),
+    memcache_l1_size=memcache_distributed.MemcacheService.DEFAULT_L1_SIZE,
+    memcache_l1_ttl=memcache_distributed.MemcacheService.DEFAULT_L1_TTL):
   """Similar to setup_stubs with reasonable test defaults and recallable."""
 
   # Reset the stub map between requests because a stub map only allows a
@@ -524,7 +539,10 @@ def test_setup_stubs(
               user_logout_url,
               default_gcs_bucket_name,
               uaserver_path,
-              xmpp_path)
+              xmpp_path,
+              memcache_l1_namespaces,
+              memcache_l1_size,
+              memcache_l1_ttl)
 
 
 def cleanup_stubs():
@@ -27,6 +27,7 @@ import sys
 import tempfile
 import time
 
+from google.appengine.api.memcache import memcache_distributed
 from google.appengine.datastore import datastore_stub_util
 from google.appengine.tools import boolean_action
 from google.appengine.tools.devappserver2.admin import admin_server
@@ -500,6 +501,21 @@ def create_command_line_parser():
     default=False,
     help='if this application can read data stored by other applications.')
   appscale_group.add_argument('--pidfile', help='create pidfile at location')
+  appscale_group.add_argument(
+    '--memcache_l1_namespace', action='append', default=[],
+    dest='memcache_l1_namespaces',
+    help='a memcache namespace whose items should also be cached in the API '
+    'server process. Can be given more than once.')
+  appscale_group.add_argument(
+    '--memcache_l1_size', type=int,
+    default=memcache_distributed.MemcacheService.DEFAULT_L1_SIZE,
+    help='the maximum number of memcache items to cache in the API server '
+    'process.')
+  appscale_group.add_argument(
+    '--memcache_l1_ttl', type=float,
+    default=memcache_distributed.MemcacheService.DEFAULT_L1_TTL,
+    help='the number of seconds that memcache items cached in the API server '
+    'process can be served for.')
 
   return parser
 
@@ -730,7 +746,10 @@ class DevelopmentServer(object):
         user_logout_url=user_logout_url,
         default_gcs_bucket_name=options.default_gcs_bucket_name,
         uaserver_path=options.uaserver_path,
-        xmpp_path=options.xmpp_path)
+        xmpp_path=options.xmpp_path,
+        memcache_l1_namespaces=options.memcache_l1_namespaces,
+        memcache_l1_size=options.memcache_l1_size,
+        memcache_l1_ttl=options.memcache_l1_ttl)
 
     # The APIServer must bind to localhost because that is what the runtime
     # instances talk to.
@@ -19,10 +19,14 @@
 
 
 import array
+import errno
 import httplib
 import os
 import re
+import socket
 import struct
+import threading
+import time
 
 __all__ = ['ProtocolMessage', 'Encoder', 'Decoder',
            'ExtendableProtocolMessage',
@@ -33,6 +37,99 @@ __all__ = ['ProtocolMessage', 'Encoder', 'Decoder',
 
 URL_RE = re.compile('^(https?)://([^/]+)(/.*)$')
 
+
+# AppScale: API RPCs reuse keep-alive connections to the API servers instead
+# of opening a new connection for each request.
+class APIConnectionPool(object):
+  """Keeps idle connections to each API server for later RPCs.
+
+  The pool is shared by all threads in a process. Connections are keyed by
+  server and TLS settings.
+  """
+
+  # The maximum number of idle connections to keep for each server.
+  MAX_IDLE = 10
+
+  # The number of seconds a connection can stay idle before it is closed.
+  IDLE_TIMEOUT = 30
+
+  def __init__(self, max_idle=MAX_IDLE, idle_timeout=IDLE_TIMEOUT):
+    self.max_idle = max_idle
+    self.idle_timeout = idle_timeout
+    self._idle = {}
+    self._lock = threading.Lock()
+    self._pid = os.getpid()
+
+  def acquire(self, server, secure=0, keyfile=None, certfile=None):
+    """Takes an idle connection to a server or opens a new one.
+
+    Returns:
+      A tuple containing the connection and a boolean indicating whether or
+      not the connection has been used before.
+    """
+    key = (server, secure, keyfile, certfile)
+    with self._lock:
+      if self._pid != os.getpid():
+        # Sockets that were opened before a fork belong to the parent.
+        self._idle = {}
+        self._pid = os.getpid()
+
+      idle = self._idle.get(key, [])
+      cutoff = time.time() - self.idle_timeout
+      while idle:
+        conn, last_used = idle.pop()
+        if last_used >= cutoff:
+          return conn, True
+
+        conn.close()
+
+    if secure:
+      if keyfile and certfile:
+        conn = httplib.HTTPSConnection(server, key_file=keyfile,
+                                       cert_file=certfile)
+      else:
+        conn = httplib.HTTPSConnection(server)
+    else:
+      conn = httplib.HTTPConnection(server)
+
+    return conn, False
+
+  def release(self, conn, server, secure=0, keyfile=None, certfile=None,
+              reusable=True):
+    """Returns a connection to the pool or closes it."""
+    key = (server, secure, keyfile, certfile)
+    if reusable:
+      with self._lock:
+        idle = self._idle.setdefault(key, [])
+        if len(idle) < self.max_idle:
+          idle.append((conn, time.time()))
+          return
+
+    conn.close()
+
+  def clear(self):
+    """Closes all idle connections."""
+    with self._lock:
+      idle, self._idle = self._idle, {}
+
+    for connections in idle.values():
+      for conn, _ in connections:
+        conn.close()
+
+
+api_connection_pool = APIConnectionPool()
+
+
+def _closed_without_response(error):
+  """Checks if a BadStatusLine means the server sent nothing at all.
+
+  Depending on the Python version, httplib reports an empty status line as
+  repr(''), '' or an explanatory message.
+  """
+  return (error.line in ('', repr('')) or
+          error.line.startswith('No status line received'))
+
+
 class ProtocolMessage:
 
 
@@ -111,14 +208,61 @@ class ProtocolMessage:
                   secure=0, keyfile=None, certfile=None, service_id=None,
                   version_id=None):
     data = self.Encode()
-    if secure:
-      if keyfile and certfile:
-        conn = httplib.HTTPSConnection(server, key_file=keyfile,
-                                       cert_file=certfile)
-      else:
-        conn = httplib.HTTPSConnection(server)
-    else:
-      conn = httplib.HTTPConnection(server)
+    # AppScale: Connections come from a pool of keep-alive connections. A
+    # connection that was used before may have been closed by the server
+    # while it was idle. Since some API calls are not idempotent, the request
+    # is only sent again with a new connection if the server cannot have
+    # received it.
+    while True:
+      conn, reused = api_connection_pool.acquire(server, secure, keyfile,
+                                                 certfile)
+      try:
+        self._sendRequest(conn, url, data)
+      except socket.error as error:
+        conn.close()
+        if reused and error.errno in (errno.EPIPE, errno.ECONNRESET):
+          continue
+        raise
+      except BaseException:
+        conn.close()
+        raise
+
+      try:
+        resp = conn.getresponse()
+      except httplib.BadStatusLine as error:
+        conn.close()
+        if reused and _closed_without_response(error):
+          continue
+        raise
+      except BaseException:
+        conn.close()
+        raise
+      break
+
+    try:
+      body = resp.read()
+    except BaseException:
+      conn.close()
+      raise
+
+    api_connection_pool.release(conn, server, secure, keyfile, certfile,
+                                reusable=not resp.will_close)
+    if follow_redirects > 0 and resp.status == 302:
+      m = URL_RE.match(resp.getheader('Location'))
+      if m:
+        protocol, server, url = m.groups()
+        return self.sendCommand(server, url, response,
+                                follow_redirects=follow_redirects - 1,
+                                secure=(protocol == 'https'),
+                                keyfile=keyfile,
+                                certfile=certfile)
+    if resp.status != 200:
+      raise ProtocolBufferReturnError(resp.status)
+    if response is not None:
+      response.ParseFromString(body)
+    return response
+
+  def _sendRequest(self, conn, url, data):
     conn.putrequest("POST", '/')
     conn.putheader("Content-Length", "%d" %len(data))
     # AppScale:
@@ -137,25 +281,9 @@ class ProtocolMessage:
     conn.putheader('Module', service_id)
     conn.putheader('Version', version_id)
 
-    conn.endheaders()
-    conn.send(data)
-    resp = conn.getresponse()
-    if follow_redirects > 0 and resp.status == 302:
-      m = URL_RE.match(resp.getheader('Location'))
-      if m:
-        protocol, server, url = m.groups()
-        return self.sendCommand(server, url, response,
-                                follow_redirects=follow_redirects - 1,
-                                secure=(protocol == 'https'),
-                                keyfile=keyfile,
-                                certfile=certfile)
-    if resp.status != 200:
-      conn.close()
-      raise ProtocolBufferReturnError(resp.status)
-    if response is not None:
-      response.ParseFromString(resp.read())
-    conn.close()
-    return response
+    # Sending the body with the headers avoids waiting for a delayed ACK
+    # before the body is sent on a reused connection.
+    conn.endheaders(data)
 
   def sendSecureCommand(self, server, keyfile, certfile, url, response,
                         follow_redirects=1):
@@ -0,0 +1,123 @@
+import errno
+import httplib
+import os
+import socket
+import sys
+import unittest
+from mock import MagicMock, patch
+
+appserver = "{0}/../../../..".format(os.path.dirname(__file__))
+sys.path.append(appserver)
+from google.appengine.ext.remote_api import remote_api_pb
+from google.net.proto import ProtocolBuffer
+
+
+def fake_connection(server):
+  response = MagicMock(status=200, will_close=False)
+  response.read.return_value = remote_api_pb.Response().Encode()
+  connection = MagicMock(server=server)
+  connection.getresponse.return_value = response
+  return connection
+
+
+class TestAPIConnectionPool(unittest.TestCase):
+  def setUp(self):
+    ProtocolBuffer.api_connection_pool.clear()
+    patcher = patch.object(ProtocolBuffer.httplib, 'HTTPConnection',
+                           side_effect=fake_connection)
+    self.connection_class = patcher.start()
+    self.addCleanup(patcher.stop)
+
+  def send(self):
+    request = remote_api_pb.Request()
+    request.set_service_name('datastore_v3')
+    request.set_method('Get')
+    request.set_request('')
+    return request.sendCommand('localhost:8888', 'app1',
+                               remote_api_pb.Response())
+
+  def test_reuse(self):
+    self.send()
+    self.send()
+    self.assertEqual(self.connection_class.call_count, 1)
+
+    # Connections that the server closes are not reused.
+    pooled, reused = ProtocolBuffer.api_connection_pool.acquire(
+      'localhost:8888')
+    self.assertTrue(reused)
+    pooled.getresponse.return_value.will_close = True
+    ProtocolBuffer.api_connection_pool.release(pooled, 'localhost:8888')
+    self.send()
+    pooled.close.assert_called_once_with()
+    self.send()
+    self.assertEqual(self.connection_class.call_count, 2)
+
+  def test_stale_connection(self):
+    self.send()
+    stale, _ = ProtocolBuffer.api_connection_pool.acquire('localhost:8888')
+    stale.getresponse.side_effect = httplib.BadStatusLine('')
+    ProtocolBuffer.api_connection_pool.release(stale, 'localhost:8888')
+
+    # The request is sent again with a new connection.
+    self.assertIsInstance(self.send(), remote_api_pb.Response)
+    stale.close.assert_called_once_with()
+    self.assertEqual(self.connection_class.call_count, 2)
+
+  def test_reset_while_sending(self):
+    self.send()
+    stale, _ = ProtocolBuffer.api_connection_pool.acquire('localhost:8888')
+    stale.endheaders.side_effect = socket.error(errno.EPIPE, 'Broken pipe')
+    ProtocolBuffer.api_connection_pool.release(stale, 'localhost:8888')
+
+    # The server did not receive the request, so it is sent again.
+    self.assertIsInstance(self.send(), remote_api_pb.Response)
+    self.assertEqual(self.connection_class.call_count, 2)
+
+  def test_no_resend_after_request(self):
+    self.send()
+    connection, _ = ProtocolBuffer.api_connection_pool.acquire(
+      'localhost:8888')
+    connection.getresponse.side_effect = socket.error(
+      errno.ECONNRESET, 'Connection reset by peer')
+    ProtocolBuffer.api_connection_pool.release(connection, 'localhost:8888')
+
+    # The server may have processed the request, so it is not sent again.
+    with self.assertRaises(socket.error):
+      self.send()
+
+    connection.close.assert_called_once_with()
+    self.assertEqual(self.connection_class.call_count, 1)
+
+    self.send()
+    connection, _ = ProtocolBuffer.api_connection_pool.acquire(
+      'localhost:8888')
+    connection.getresponse.return_value.read.side_effect = (
+      httplib.IncompleteRead(''))
+    ProtocolBuffer.api_connection_pool.release(connection, 'localhost:8888')
+    with self.assertRaises(httplib.IncompleteRead):
+      self.send()
+
+    connection, _ = ProtocolBuffer.api_connection_pool.acquire(
+      'localhost:8888')
+    connection.getresponse.side_effect = httplib.BadStatusLine('HTTP/1.1 ?')
+    ProtocolBuffer.api_connection_pool.release(connection, 'localhost:8888')
+    with self.assertRaises(httplib.BadStatusLine):
+      self.send()
+
+    self.assertEqual(self.connection_class.call_count, 3)
+
+  def test_error_status(self):
+    self.send()
+    connection, _ = ProtocolBuffer.api_connection_pool.acquire(
+      'localhost:8888')
+    connection.getresponse.return_value.status = 500
+    ProtocolBuffer.api_connection_pool.release(connection, 'localhost:8888')
+    with self.assertRaises(ProtocolBuffer.ProtocolBufferReturnError):
+      self.send()
+
+    # The response was read, so the connection can still be used.
+    connection.close.assert_not_called()
+
+
+if __name__ == '__main__':
+  unittest.main()
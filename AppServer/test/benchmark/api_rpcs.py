@@ -0,0 +1,109 @@
+""" Compares API RPC throughput with and without pooled connections.
+
+Each RPC is a datastore Get sent with ProtocolMessage.sendCommand to a local
+HTTP/1.1 server. Without pooling, every RPC opens a new connection. With
+pooling, the RPCs reuse keep-alive connections.
+
+Usage: python api_rpcs.py [--rpcs N] [--threads N]
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+
+appserver = "{0}/../..".format(os.path.dirname(__file__))
+sys.path.append(appserver)
+from google.appengine.datastore import datastore_pb
+from google.appengine.ext.remote_api import remote_api_pb
+from google.net.proto import ProtocolBuffer
+
+
+class APIHandler(BaseHTTPRequestHandler):
+  """ Responds to each RPC with an empty Get response. """
+  protocol_version = 'HTTP/1.1'
+  # Write each response in one packet like the API servers do.
+  disable_nagle_algorithm = True
+  wbufsize = -1
+
+  def do_POST(self):
+    request = remote_api_pb.Request(
+      self.rfile.read(int(self.headers['Content-Length'])))
+    response = remote_api_pb.Response()
+    response.set_response(datastore_pb.GetResponse().Encode())
+    if request.has_request_id():
+      response.set_request_id(request.request_id())
+
+    body = response.Encode()
+    self.send_response(200)
+    self.send_header('Content-Length', str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
+  daemon_threads = True
+
+
+def send_rpcs(server, count):
+  """ Sends datastore Get RPCs one at a time. """
+  get_request = datastore_pb.GetRequest()
+  key = get_request.add_key()
+  key.set_app('guestbook')
+  element = key.mutable_path().add_element()
+  element.set_type('Greeting')
+  element.set_id(1)
+  for _ in range(count):
+    api_request = remote_api_pb.Request()
+    api_request.set_method('Get')
+    api_request.set_service_name('datastore_v3')
+    api_request.set_request(get_request.Encode())
+    api_request.sendCommand(server, 'guestbook', remote_api_pb.Response())
+
+
+def run(server, rpcs, threads):
+  """ Sends RPCs from several threads and returns the elapsed time. """
+  per_thread = rpcs // threads
+  workers = [threading.Thread(target=send_rpcs, args=(server, per_thread))
+             for _ in range(threads)]
+  start_time = time.time()
+  for worker in workers:
+    worker.start()
+
+  for worker in workers:
+    worker.join()
+
+  return time.time() - start_time, per_thread * threads
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--rpcs', type=int, default=5000)
+  parser.add_argument('--threads', type=int, default=4)
+  args = parser.parse_args()
+
+  http_server = ThreadedHTTPServer(('127.0.0.1', 0), APIHandler)
+  server_thread = threading.Thread(target=http_server.serve_forever)
+  server_thread.daemon = True
+  server_thread.start()
+  server = '127.0.0.1:{}'.format(http_server.server_address[1])
+
+  for name, max_idle in (('new connections', 0),
+                         ('pooled connections', args.threads)):
+    ProtocolBuffer.api_connection_pool.clear()
+    ProtocolBuffer.api_connection_pool.max_idle = max_idle
+    elapsed, sent = run(server, args.rpcs, args.threads)
+    print('{}: {:.3f}s, {:.0f} RPCs/s'.format(name, elapsed, sent / elapsed))
+
+  ProtocolBuffer.api_connection_pool.clear()
+  http_server.shutdown()
+
+
+if __name__ == '__main__':
+  main()
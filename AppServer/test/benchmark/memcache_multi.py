@@ -0,0 +1,93 @@
+""" Compares per-key memcached calls with the stub's batched get and set.
+
+The per-key path makes the calls that the stub used to make: a get and a set
+for every item that is stored and a get for every key that is fetched. The
+batched path sends the stub's MemcacheSetRequest and MemcacheGetRequest,
+which use one round trip per memcached server.
+
+Usage: python memcache_multi.py [--server HOST:PORT | --fake] [--keys N]
+                                [--rounds N]
+"""
+import argparse
+import cPickle
+import os
+import sys
+import time
+
+import memcache
+
+appserver = "{0}/../..".format(os.path.dirname(__file__))
+sys.path.append(appserver)
+sys.path.append(os.path.join(appserver, 'google/appengine/api/memcache/test'))
+from fake_memcached import FakeMemcached
+from google.appengine.api.memcache import memcache_distributed
+from google.appengine.api.memcache import memcache_service_pb
+
+
+def per_key(client, stub, keys, value):
+  """ Stores and fetches each key with separate calls. """
+  for key in keys:
+    server_key = stub._GetKey('', key)
+    client.get(server_key)
+    client.set(server_key, cPickle.dumps([0, 1, value]))
+
+  for key in keys:
+    client.get(stub._GetKey('', key))
+
+
+def batched(client, stub, keys, value):
+  """ Stores and fetches all of the keys with one request each. """
+  set_request = memcache_service_pb.MemcacheSetRequest()
+  for key in keys:
+    item = set_request.add_item()
+    item.set_key(key)
+    item.set_value(value)
+
+  stub._Dynamic_Set(set_request, memcache_service_pb.MemcacheSetResponse())
+
+  get_request = memcache_service_pb.MemcacheGetRequest()
+  for key in keys:
+    get_request.add_key(key)
+
+  stub._Dynamic_Get(get_request, memcache_service_pb.MemcacheGetResponse())
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--server', default='localhost:11211',
+                      help='A memcached server location')
+  parser.add_argument('--fake', action='store_true',
+                      help='Use an in-memory server instead of memcached')
+  parser.add_argument('--keys', type=int, default=100)
+  parser.add_argument('--rounds', type=int, default=100)
+  args = parser.parse_args()
+
+  location = args.server
+  if args.fake:
+    fake_server = FakeMemcached()
+    fake_server.start()
+    location = fake_server.location
+
+  os.environ['APPNAME'] = 'benchmark'
+  client = memcache.Client([location])
+  stub = memcache_distributed.MemcacheService()
+  stub._memcache = client
+  keys = ['key{}'.format(index) for index in range(args.keys)]
+  value = 'x' * 100
+  for name, function in (('per-key calls', per_key), ('batched', batched)):
+    start_time = time.time()
+    for _ in range(args.rounds):
+      function(client, stub, keys, value)
+
+    elapsed = time.time() - start_time
+    operations = args.rounds * args.keys * 2
+    print('{}: {:.3f}s, {:.0f} keys/s'.format(name, elapsed,
+                                              operations / elapsed))
+
+  client.disconnect_all()
+  if args.fake:
+    fake_server.shutdown()
+
+
+if __name__ == '__main__':
+  main()
@@ -18,6 +18,7 @@ from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
 from appscale.datastore.cassandra_env.cassandra_interface import DatastoreProxy
 
 from appscale.taskqueue import distributed_tq
+from appscale.taskqueue.connection_pool import pool_stats
 from appscale.taskqueue.constants import SHUTTING_DOWN_TIMEOUT
 from appscale.taskqueue.rest_api import (
   RESTLease, RESTQueue, RESTTask, RESTTasks
@@ -77,7 +78,7 @@ class ProtobufferHandler(RequestHandler):
     module = request.headers['Module']
     app_info = {'app_id': app_id, 'version_id': version, 'module_id': module}
     if pb_type == "Request":
-      method, status = self.remote_request(app_info, http_request_data)
+      method, status = yield self.remote_request(app_info, http_request_data)
       # Fill request stats info
       self.stats_info.pb_method = method
       self.stats_info.pb_status = status
@@ -86,6 +87,7 @@ class ProtobufferHandler(RequestHandler):
       # Fill request stats info
       self.stats_info.pb_status = "NOT_A_PROTOBUFFER_REQUEST"
 
+  @gen.coroutine
   def remote_request(self, app_info, http_request_data):
     """ Receives a remote request to which it should give the correct
     response. The http_request_data holds an encoded protocol buffer of a
@@ -129,28 +131,37 @@ class ProtobufferHandler(RequestHandler):
 
     result = None
     if method == "FetchQueueStats":
-      result = self.queue_handler.fetch_queue_stats(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.fetch_queue_stats, app_id, http_request_data)
     elif method == "PurgeQueue":
-      result = self.queue_handler.purge_queue(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.purge_queue, app_id, http_request_data)
     elif method == "Delete":
-      result = self.queue_handler.delete(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.delete, app_id, http_request_data)
     elif method == "QueryAndOwnTasks":
-      result = self.queue_handler.query_and_own_tasks(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.query_and_own_tasks, app_id, http_request_data)
     elif method == "Add":
-      result = self.queue_handler.add(app_info, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.add, app_info, http_request_data)
     elif method == "BulkAdd":
-      result = self.queue_handler.bulk_add(app_info, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.bulk_add, app_info, http_request_data)
     elif method == "ModifyTaskLease":
-      result = self.queue_handler.modify_task_lease(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.modify_task_lease, app_id, http_request_data)
     elif method == "UpdateQueue":
       response = taskqueue_service_pb.TaskQueueUpdateQueueResponse()
       result = self.queue_handler.Encode(), 0, ""
     elif method == "FetchQueues":
       result = self.queue_handler.fetch_queue(app_id, http_request_data)
     elif method == "QueryTasks":
-      result = self.queue_handler.query_tasks(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.query_tasks, app_id, http_request_data)
     elif method == "FetchTask":
-      result = self.queue_handler.fetch_task(app_id, http_request_data)
+      result = yield self.queue_handler.thread_pool.submit(
+        self.queue_handler.fetch_task, app_id, http_request_data)
     elif method == "ForceRun":
       result = self.queue_handler.force_run(app_id, http_request_data)
     elif method == "DeleteQueue":
@@ -184,12 +195,16 @@ class ProtobufferHandler(RequestHandler):
 
     self.write(apiresponse.Encode())
     status = taskqueue_service_pb.TaskQueueServiceError.ErrorCode_Name(errcode)
-    return method, status
+    raise gen.Return((method, status))
 
 
 class StatsHandler(RequestHandler):
   """ Defines what to do when the webserver receives different types of HTTP
   requests. """
+  def initialize(self, queue_handler=None):
+    """ Provide access to the queue handler. """
+    self.queue_handler = queue_handler
+
   @gen.coroutine
   def get(self):
     """ Handles get request for the web server. Returns that it is currently
@@ -214,8 +229,14 @@ class StatsHandler(RequestHandler):
     tq_stats = {
       "current_requests": service_stats.current_requests,
       "cumulative_counters": cumulative_counters,
-      "recent_stats": recent_stats
+      "recent_stats": recent_stats,
+      "push_connection_pools": pool_stats()
     }
+    if self.queue_handler is not None:
+      thread_pool = self.queue_handler.thread_pool
+      tq_stats["push_rate_limits"] = yield thread_pool.submit(
+        self.queue_handler.rate_limit_stats)
+
     self.write(json.dumps(tq_stats))
 
 
@@ -227,7 +248,7 @@ def prepare_taskqueue_application(task_queue):
     (RESTLease.PATH, RESTLease, {'queue_handler': task_queue}),
     (RESTTask.PATH, RESTTask, {'queue_handler': task_queue}),
     # Responds with service statistic
-    ("/service-stats", StatsHandler),
+    ("/service-stats", StatsHandler, {'queue_handler': task_queue}),
     # Takes protocol buffers from the AppServers.
     (r"/.*", ProtobufferHandler, {'queue_handler': task_queue})
   ]
@@ -0,0 +1,237 @@
+""" Keeps persistent HTTP connections that push workers use to run tasks. """
+import errno
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .utils import logger
+
+# The directory that push workers write connection pool statistics to.
+POOL_STATS_DIR = os.path.join(tempfile.gettempdir(), 'appscale-push-workers')
+
+# The counters that each pool keeps.
+POOL_COUNTERS = ('created', 'reused', 'evicted', 'discarded', 'waits')
+
+
+class HTTPConnectionPool(object):
+  """ Reuses connections for each (scheme, host, port) target.
+
+  Push workers run with eventlet's monkey patching, so waiting for a
+  connection only blocks the current green thread.
+  """
+
+  # The number of seconds a connection can stay idle before it is closed.
+  IDLE_TIMEOUT = 30
+
+  # The maximum number of connections to open for each target.
+  MAX_PER_HOST = 10
+
+  # The minimum number of seconds between statistics writes.
+  STATS_INTERVAL = 5
+
+  def __init__(self, connection_classes, max_per_host=MAX_PER_HOST,
+               idle_timeout=IDLE_TIMEOUT, stats_path=None):
+    """ Creates a new HTTPConnectionPool.
+
+    Args:
+      connection_classes: A dictionary mapping URL schemes to connection
+        classes.
+      max_per_host: An integer specifying the maximum number of connections
+        to open for each target.
+      idle_timeout: An integer specifying how many seconds a connection can
+        stay idle before it is closed.
+      stats_path: A string specifying where to write statistics.
+    """
+    self._connection_classes = connection_classes
+    self._max_per_host = max_per_host
+    self._idle_timeout = idle_timeout
+    self._stats_path = stats_path
+    self._stats_written = 0
+    # Maps targets to lists of (connection, time last used) tuples.
+    self._idle = {}
+    # Maps targets to the number of connections that are open.
+    self._open = {}
+    self._condition = threading.Condition()
+    self.counters = dict.fromkeys(POOL_COUNTERS, 0)
+
+  def supports(self, scheme):
+    """ Checks if the pool can open connections for a URL scheme.
+
+    Args:
+      scheme: A string specifying a URL scheme.
+    Returns:
+      A boolean.
+    """
+    return scheme in self._connection_classes
+
+  def acquire(self, scheme, host, port):
+    """ Takes an idle connection to a target or opens a new one.
+
+    Blocks until a connection is released if the target already has the
+    maximum number of connections open.
+
+    Args:
+      scheme: A string specifying a URL scheme.
+      host: A string specifying the target host.
+      port: An integer specifying the target port.
+    Returns:
+      A tuple containing a connection and a boolean indicating whether or
+      not the connection has been used before.
+    """
+    key = (scheme, host, port)
+    with self._condition:
+      self._evict_idle()
+      while True:
+        idle = self._idle.get(key)
+        if idle:
+          connection, _ = idle.pop()
+          self.counters['reused'] += 1
+          return connection, True
+
+        if self._open.get(key, 0) < self._max_per_host:
+          self._open[key] = self._open.get(key, 0) + 1
+          self.counters['created'] += 1
+          break
+
+        self.counters['waits'] += 1
+        self._condition.wait()
+
+    connection_class = self._connection_classes[scheme]
+    return connection_class(host, port), False
+
+  def release(self, connection, scheme, host, port, reusable=True):
+    """ Returns a connection to the pool.
+
+    Args:
+      connection: A connection from acquire.
+      scheme: A string specifying a URL scheme.
+      host: A string specifying the target host.
+      port: An integer specifying the target port.
+      reusable: A boolean indicating whether or not the connection can be
+        used for another request.
+    """
+    key = (scheme, host, port)
+    with self._condition:
+      if reusable:
+        self._idle.setdefault(key, []).append((connection, time.time()))
+      else:
+        self._close(key, connection)
+        self.counters['discarded'] += 1
+
+      self._condition.notify_all()
+
+    self._write_stats()
+
+  def stats(self):
+    """ Summarizes the state of the pool.
+
+    Returns:
+      A dictionary containing the pool counters and the number of open and
+      idle connections.
+    """
+    with self._condition:
+      stats = dict(self.counters)
+      stats['open'] = sum(self._open.values())
+      stats['idle'] = sum(len(idle) for idle in self._idle.values())
+
+    return stats
+
+  def _evict_idle(self):
+    """ Closes connections that have been idle for too long. """
+    cutoff = time.time() - self._idle_timeout
+    for key, idle in self._idle.items():
+      # The most recently used connections are at the end of the list.
+      while idle and idle[0][1] < cutoff:
+        connection, _ = idle.pop(0)
+        self._close(key, connection)
+        self.counters['evicted'] += 1
+
+      if not idle:
+        del self._idle[key]
+
+  def _close(self, key, connection):
+    """ Closes a connection and frees its place in the pool.
+
+    Args:
+      key: A tuple specifying the connection's target.
+      connection: A connection from acquire.
+    """
+    self._open[key] -= 1
+    try:
+      connection.close()
+    except Exception as error:
+      logger.debug('Error while closing connection: {}'.format(error))
+
+  def _write_stats(self):
+    """ Periodically writes the pool statistics for the stats endpoint. """
+    if self._stats_path is None:
+      return
+
+    if time.time() - self._stats_written < self.STATS_INTERVAL:
+      return
+
+    self._stats_written = time.time()
+    try:
+      os.makedirs(os.path.dirname(self._stats_path))
+    except OSError as error:
+      if error.errno != errno.EEXIST:
+        raise
+
+    temp_path = '{}.tmp'.format(self._stats_path)
+    with open(temp_path, 'w') as stats_file:
+      json.dump(self.stats(), stats_file)
+
+    os.rename(temp_path, self._stats_path)
+
+
+def worker_stats_path(app_id, pid):
+  """ Determines where a push worker writes its pool statistics.
+
+  Args:
+    app_id: A string specifying a project ID.
+    pid: An integer specifying the worker's process ID.
+  Returns:
+    A string specifying a file path.
+  """
+  return os.path.join(POOL_STATS_DIR, '{}-{}.json'.format(app_id, pid))
+
+
+def pool_stats():
+  """ Combines the pool statistics from running push workers.
+
+  Returns:
+    A dictionary mapping project IDs to pool statistics.
+  """
+  try:
+    file_names = os.listdir(POOL_STATS_DIR)
+  except OSError:
+    return {}
+
+  combined = {}
+  for file_name in file_names:
+    if not file_name.endswith('.json'):
+      continue
+
+    app_id, pid = file_name[:-len('.json')].rsplit('-', 1)
+    path = os.path.join(POOL_STATS_DIR, file_name)
+    try:
+      os.kill(int(pid), 0)
+    except OSError as error:
+      if error.errno == errno.ESRCH:
+        # The worker is no longer running.
+        os.remove(path)
+        continue
+
+    try:
+      with open(path) as stats_file:
+        stats = json.load(stats_file)
+    except (IOError, ValueError):
+      continue
+
+    app_stats = combined.setdefault(app_id, {})
+    for name, value in stats.iteritems():
+      app_stats[name] = app_stats.get(name, 0) + value
+
+  return combined
@@ -75,6 +75,10 @@ SUPPORTED_PUSH_QUEUE_FIELDS = {
 
 SHUTTING_DOWN_TIMEOUT = 10  # Limit time for finishing request
 
+# The maximum number of pull queue operations to run at once. Each Postgres
+# connection pool allows as many connections, so workers do not wait for one.
+MAX_BACKGROUND_WORKERS = 10
+
 # Exceptions that the datastore client might raise.
 TRANSIENT_DS_ERRORS = (db.InternalError, db.Timeout, socket.error,
                        apiproxy_errors.ApplicationError)
@@ -24,8 +24,10 @@ from appscale.datastore.cassandra_env.retry_policies import BASIC_RETRIES
 from cassandra import OperationTimedOut
 from cassandra.cluster import SimpleStatement
 from cassandra.policies import FallthroughRetryPolicy
+from concurrent.futures import ThreadPoolExecutor
 from .constants import (
   InvalidTarget,
+  MAX_BACKGROUND_WORKERS,
   QueueNotFound,
   TaskNotFound,
   TARGET_REGEX,
@@ -47,6 +49,7 @@ from .utils import (
   logger
 )
 from .queue_manager import GlobalQueueManager
+from .rate_limiter import bucket_stats
 from .service_manager import GlobalServiceManager
 
 sys.path.append(APPSCALE_PYTHON_APPSERVER)
@@ -280,10 +283,29 @@ class DistributedTaskQueue():
     os.environ['APPLICATION_ID'] = constants.DASHBOARD_APP_ID
 
     self.db_access = db_access
+    self.zk_client = zk_client
     self.load_balancers = appscale_info.get_load_balancer_ips()
     self.queue_manager = GlobalQueueManager(zk_client, db_access)
     self.service_manager = GlobalServiceManager(zk_client)
 
+    # Pull queue operations block on database requests, so handlers run them
+    # in this pool to keep the IOLoop responsive.
+    self.thread_pool = ThreadPoolExecutor(MAX_BACKGROUND_WORKERS)
+
+  def rate_limit_stats(self):
+    """ Fetches the shared rate limiting counters for push queues.
+
+    Returns:
+      A dictionary mapping project IDs to dictionaries of bucket details.
+    """
+    stats = {}
+    for project_id in list(self.queue_manager):
+      project_stats = bucket_stats(self.zk_client, project_id)
+      if project_stats:
+        stats[project_id] = project_stats
+
+    return stats
+
   def get_queue(self, app, queue):
     """ Fetches a Queue object.
 
@@ -401,8 +423,9 @@ class DistributedTaskQueue():
     except QueueNotFound as error:
       return '', TaskQueueServiceError.UNKNOWN_QUEUE, str(error)
 
-    for task_name in request.task_name_list():
-      queue.delete_task(Task({'id': task_name}))
+    queue.delete_tasks([Task({'id': task_name})
+                        for task_name in request.task_name_list()])
+    for _ in request.task_name_list():
       response.add_result(TaskQueueServiceError.OK)
 
     return response.Encode(), 0, ""
@@ -520,6 +543,7 @@ class DistributedTaskQueue():
 
     # Assign names if needed and validate tasks.
     error_found = False
+    pull_tasks = {}
     for add_request in request.add_request_list():
       task_result = response.add_taskresult()
 
@@ -540,9 +564,9 @@ class DistributedTaskQueue():
           task_info['tag'] = add_request.tag()
 
         new_task = Task(task_info)
-        queue.add_task(new_task)
-        task_result.set_result(TaskQueueServiceError.OK)
         task_result.set_chosen_task_name(new_task.id)
+        queue_tasks = pull_tasks.setdefault(queue, [])
+        queue_tasks.append((new_task, task_result))
         continue
 
       result = tq_lib.verify_task_queue_add_request(add_request.app_id(),
@@ -563,24 +587,37 @@ class DistributedTaskQueue():
       else:
         error_found = True
         task_result.set_result(result)
+
+    # Add the pull tasks for each queue together.
+    for queue, queue_tasks in pull_tasks.iteritems():
+      added = queue.add_tasks([task for task, _ in queue_tasks])
+      for (_, task_result), task_added in zip(queue_tasks, added):
+        if task_added:
+          task_result.set_result(TaskQueueServiceError.OK)
+        else:
+          task_result.set_result(TaskQueueServiceError.TASK_ALREADY_EXISTS)
+          error_found = True
+
     if error_found:
       return
 
+    push_requests = []
+    push_results = []
     for add_request, task_result in zip(request.add_request_list(),
                                         response.taskresult_list()):
       if (add_request.has_mode() and
           add_request.mode() == taskqueue_service_pb.TaskQueueMode.PULL):
         continue
 
-      try:
-        self.__enqueue_push_task(source_info, add_request)
-      except apiproxy_errors.ApplicationError as error:
-        task_result.set_result(error.application_error)
-      except InvalidTarget as e:
-        logger.error(e.message)
-        task_result.set_result(TaskQueueServiceError.INVALID_REQUEST)
-      else:
-        task_result.set_result(TaskQueueServiceError.OK)
+      push_requests.append(add_request)
+      push_results.append(task_result)
+
+    if not push_requests:
+      return
+
+    results = self.__enqueue_push_tasks(source_info, push_requests)
+    for task_result, result in zip(push_results, results):
+      task_result.set_result(result)
 
   def __method_mapping(self, method):
     """ Maps an int index to a string.
@@ -601,120 +638,170 @@ class DistributedTaskQueue():
     elif method == taskqueue_service_pb.TaskQueueQueryTasksResponse_Task.DELETE:
       return 'DELETE'
 
-  def __get_task_name(self, task_name, retries=3):
-    """ Checks if a given TaskName entity exists.
+  def __get_task_names(self, task_names, retries=3):
+    """ Fetches the TaskName entities for several tasks.
 
     Args:
-      task_name: A string specifying the TaskName key.
+      task_names: A list of strings specifying TaskName keys.
       retries: An integer specifying how many times to retry the get.
+    Returns:
+      A list containing a TaskName entity or None for each name.
     """
     try:
-      return TaskName.get_by_key_name(task_name)
+      return TaskName.get_by_key_name(task_names)
     except TRANSIENT_DS_ERRORS as error:
       retries -= 1
       if retries >= 0:
-        logger.warning('Error while checking task name: {}. '
+        logger.warning('Error while checking task names: {}. '
                        'Retrying'.format(error))
-        return self.__get_task_name(task_name, retries)
+        return self.__get_task_names(task_names, retries)
 
       raise
 
-  def __create_task_name(self, project_id, queue_name, task_name, retries=3):
-    """ Creates a new TaskName entity.
+  def __create_task_names(self, entities, retries=3):
+    """ Stores several new TaskName entities.
 
     Args:
-      project_id: A string specifying a project ID.
-      queue_name: A string specifying a queue name.
-      task_name: A string specifying the TaskName key.
-      retries: An integer specifying how many times to retry the create.
+      entities: A list of TaskName entities.
+      retries: An integer specifying how many times to retry the put.
     """
-    entity = TaskName(key_name=task_name, state=tq_lib.TASK_STATES.QUEUED,
-                      queue=queue_name, app_id=project_id)
     try:
-      db.put(entity)
+      db.put(entities)
       return
     except TRANSIENT_DS_ERRORS as error:
       retries -= 1
       if retries >= 0:
-        logger.warning('Error creating task name: {}. Retrying'.format(error))
-        return self.__create_task_name(project_id, queue_name, task_name,
-                                       retries)
+        logger.warning('Error creating task names: {}. Retrying'.format(error))
+        return self.__create_task_names(entities, retries)
 
       raise
 
-  def __check_and_store_task_names(self, request):
-    """ Tries to fetch the taskqueue name, if it exists it will raise an
-    exception.
+  def __check_and_store_task_names(self, requests):
+    """ Checks that tasks have not been enqueued before and stores their names.
 
     We store a receipt of each enqueued task in the datastore. If we find that
-    task in the datastore, we will raise an exception. If the task is not
-    in the datastore, then it is assumed this is the first time seeing the
-    tasks and we create a receipt of the task in the datastore to prevent
-    a duplicate task from being enqueued.
+    task in the datastore, the task is rejected. Otherwise, it is assumed this
+    is the first time seeing the task, and we create a receipt of the task in
+    the datastore to prevent a duplicate task from being enqueued. The names
+    are checked with one batch get and stored with one batch put.
 
     Args:
-      request: A taskqueue_service_pb.TaskQueueAddRequest.
-    Raises:
-      A apiproxy_errors.ApplicationError of TASK_ALREADY_EXISTS.
+      requests: A list of taskqueue_service_pb.TaskQueueAddRequest objects.
+    Returns:
+      A list containing an error code for each rejected task and None for
+      each task whose name was stored.
     """
-    task_name = request.task_name()
-
+    task_names = [request.task_name() for request in requests]
     try:
-      item = self.__get_task_name(task_name)
+      existing = self.__get_task_names(task_names)
     except TRANSIENT_DS_ERRORS:
-      logger.exception('Unable to check task name')
-      raise apiproxy_errors.ApplicationError(
-        taskqueue_service_pb.TaskQueueServiceError.INTERNAL_ERROR)
-
-    logger.debug("Task name {0}".format(task_name))
-    if item:
-      if item.state == TASK_STATES.QUEUED:
-        logger.warning("Task already exists")
-        raise apiproxy_errors.ApplicationError(
-          TaskQueueServiceError.TASK_ALREADY_EXISTS)
-      else:
-        # If a task with the same name has already been processed, it should
-        # be tombstoned for some time to prevent a duplicate task.
-        raise apiproxy_errors.ApplicationError(
-          TaskQueueServiceError.TOMBSTONED_TASK)
+      logger.exception('Unable to check task names')
+      return [TaskQueueServiceError.INTERNAL_ERROR] * len(requests)
+
+    results = []
+    new_entities = []
+    new_names = set()
+    for request, item in zip(requests, existing):
+      task_name = request.task_name()
+      if item is not None:
+        if item.state == TASK_STATES.QUEUED:
+          logger.warning('Task {} already exists'.format(task_name))
+          results.append(TaskQueueServiceError.TASK_ALREADY_EXISTS)
+        else:
+          # If a task with the same name has already been processed, it should
+          # be tombstoned for some time to prevent a duplicate task.
+          results.append(TaskQueueServiceError.TOMBSTONED_TASK)
 
-    logger.debug('Creating task name {}'.format(task_name))
+        continue
+
+      # A batch can contain the same name more than once.
+      if task_name in new_names:
+        logger.warning('Task {} is repeated in the batch'.format(task_name))
+        results.append(TaskQueueServiceError.DUPLICATE_TASK_NAME)
+        continue
+
+      new_names.add(task_name)
+      new_entities.append(
+        TaskName(key_name=task_name, state=tq_lib.TASK_STATES.QUEUED,
+                 queue=request.queue_name(), app_id=request.app_id()))
+      results.append(None)
+
+    if not new_entities:
+      return results
+
+    logger.debug('Creating {} task names'.format(len(new_entities)))
     try:
-      self.__create_task_name(request.app_id(), request.queue_name(),
-                              task_name)
+      self.__create_task_names(new_entities)
     except TRANSIENT_DS_ERRORS:
-      logger.exception('Unable to create task name')
-      raise apiproxy_errors.ApplicationError(
-        TaskQueueServiceError.INTERNAL_ERROR)
+      logger.exception('Unable to create task names')
+      return [TaskQueueServiceError.INTERNAL_ERROR if result is None
+              else result for result in results]
+
+    return results
 
-  def __enqueue_push_task(self, source_info, request):
+  def __enqueue_push_tasks(self, source_info, requests):
     """ Enqueues a batch of push tasks.
 
+    The tasks for each queue are published with a single broker producer.
+
     Args:
       source_info: A dictionary containing the application, module, and version
        ID that is sending this request.
-      request: A taskqueue_service_pb.TaskQueueAddRequest.
+      requests: A list of taskqueue_service_pb.TaskQueueAddRequest objects.
+    Returns:
+      A list containing an error code for each request.
     """
-    self.__validate_push_task(request)
-    self.__check_and_store_task_names(request)
-    headers = self.get_task_headers(request)
-    args = self.get_task_args(source_info, headers, request)
-    countdown = int(headers['X-AppEngine-TaskETA']) - \
-                int(datetime.datetime.now().strftime("%s"))
-
-    push_queue = self.get_queue(request.app_id(), request.queue_name())
-    task_func = get_queue_function_name(push_queue.name)
-    celery_queue = get_celery_queue_name(request.app_id(), push_queue.name)
-
-    push_queue.celery.send_task(
-      task_func,
-      kwargs={'headers': headers, 'args': args},
-      expires=args['expires'],
-      acks_late=True,
-      countdown=countdown,
-      queue=celery_queue,
-      routing_key=celery_queue,
-    )
+    results = [None] * len(requests)
+    valid_tasks = []
+    for index, request in enumerate(requests):
+      try:
+        self.__validate_push_task(request)
+        headers = self.get_task_headers(request)
+        args = self.get_task_args(source_info, headers, request)
+      except apiproxy_errors.ApplicationError as error:
+        results[index] = error.application_error
+        continue
+      except InvalidTarget as e:
+        logger.error(e.message)
+        results[index] = TaskQueueServiceError.INVALID_REQUEST
+        continue
+
+      valid_tasks.append((index, request, headers, args))
+
+    name_results = self.__check_and_store_task_names(
+      [request for _, request, _, _ in valid_tasks])
+
+    by_queue = {}
+    for task, name_result in zip(valid_tasks, name_results):
+      index, request, _, _ = task
+      if name_result is not None:
+        results[index] = name_result
+        continue
+
+      queue_key = (request.app_id(), request.queue_name())
+      by_queue.setdefault(queue_key, []).append(task)
+
+    for (app_id, queue_name), tasks in by_queue.iteritems():
+      push_queue = self.get_queue(app_id, queue_name)
+      task_func = get_queue_function_name(push_queue.name)
+      celery_queue = get_celery_queue_name(app_id, push_queue.name)
+      with push_queue.celery.producer_or_acquire() as producer:
+        for index, request, headers, args in tasks:
+          countdown = int(headers['X-AppEngine-TaskETA']) - \
+                      int(datetime.datetime.now().strftime("%s"))
+          push_queue.celery.send_task(
+            task_func,
+            kwargs={'headers': headers, 'args': args},
+            expires=args['expires'],
+            acks_late=True,
+            countdown=countdown,
+            queue=celery_queue,
+            routing_key=celery_queue,
+            producer=producer
+          )
+          results[index] = TaskQueueServiceError.OK
+
+    return results
 
   def get_task_args(self, source_info, headers, request):
     """ Gets the task args used when making a task web request.
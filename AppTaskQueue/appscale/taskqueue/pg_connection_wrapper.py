@@ -1,25 +1,182 @@
 """
-Postgres connection wrapper with autoreconnect functionality.
+Postgres connection pool with autoreconnect functionality.
 """
-import functools
+import contextlib
+import threading
+import time
+
 import psycopg2
-from psycopg2 import errorcodes
 
+from appscale.taskqueue.constants import MAX_BACKGROUND_WORKERS
+from appscale.taskqueue.queue import TransientError
 from appscale.taskqueue.utils import logger
 
 
 class PostgresConnectionWrapper(object):
+  """ Keeps a bounded pool of connections to a Postgres server. """
+
+  # The maximum number of connections that can be open at a time. This
+  # follows the size of the thread pool that runs pull queue operations.
+  MAX_CONNECTIONS = MAX_BACKGROUND_WORKERS
+
+  # The number of seconds to wait for a connection when the pool is full.
+  ACQUIRE_TIMEOUT = 10
+
+  # Connections that have been idle for this many seconds are checked before
+  # they are used.
+  HEALTH_CHECK_INTERVAL = 30
 
   def __init__(self, *args, **kwargs):
+    """ Creates a new PostgresConnectionWrapper.
+
+    Args:
+      args: Positional arguments to pass to psycopg2.connect.
+      kwargs: Keyword arguments to pass to psycopg2.connect. A max_connections
+        argument limits the size of the pool.
+    """
+    self._max_connections = kwargs.pop('max_connections',
+                                       self.MAX_CONNECTIONS)
     self._args = args
     self._kwargs = kwargs
-    self._connection = None
+    # A list of (connection, time last used) tuples.
+    self._idle = []
+    self._open_count = 0
+    self._condition = threading.Condition()
+
+  @contextlib.contextmanager
+  def connection(self):
+    """ Checks out a connection for the duration of a transaction.
 
-  def get_connection(self):
-    if not self._connection or self._connection.closed:
-      logger.info('Establishing new connection to Postgres server')
-      self._connection = psycopg2.connect(*self._args, **self._kwargs)
-    return self._connection
+    The transaction is committed when the block exits normally and rolled
+    back if it raises an exception. Connections that fail are closed and
+    replaced the next time one is needed.
+
+    Yields:
+      A psycopg2 connection.
+    """
+    pg_connection = self._acquire()
+    try:
+      with pg_connection:
+        yield pg_connection
+    except (psycopg2.InterfaceError, psycopg2.OperationalError):
+      self._discard(pg_connection)
+      raise
+    except Exception:
+      self._release(pg_connection)
+      raise
+    else:
+      self._release(pg_connection)
 
   def close(self):
-    return self._connection.close()
+    """ Closes all of the idle connections. """
+    with self._condition:
+      for pg_connection, _ in self._idle:
+        pg_connection.close()
+        self._open_count -= 1
+
+      self._idle = []
+      self._condition.notify_all()
+
+  def _acquire(self):
+    """ Takes an idle connection or opens a new one.
+
+    Blocks for up to ACQUIRE_TIMEOUT seconds if the pool is full.
+
+    Returns:
+      A psycopg2 connection.
+    Raises:
+      TransientError if a connection does not become available in time.
+    """
+    deadline = time.time() + self.ACQUIRE_TIMEOUT
+    while True:
+      with self._condition:
+        while not self._idle and self._open_count >= self._max_connections:
+          remaining = deadline - time.time()
+          if remaining <= 0:
+            raise TransientError('Timed out waiting for a Postgres connection')
+
+          self._condition.wait(remaining)
+
+        if not self._idle:
+          self._open_count += 1
+          break
+
+        pg_connection, last_used = self._idle.pop()
+
+      if self._is_healthy(pg_connection, last_used):
+        return pg_connection
+
+      self._discard(pg_connection)
+
+    logger.info('Establishing new connection to Postgres server')
+    try:
+      return psycopg2.connect(*self._args, **self._kwargs)
+    except Exception:
+      with self._condition:
+        self._open_count -= 1
+        self._condition.notify()
+      raise
+
+  def _release(self, pg_connection):
+    """ Returns a connection to the pool.
+
+    Args:
+      pg_connection: A psycopg2 connection.
+    """
+    if pg_connection.closed:
+      self._discard(pg_connection)
+      return
+
+    with self._condition:
+      self._idle.append((pg_connection, time.time()))
+      self._condition.notify()
+
+  def _discard(self, pg_connection):
+    """ Closes a connection and frees its place in the pool.
+
+    Args:
+      pg_connection: A psycopg2 connection.
+    """
+    logger.warning('Discarding connection to Postgres server')
+    self._close_quietly(pg_connection)
+    with self._condition:
+      self._open_count -= 1
+      self._condition.notify()
+
+  def _is_healthy(self, pg_connection, last_used):
+    """ Checks if a connection can still be used.
+
+    Args:
+      pg_connection: A psycopg2 connection.
+      last_used: A timestamp specifying when the connection was last used.
+    Returns:
+      A boolean indicating whether or not the connection is usable.
+    """
+    if pg_connection.closed:
+      return False
+
+    if time.time() - last_used < self.HEALTH_CHECK_INTERVAL:
+      return True
+
+    try:
+      with pg_connection:
+        with pg_connection.cursor() as pg_cursor:
+          pg_cursor.execute('SELECT 1')
+    except (psycopg2.InterfaceError, psycopg2.OperationalError) as error:
+      logger.warning('Postgres connection failed health check: {}'
+                     .format(error))
+      return False
+
+    return True
+
+  @staticmethod
+  def _close_quietly(pg_connection):
+    """ Closes a connection, ignoring errors from broken connections.
+
+    Args:
+      pg_connection: A psycopg2 connection.
+    """
+    try:
+      pg_connection.close()
+    except psycopg2.Error:
+      pass
@@ -1,4 +1,5 @@
 """ A Celery worker script that executes push tasks with HTTP requests. """
+import atexit
 import datetime
 import json
 import logging
@@ -8,14 +9,22 @@ import sys
 from appscale.common import appscale_info
 from appscale.common import constants
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from celery.signals import worker_shutdown
 from celery.utils.log import get_task_logger
+from kazoo.client import KazooClient
+from kazoo.exceptions import NoNodeError
 from eventlet.green import httplib
 from eventlet.green.httplib import BadStatusLine
 from eventlet.timeout import Timeout as EventletTimeout
 from socket import error as SocketError
 from urlparse import urlparse
-from .constants import TRANSIENT_DS_ERRORS
-from .task_name import TaskName
+from .connection_pool import HTTPConnectionPool, worker_stats_path
+from .rate_limiter import (
+  DEFAULT_BUCKET_SIZE,
+  DistributedTokenBucket,
+  parse_rate
+)
+from .task_state_buffer import TaskStateBuffer
 from .tq_lib import TASK_STATES
 from .utils import (
   create_celery_for_app,
@@ -26,7 +35,6 @@ from .utils import (
 sys.path.append(APPSCALE_PYTHON_APPSERVER)
 from google.appengine.api import apiproxy_stub_map
 from google.appengine.api import datastore_distributed
-from google.appengine.ext import db
 
 
 # The maximum number of seconds a task is permitted to take.
@@ -43,6 +51,24 @@ celery = create_celery_for_app(app_id, rates)
 logger = get_task_logger(__name__)
 logger.setLevel(logging.INFO)
 
+connection_pool = HTTPConnectionPool(
+  {'http': httplib.HTTPConnection, 'https': httplib.HTTPSConnection},
+  stats_path=worker_stats_path(app_id, os.getpid()))
+
+zk_client = KazooClient(
+  hosts=','.join(appscale_info.get_zk_node_ips()),
+  connection_retry=constants.ZK_PERSISTENT_RECONNECTS)
+zk_client.start()
+
+try:
+  queue_config, _ = zk_client.get('/appscale/projects/{}/queues'.format(app_id))
+  queue_details = json.loads(queue_config)['queue']
+except NoNodeError:
+  queue_details = {}
+
+# Maps task function names to the token buckets that limit their queues.
+rate_limiters = {}
+
 db_proxy = appscale_info.get_db_proxy()
 connection_str = '{}:{}'.format(db_proxy, str(constants.DB_SERVER_PORT))
 ds_distrib = datastore_distributed.DatastoreDistributed(
@@ -50,6 +76,18 @@ ds_distrib = datastore_distributed.DatastoreDistributed(
 apiproxy_stub_map.apiproxy.RegisterStub('datastore_v3', ds_distrib)
 os.environ['APPLICATION_ID'] = 'appscaledashboard'
 
+# Task state changes are stored in batches.
+task_states = TaskStateBuffer()
+task_states.start()
+
+
+@worker_shutdown.connect
+def flush_task_states(**kwargs):
+  """ Stores the remaining task state changes before the worker exits. """
+  task_states.flush()
+
+atexit.register(task_states.flush)
+
 
 def get_wait_time(retries, args):
   """ Calculates how long we should wait to execute a failed task, based on
@@ -72,39 +110,60 @@ def get_wait_time(retries, args):
   return wait_time
 
 
-def update_task(task_name, new_state, retries=3):
-  """ Updates the TaskName entity for a given task.
+def send_request(url, method, urlpath, headers, body, skip_host,
+                 skip_accept_encoding):
+  """ Sends a request to the target with a pooled connection.
+
+  If a connection that was used before fails, the request is sent again
+  because the target may have closed the connection while it was idle.
 
   Args:
-    task_name: A string specifying the TaskName key.
-    new_state: A string specifying the new task state.
-    retries: An integer specifying how many times to retry the update.
+    url: A ParseResult object specifying the target.
+    method: A string specifying the HTTP method.
+    urlpath: A string specifying the path and query.
+    headers: A list of (name, value) tuples.
+    body: A string containing the request body.
+    skip_host: A boolean indicating that the Host header is in headers.
+    skip_accept_encoding: A boolean indicating that the Accept-Encoding
+      header is in headers.
+  Returns:
+    An HTTPResponse object that has been read.
+  Raises:
+    BadStatusLine or SocketError if the request fails.
   """
-  try:
-    task_name_entity = TaskName.get_by_key_name(task_name)
-  except TRANSIENT_DS_ERRORS as error:
-    retries -= 1
-    if retries >= 0:
-      logger.warning('Error fetching task name: {}. Retrying'.format(error))
-      return update_task(task_name, retries)
-
-    raise
-
-  if task_name_entity is not None:
-    task_name_entity.state = new_state
-    if new_state in (TASK_STATES.EXPIRED, TASK_STATES.FAILED,
-                     TASK_STATES.SUCCESS):
-      task_name_entity.endtime = datetime.datetime.now()
-
+  while True:
+    connection, reused = connection_pool.acquire(url.scheme, remote_host,
+                                                 url.port)
     try:
-      db.put(task_name_entity)
-    except TRANSIENT_DS_ERRORS as error:
-      retries -= 1
-      if retries >= 0:
-        logger.warning('Error updating task name: {}. Retrying'.format(error))
-        return update_task(task_name, retries)
+      connection.putrequest(method,
+                            urlpath,
+                            skip_host=skip_host,
+                            skip_accept_encoding=skip_accept_encoding)
+      for header, value in headers:
+        connection.putheader(header, value)
+
+      connection.endheaders()
+      if body:
+        connection.send(body)
+
+      response = connection.getresponse()
+      response.read()
+      response.close()
+    except (BadStatusLine, SocketError):
+      connection_pool.release(connection, url.scheme, remote_host, url.port,
+                              reusable=False)
+      if reused:
+        continue
 
       raise
+    except BaseException:
+      connection_pool.release(connection, url.scheme, remote_host, url.port,
+                              reusable=False)
+      raise
+
+    connection_pool.release(connection, url.scheme, remote_host, url.port,
+                            reusable=not response.will_close)
+    return response
 
 
 def execute_task(task, headers, args):
@@ -132,6 +191,12 @@ def execute_task(task, headers, args):
               'Args: {}'.format(args['task_name'], headers, loggable_args))
   url = urlparse(args['url'])
 
+  # Wait for the queue's rate to allow the task across all workers.
+  throttled_seconds = rate_limiters[task.name].acquire()
+  if throttled_seconds:
+    logger.info('{} was throttled for {:.3f} seconds'.format(
+      args['task_name'], throttled_seconds))
+
   timeout = EventletTimeout(MAX_TASK_DURATION)
   try:
     redirects_left = 1
@@ -150,7 +215,7 @@ def execute_task(task, headers, args):
            args['task_name'], task.request.id, args['expires']))
         celery.control.revoke(task.request.id)
 
-        update_task(args['task_name'], TASK_STATES.EXPIRED)
+        task_states.add(args['task_name'], TASK_STATES.EXPIRED)
         return
 
       if (args['max_retries'] != 0 and
@@ -160,19 +225,17 @@ def execute_task(task, headers, args):
           args['max_retries']))
         celery.control.revoke(task.request.id)
 
-        update_task(args['task_name'], TASK_STATES.FAILED)
+        task_states.add(args['task_name'], TASK_STATES.FAILED)
         return
 
       # Targets do not get X-Forwarded-Proto from nginx, they use haproxy port.
       headers['X-Forwarded-Proto'] = url.scheme
-      if url.scheme == 'http':
-        connection = httplib.HTTPConnection(remote_host, url.port)
-      elif url.scheme == 'https':
-        connection = httplib.HTTPSConnection(remote_host, url.port)
-      else:
+      if not connection_pool.supports(url.scheme):
         logger.error("Task %s tried to use url scheme %s, "
                      "which is not supported." % (
                      args['task_name'], url.scheme))
+        task_states.add(args['task_name'], TASK_STATES.FAILED)
+        return
 
       skip_host = False
       if 'host' in headers or 'Host' in headers:
@@ -182,38 +245,26 @@ def execute_task(task, headers, args):
       if 'accept-encoding' in headers or 'Accept-Encoding' in headers:
         skip_accept_encoding = True
 
-      connection.putrequest(method,
-                            urlpath,
-                            skip_host=skip_host,
-                            skip_accept_encoding=skip_accept_encoding)
-
       # Update the task headers
       headers['X-AppEngine-TaskRetryCount'] = str(task.request.retries)
       headers['X-AppEngine-TaskExecutionCount'] = str(task.request.retries)
 
-      for header in headers:
-        connection.putheader(header, headers[header])
-
+      request_headers = headers.items()
       if 'content-type' not in headers or 'Content-Type' not in headers:
         if url.query:
-          connection.putheader('content-type', 'application/octet-stream')
+          request_headers.append(('content-type', 'application/octet-stream'))
         else:
-          connection.putheader('content-type',
-                               'application/x-www-form-urlencoded')
+          request_headers.append(('content-type',
+                                  'application/x-www-form-urlencoded'))
 
-      connection.putheader("Content-Length", str(content_length))
+      request_headers.append(("Content-Length", str(content_length)))
 
       retries = int(task.request.retries) + 1
       wait_time = get_wait_time(retries, args)
 
       try:
-        connection.endheaders()
-        if args["body"]:
-          connection.send(args['body'])
-
-        response = connection.getresponse()
-        response.read()
-        response.close()
+        response = send_request(url, method, urlpath, request_headers,
+                                args['body'], skip_host, skip_accept_encoding)
       except (BadStatusLine, SocketError):
         logger.warning(
           '{task} failed before receiving response. It will retry in {wait} '
@@ -222,7 +273,7 @@ def execute_task(task, headers, args):
 
       if 200 <= response.status < 300:
         # Task successful.
-        update_task(args['task_name'], TASK_STATES.SUCCESS)
+        task_states.add(args['task_name'], TASK_STATES.SUCCESS)
 
         time_elapsed = datetime.datetime.utcnow() - start_time
         logger.info(
@@ -259,6 +310,11 @@ def execute_task(task, headers, args):
 
 for queue in celery.conf['CELERY_QUEUES']:
   task_function = lambda task, headers, args: execute_task(task, headers, args)
-  task_name = get_queue_function_name(queue.name.split('___', 1)[1])
+  queue_name = queue.name.split('___', 1)[1]
+  task_name = get_queue_function_name(queue_name)
+  bucket_size = queue_details.get(queue_name, {}).get('bucket_size',
+                                                      DEFAULT_BUCKET_SIZE)
+  rate_limiters[task_name] = DistributedTokenBucket(
+    zk_client, app_id, queue_name, parse_rate(rates[queue_name]), bucket_size)
   task_decorator = celery.task(name=task_name, max_retries=10000, bind=True)
   task_decorator(task_function)
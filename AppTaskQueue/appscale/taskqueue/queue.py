@@ -48,6 +48,10 @@ QUEUE_FIELDS = (
   {'stats': ('totalTasks', 'oldestTask', 'leasedLastMinute', 'leasedLastHour')}
 )
 
+# The request counters that are recorded while leasing pull queue tasks.
+LEASE_METRICS = ('rounds', 'reads', 'conditional_updates', 'serial_reads',
+                 'index_batches')
+
 # Validation rules for queue parameters.
 QUEUE_ATTRIBUTE_RULES = {
   'rate': lambda rate: RATE_REGEX.match(rate),
@@ -249,8 +253,8 @@ def is_connection_error(err):
   Returns:
     True if error is related to connection, False otherwise.
   """
-  from psycopg2 import InterfaceError
-  return isinstance(err, InterfaceError)
+  from psycopg2 import InterfaceError, OperationalError
+  return isinstance(err, (InterfaceError, OperationalError))
 
 
 class PostgresPullQueue(Queue):
@@ -283,8 +287,7 @@ class PostgresPullQueue(Queue):
     # they sometimes get IntegrityError despite 'IF NOT EXISTS'
     @retrying.retry(max_retries=5, retry_on_exception=IntegrityError)
     def ensure_tables_created():
-      pg_connection = self.pg_connection_wrapper.get_connection()
-      with pg_connection:
+      with self.pg_connection_wrapper.connection() as pg_connection:
         with pg_connection.cursor() as pg_cursor:
           pg_cursor.execute(
             'CREATE TABLE IF NOT EXISTS "{table_name}" ('
@@ -341,9 +344,8 @@ class PostgresPullQueue(Queue):
     except AttributeError:
       lease_expires = 'current_timestamp'
 
-    pg_connection = self.pg_connection_wrapper.get_connection()
     try:
-      with pg_connection:
+      with self.pg_connection_wrapper.connection() as pg_connection:
         with pg_connection.cursor() as pg_cursor:
           pg_cursor.execute(
             'INSERT INTO "{table}" ( '
@@ -369,6 +371,67 @@ class PostgresPullQueue(Queue):
     task.enqueueTimestamp = row[0]  # time_enqueued is generated on PG side
     task.leaseTimestamp = row[1]    # lease_expires is generated on PG side
 
+  @retry_pg_connection
+  def add_tasks(self, tasks):
+    """ Adds several tasks to the queue with a single statement.
+
+    Args:
+      tasks: A list of Task objects.
+    Returns:
+      A list of booleans indicating which tasks were added. A task is not
+      added if its name is already taken.
+    Raises:
+      InvalidTaskInfo if a task doesn't have payloadBase64 attribute.
+    """
+    for task in tasks:
+      if not hasattr(task, 'payloadBase64'):
+        raise InvalidTaskInfo('{} is missing a payload.'.format(task))
+
+    if not tasks:
+      return []
+
+    rows = [(task.id,
+             bytearray(base64.urlsafe_b64decode(task.payloadBase64)),
+             getattr(task, 'leaseTimestamp', None),
+             getattr(task, 'tag', None))
+            for task in tasks]
+
+    with self.pg_connection_wrapper.connection() as pg_connection:
+      with pg_connection.cursor() as pg_cursor:
+        values = ', '.join(
+          pg_cursor.mogrify('(%s, %s, current_timestamp, '
+                            ' COALESCE(%s, current_timestamp), 0, %s)', row)
+          for row in rows
+        )
+        # The values are not passed to format because they can contain braces.
+        pg_cursor.execute(
+          'INSERT INTO "{table}" ( '
+          '  task_name, payload, time_enqueued, '
+          '  lease_expires, lease_count, tag '
+          ') '
+          'VALUES '.format(table=self.tasks_table_name) + values +
+          ' ON CONFLICT (task_name) DO NOTHING '
+          'RETURNING task_name, time_enqueued, lease_expires'
+        )
+        inserted = {row[0]: row[1:] for row in pg_cursor.fetchall()}
+
+    added = []
+    for task in tasks:
+      # Only the first task with a given name can be inserted.
+      row = inserted.pop(task.id, None)
+      if row is None:
+        logger.debug('Task name already taken: {}'.format(task.id))
+        added.append(False)
+        continue
+
+      task.queueName = self.name
+      task.enqueueTimestamp = row[0]
+      task.leaseTimestamp = row[1]
+      added.append(True)
+
+    logger.debug('Added {} tasks'.format(added.count(True)))
+    return added
+
   @retry_pg_connection
   def get_task(self, task, omit_payload=False):
     """ Gets a task from the queue.
@@ -386,8 +449,7 @@ class PostgresPullQueue(Queue):
     else:
       columns = ['payload', 'task_name', 'time_enqueued',
                  'lease_expires', 'lease_count', 'tag']
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'SELECT {columns} FROM "{tasks_table}" '
@@ -412,8 +474,7 @@ class PostgresPullQueue(Queue):
     Args:
       task: A Task object.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'UPDATE "{tasks_table}" '
@@ -425,6 +486,28 @@ class PostgresPullQueue(Queue):
           }
         )
 
+  @retry_pg_connection
+  def delete_tasks(self, tasks):
+    """ Marks several tasks as deleted with a single statement.
+
+    Args:
+      tasks: A list of Task objects.
+    """
+    if not tasks:
+      return
+
+    with self.pg_connection_wrapper.connection() as pg_connection:
+      with pg_connection.cursor() as pg_cursor:
+        pg_cursor.execute(
+          'UPDATE "{tasks_table}" '
+          'SET time_deleted = current_timestamp '
+          'WHERE "{tasks_table}".task_name = ANY(%(task_names)s)'
+          .format(tasks_table=self.tasks_table_name),
+          vars={
+            'task_names': [task.id for task in tasks],
+          }
+        )
+
   @retry_pg_connection
   def update_lease(self, task, new_lease_seconds):
     """ Updates the duration of a task lease.
@@ -436,8 +519,7 @@ class PostgresPullQueue(Queue):
     Returns:
       A Task object.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'UPDATE "{tasks_table}" '
@@ -501,8 +583,7 @@ class PostgresPullQueue(Queue):
     else:
       old_eta_verification = ''
 
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           statement.format(tasks_table=self.tasks_table_name,
@@ -530,8 +611,7 @@ class PostgresPullQueue(Queue):
     """
     columns = ['task_name', 'time_enqueued',
                'lease_expires', 'lease_count', 'tag']
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'SELECT {columns} FROM "{tasks_table}" '
@@ -592,8 +672,7 @@ class PostgresPullQueue(Queue):
       '"{table}".{col}'.format(table=self.tasks_table_name, col=column)
       for column in columns
     ]
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'UPDATE "{tasks_table}" '
@@ -633,8 +712,7 @@ class PostgresPullQueue(Queue):
   def purge(self):
     """ Remove all tasks from queue.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'TRUNCATE TABLE "{tasks_table}"'
@@ -681,8 +759,7 @@ class PostgresPullQueue(Queue):
     Returns:
       An integer specifying the number of tasks in the queue.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'SELECT count(*) FROM "{tasks_table}" WHERE time_deleted IS NULL'
@@ -699,8 +776,7 @@ class PostgresPullQueue(Queue):
       A datetime object specifying the oldest ETA or None if there are no
       tasks.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'SELECT min(lease_expires) FROM "{tasks_table}" '
@@ -714,8 +790,7 @@ class PostgresPullQueue(Queue):
   def flush_deleted(self):
     """ Removes all tasks which were deleted more than week ago.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'DELETE FROM "{tasks_table}" '
@@ -766,8 +841,7 @@ class PostgresPullQueue(Queue):
     Returns:
       A string containing a tag or None.
     """
-    pg_connection = self.pg_connection_wrapper.get_connection()
-    with pg_connection:
+    with self.pg_connection_wrapper.connection() as pg_connection:
       with pg_connection.cursor() as pg_cursor:
         pg_cursor.execute(
           'SELECT tag FROM "{tasks_table}" '
@@ -835,6 +909,9 @@ class PullQueue(Queue):
   # The seconds to wait after fetching 0 index results before retrying.
   EMPTY_RESULTS_COOLDOWN = 5
 
+  # The number of leased tasks to update the index for in each batch.
+  LEASE_INDEX_BATCH_SIZE = 10
+
   def __init__(self, queue_info, app, db_access=None):
     """ Create a PullQueue object.
 
@@ -846,6 +923,8 @@ class PullQueue(Queue):
     self.db_access = db_access
     self.index_cache = {'global': {}, 'by_tag': {}}
     self.index_cache_lock = Lock()
+    # The total number of requests made while leasing tasks.
+    self.lease_metrics = dict.fromkeys(LEASE_METRICS, 0)
     super(PullQueue, self).__init__(queue_info, app)
 
   def add_task(self, task, retries=5):
@@ -918,6 +997,34 @@ class PullQueue(Queue):
 
     logger.debug('Added task: {}'.format(task))
 
+  def add_tasks(self, tasks):
+    """ Adds several tasks to the queue.
+
+    Args:
+      tasks: A list of Task objects.
+    Returns:
+      A list of booleans indicating which tasks were added. A task is not
+      added if its ID already exists in the queue.
+    Raises:
+      InvalidTaskInfo if a task is missing a payload.
+    """
+    for task in tasks:
+      if not hasattr(task, 'payloadBase64'):
+        raise InvalidTaskInfo('{} is missing a payload.'.format(task))
+
+    added = []
+    for task in tasks:
+      try:
+        self.add_task(task)
+      except InvalidTaskInfo as error:
+        logger.debug(str(error))
+        added.append(False)
+        continue
+
+      added.append(True)
+
+    return added
+
   def get_task(self, task, omit_payload=False):
     """ Gets a task from the queue.
 
@@ -973,6 +1080,15 @@ class PullQueue(Queue):
 
     logger.debug('Deleted task: {}'.format(task))
 
+  def delete_tasks(self, tasks):
+    """ Deletes several tasks from the queue.
+
+    Args:
+      tasks: A list of Task objects.
+    """
+    for task in tasks:
+      self.delete_task(task)
+
   def update_lease(self, task, new_lease_seconds, retries=5):
     """ Updates the duration of a task lease.
 
@@ -1118,6 +1234,7 @@ class PullQueue(Queue):
     leased_ids = set()
     indices_seen = set()
     new_eta = None
+    metrics = dict.fromkeys(LEASE_METRICS, 0)
     while True:
       tasks_needed = num_tasks - len(leased)
       if tasks_needed < 1:
@@ -1143,7 +1260,7 @@ class PullQueue(Queue):
       if new_eta is None:
         new_eta = current_time_ms() + datetime.timedelta(seconds=lease_seconds)
 
-      lease_results = self._lease_batch(index_results, new_eta)
+      lease_results = self._lease_batch(index_results, new_eta, metrics)
       for index_num, index_result in enumerate(index_results):
         task = lease_results[index_num]
         if task is None:
@@ -1158,8 +1275,13 @@ class PullQueue(Queue):
         leased.append(task)
         leased_ids.add(task.id)
 
+    for name, count in metrics.iteritems():
+      self.lease_metrics[name] += count
+
     time_elapsed = datetime.datetime.utcnow() - start_time
     logger.debug('Leased {} tasks [time elapsed: {}]'.format(len(leased), str(time_elapsed)))
+    logger.debug('Lease requests: {}'.format(
+      ', '.join('{}={}'.format(name, metrics[name]) for name in LEASE_METRICS)))
     logger.debug('IDs leased: {}'.format([task.id for task in leased]))
     return leased
 
@@ -1472,93 +1594,124 @@ class PullQueue(Queue):
       raise EmptyQueue('No entries in queue index')
     return tag
 
-  def _increment_count_async(self, task):
-    """ Update retry count for a task.
+  def _prepare(self, statement):
+    """ Fetches a prepared statement, preparing it on first use.
 
     Args:
-      task: A Task object.
-    """
-    session = self.db_access.session
-
-    statement = """
-      UPDATE pull_queue_tasks
-      SET retry_count=?
-      WHERE app=? AND queue=? AND id=?
-      IF retry_count=?
+      statement: A string containing a CQL statement.
+    Returns:
+      A PreparedStatement object.
     """
     if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    update_count = self.prepared_statements[statement]
+      self.prepared_statements[statement] = self.db_access.session.prepare(
+        statement)
+    return self.prepared_statements[statement]
+
+  def _read_tasks_async(self, task_ids):
+    """ Starts reading the columns needed to lease a set of tasks.
 
-    old_count = task.retry_count
-    new_count = task.retry_count + 1
-    params = [new_count, self.app, self.name, task.id, old_count]
-    bound_update = update_count.bind(params)
-    bound_update.retry_policy = NO_RETRIES
-    self.db_access.session.execute_async(bound_update)
+    Args:
+      task_ids: An iterable of strings containing task IDs.
+    Returns:
+      A dictionary mapping task IDs to cassandra-driver futures.
+    """
+    select = self._prepare("""
+      SELECT payload, enqueued, lease_expires, retry_count, tag
+      FROM pull_queue_tasks
+      WHERE app=? AND queue=? AND id=?
+    """)
+    session = self.db_access.session
+    return {task_id: session.execute_async(select,
+                                           [self.app, self.name, task_id])
+            for task_id in task_ids}
 
-  def _lease_batch(self, indexes, new_eta):
+  def _lease_batch(self, indexes, new_eta, metrics=None):
     """ Acquires a lease on tasks in the queue.
 
+    Each task's columns are read before the lease is attempted. The
+    conditional update only succeeds if the task's lease and retry count
+    still match what was read, so a successful update means the columns can
+    be used without reading the task again.
+
     Args:
       indexes: An iterable containing results from the index table.
       new_eta: A datetime object containing the new lease expiration.
-
+      metrics: A dictionary of request counters to update.
     Returns:
       A list of task objects or None if unable to acquire a lease.
     """
+    if metrics is None:
+      metrics = dict.fromkeys(LEASE_METRICS, 0)
+
+    metrics['rounds'] += 1
     leased = [None for _ in indexes]
     session = self.db_access.session
     op_id = uuid.uuid4()
+    current_time = datetime.datetime.utcnow()
 
-    lease_statement = """
+    read_futures = self._read_tasks_async(index.id for index in indexes)
+    metrics['reads'] += len(read_futures)
+    rows = {}
+    for task_id, future in read_futures.iteritems():
+      try:
+        rows[task_id] = future.result()[0]
+      except IndexError:
+        # The index is invalid. It's cleaned up if it's seen again.
+        continue
+      except TRANSIENT_CASSANDRA_ERRORS:
+        raise TransientError('Unable to read task {}'.format(task_id))
+
+    lease_task = self._prepare("""
       UPDATE pull_queue_tasks
-      SET lease_expires = ?, op_id = ?
+      SET lease_expires = ?, op_id = ?, retry_count = ?
       WHERE app = ? AND queue = ? AND id = ?
-      IF lease_expires < ?
-    """
-    if self.task_retry_limit != 0:
-      lease_statement += 'AND retry_count < {}'.format(self.task_retry_limit)
-    lease_task = session.prepare(lease_statement)
-    lease_task.retry_policy = NO_RETRIES
-    current_time = datetime.datetime.utcnow()
+      IF lease_expires < ? AND retry_count = ?
+    """)
+    update_futures = {}
+    for result_num, index in enumerate(indexes):
+      row = rows.get(index.id)
+      if row is None:
+        continue
+
+      # Skip leases that would be rejected by the condition.
+      if row.lease_expires >= current_time:
+        continue
 
-    update_futures = []
-    for index in indexes:
-      params = (new_eta, op_id, self.app, self.name, index.id, current_time)
-      update_futures.append(session.execute_async(lease_task, params))
+      if (self.task_retry_limit != 0 and
+          row.retry_count >= self.task_retry_limit):
+        continue
+
+      params = [new_eta, op_id, row.retry_count + 1, self.app, self.name,
+                index.id, current_time, row.retry_count]
+      bound_update = lease_task.bind(params)
+      bound_update.retry_policy = NO_RETRIES
+      update_futures[result_num] = session.execute_async(bound_update)
+
+    metrics['conditional_updates'] += len(update_futures)
 
     # Check which lease operations succeeded.
-    statement = """
-      SELECT payload, enqueued, retry_count, tag, op_id
-      FROM pull_queue_tasks
+    select_op = self._prepare("""
+      SELECT op_id FROM pull_queue_tasks
       WHERE app=? AND queue=? AND id=?
-    """
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    select = self.prepared_statements[statement]
-
-    futures = {}
-    for result_num, update_future in enumerate(update_futures):
+    """)
+    timed_out = {}
+    for result_num, update_future in update_futures.iteritems():
       try:
-        result = update_future.result()
-        success = True
+        applied = update_future.result().was_applied
       except DriverException:
-        result = None
-        success = False
-
-      if success and not result.was_applied:
-        # The lease operation failed, so keep this index as None.
+        index = indexes[result_num]
+        bound_select = select_op.bind([self.app, self.name, index.id])
+        bound_select.consistency_level = ConsistencyLevel.SERIAL
+        timed_out[result_num] = session.execute_async(bound_select)
         continue
 
-      index = indexes[result_num]
-      bound_select = select.bind([self.app, self.name, index.id])
-      bound_select.consistency_level = ConsistencyLevel.SERIAL
-      future = session.execute_async(bound_select)
-      futures[result_num] = (future, not success)
+      if applied:
+        task_id = indexes[result_num].id
+        leased[result_num] = self._leased_task(task_id, rows[task_id],
+                                               new_eta)
 
-    index_update_futures = []
-    for result_num, (future, lease_timed_out) in futures.iteritems():
+    metrics['serial_reads'] += len(timed_out)
+    for result_num, future in timed_out.iteritems():
       index = indexes[result_num]
       try:
         read_result = future.result()[0]
@@ -1566,25 +1719,25 @@ class PullQueue(Queue):
         raise TransientError('Unable to read task {}'.format(index.id))
 
       # If the operation IDs do not match, the lease was not successful.
-      if lease_timed_out and read_result.op_id != op_id:
+      if read_result.op_id != op_id:
         continue
 
-      task_info = {
-        'queueName': self.name,
-        'id': index.id,
-        'payloadBase64': read_result.payload,
-        'enqueueTimestamp': read_result.enqueued,
-        'leaseTimestamp': new_eta,
-        'retry_count': read_result.retry_count
-      }
-      if read_result.tag:
-        task_info['tag'] = read_result.tag
-      task = Task(task_info)
-      leased[result_num] = task
-
-      self._increment_count_async(task)
-      index_update_futures.append(self._update_index_async(index, task))
-      self._update_stats()
+      leased[result_num] = self._leased_task(index.id, rows[index.id],
+                                             new_eta)
+
+    updates = [(indexes[result_num], task)
+               for result_num, task in enumerate(leased) if task is not None]
+    index_update_futures = []
+    for start in range(0, len(updates), self.LEASE_INDEX_BATCH_SIZE):
+      chunk = updates[start:start + self.LEASE_INDEX_BATCH_SIZE]
+      batch = BatchStatement(retry_policy=BASIC_RETRIES)
+      for index, task in chunk:
+        self._add_index_update(batch, index, task)
+
+      self._add_lease_records(batch, len(chunk))
+      index_update_futures.append(session.execute_async(batch))
+
+    metrics['index_batches'] += len(index_update_futures)
 
     # Make sure all of the index updates complete successfully.
     for index_update in index_update_futures:
@@ -1592,76 +1745,90 @@ class PullQueue(Queue):
 
     return leased
 
-  def _update_index_async(self, old_index, task):
-    """ Updates the index table after leasing a task.
+  def _leased_task(self, task_id, row, new_eta):
+    """ Creates a Task object for a task that was just leased.
 
     Args:
-      old_index: The row to remove from the index table.
-      task: A Task object to create a new index entry for.
+      task_id: A string containing the task ID.
+      row: The task's columns from before the lease.
+      new_eta: A datetime object containing the new lease expiration.
     Returns:
-      A cassandra-driver future.
+      A Task object.
     """
-    session = self.db_access.session
+    task_info = {
+      'queueName': self.name,
+      'id': task_id,
+      'payloadBase64': row.payload,
+      'enqueueTimestamp': row.enqueued,
+      'leaseTimestamp': new_eta,
+      'retry_count': row.retry_count
+    }
+    if row.tag:
+      task_info['tag'] = row.tag
+
+    return Task(task_info)
+
+  def _add_index_update(self, batch, old_index, task):
+    """ Adds the statements that update a task's index entries to a batch.
 
+    Args:
+      batch: A BatchStatement object.
+      old_index: The row to remove from the index table.
+      task: A Task object to create a new index entry for.
+    """
     old_eta = old_index.eta
-    update_index = BatchStatement(retry_policy=BASIC_RETRIES)
 
-    statement = """
+    delete_old_eta_index = self._prepare("""
       DELETE FROM pull_queue_eta_index
       WHERE app=?
       AND queue=?
       AND eta=?
       AND id=?
-    """
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    delete_old_eta_index = self.prepared_statements[statement]
-
+    """)
     parameters = [self.app, self.name, old_eta, task.id]
-    update_index.add(delete_old_eta_index, parameters)
+    batch.add(delete_old_eta_index, parameters)
 
-    statement = """
+    delete_old_tag_index = self._prepare("""
       DELETE FROM pull_queue_tags_index
       WHERE app=?
       AND queue=?
       AND tag=?
       AND eta=?
       AND id=?
-    """
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    delete_old_tag_index = self.prepared_statements[statement]
-
+    """)
     parameters = [self.app, self.name, old_index.tag, old_eta, task.id]
-    update_index.add(delete_old_tag_index, parameters)
+    batch.add(delete_old_tag_index, parameters)
 
     try:
       tag = task.tag
     except AttributeError:
       tag = ''
 
-    statement = """
+    create_new_eta_index = self._prepare("""
       INSERT INTO pull_queue_eta_index (app, queue, eta, id, tag)
       VALUES (?, ?, ?, ?, ?)
-    """
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    create_new_eta_index = self.prepared_statements[statement]
-
+    """)
     parameters = [self.app, self.name, task.leaseTimestamp, task.id, tag]
-    update_index.add(create_new_eta_index, parameters)
+    batch.add(create_new_eta_index, parameters)
 
-    statement = """
+    create_new_tag_index = self._prepare("""
       INSERT INTO pull_queue_tags_index (app, queue, tag, eta, id)
       VALUES (?, ?, ?, ?, ?)
-    """
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    create_new_tag_index = self.prepared_statements[statement]
-
+    """)
     parameters = [self.app, self.name, tag, task.leaseTimestamp, task.id]
-    update_index.add(create_new_tag_index, parameters)
+    batch.add(create_new_tag_index, parameters)
+
+  def _update_index_async(self, old_index, task):
+    """ Updates the index table after leasing a task.
 
+    Args:
+      old_index: The row to remove from the index table.
+      task: A Task object to create a new index entry for.
+    Returns:
+      A cassandra-driver future.
+    """
+    update_index = BatchStatement(retry_policy=BASIC_RETRIES)
+    self._add_index_update(update_index, old_index, task)
     return self.db_access.session.execute_async(update_index)
 
   def _delete_index(self, eta, task_id, tag):
@@ -1773,22 +1940,28 @@ class PullQueue(Queue):
     if task.leaseTimestamp != index.eta:
       self._update_index_async(index, task).result()
 
-  def _update_stats(self):
-    """ Write queue metadata for keeping track of statistics. """
-    session = self.db_access.session
+  def _add_lease_records(self, batch, count):
+    """ Adds queue metadata for keeping track of statistics to a batch.
+
+    Args:
+      batch: A BatchStatement object.
+      count: An integer specifying the number of tasks that were leased.
+    """
     # Stats are only kept for one hour.
     ttl = 60 * 60
-    statement = """
+    record_lease = self._prepare("""
       INSERT INTO pull_queue_leases (app, queue, leased)
       VALUES (?, ?, ?)
       USING TTL {ttl}
-    """.format(ttl=ttl)
-    if statement not in self.prepared_statements:
-      self.prepared_statements[statement] = session.prepare(statement)
-    record_lease = self.prepared_statements[statement]
-
-    parameters = [self.app, self.name, datetime.datetime.utcnow()]
-    self.db_access.session.execute_async(record_lease, parameters)
+    """.format(ttl=ttl))
+
+    # Each lease needs its own row, and timestamps are stored with
+    # millisecond precision.
+    leased = datetime.datetime.utcnow()
+    for offset in range(count):
+      parameters = [self.app, self.name,
+                    leased + datetime.timedelta(milliseconds=offset)]
+      batch.add(record_lease, parameters)
 
   def _get_stats(self, fields):
     """ Fetch queue statistics.
@@ -37,8 +37,6 @@ class ProjectQueueManager(dict):
                   .format(project_id))
       # Import pg_connection_wrapper (and psycopg2) lazily
       from appscale.taskqueue import pg_connection_wrapper
-      # TODO: PostgresConnectionWrapper may need an update when
-      #       TaskQueue becomes concurrent
       self.pg_connection_wrapper = (
         pg_connection_wrapper.PostgresConnectionWrapper(dsn=pg_dsn[0])
       )
@@ -0,0 +1,244 @@
+""" Limits the rate that push tasks run at across all TaskQueue nodes. """
+import json
+import math
+import threading
+import time
+
+from kazoo.exceptions import (
+  BadVersionError,
+  KazooException,
+  NodeExistsError,
+  NoNodeError
+)
+from .utils import logger
+
+# The number of seconds in each rate unit.
+RATE_UNITS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+# The bucket size that queues use when one is not defined.
+DEFAULT_BUCKET_SIZE = 5
+
+# The counters that each bucket keeps.
+BUCKET_COUNTERS = ('dispatched', 'throttled', 'throttled_seconds', 'leases',
+                   'conflicts')
+
+# The counters that are combined in the shared bucket node.
+SHARED_COUNTERS = ('dispatched', 'throttled', 'throttled_seconds')
+
+
+def parse_rate(rate):
+  """ Converts a queue rate to the number of tasks allowed per second.
+
+  Args:
+    rate: A string specifying a queue rate (e.g. '5/s').
+  Returns:
+    A float specifying tasks per second.
+  """
+  if '/' not in rate:
+    return float(rate)
+
+  amount, unit = rate.split('/')
+  return float(amount) / RATE_UNITS[unit]
+
+
+def bucket_node(project_id, queue_name):
+  """ Determines the ZooKeeper node that holds a queue's token bucket.
+
+  Args:
+    project_id: A string specifying a project ID.
+    queue_name: A string specifying a queue name.
+  Returns:
+    A string specifying a ZooKeeper path.
+  """
+  return '/appscale/projects/{}/rate_limits/{}'.format(project_id, queue_name)
+
+
+def bucket_stats(zk_client, project_id):
+  """ Fetches the shared counters for each of a project's buckets.
+
+  Args:
+    zk_client: A KazooClient.
+    project_id: A string specifying a project ID.
+  Returns:
+    A dictionary mapping queue names to bucket details.
+  """
+  buckets_node = '/appscale/projects/{}/rate_limits'.format(project_id)
+  try:
+    queue_names = zk_client.get_children(buckets_node)
+  except NoNodeError:
+    return {}
+
+  stats = {}
+  for queue_name in queue_names:
+    try:
+      data, _ = zk_client.get(bucket_node(project_id, queue_name))
+    except NoNodeError:
+      continue
+
+    stats[queue_name] = json.loads(data)
+
+  return stats
+
+
+class DistributedTokenBucket(object):
+  """ A token bucket that is stored in ZooKeeper so that every push worker for
+  a queue shares the queue's rate.
+
+  Workers take tokens from the shared bucket in small batches so that most
+  tasks do not require a ZooKeeper write. Push workers run with eventlet's
+  monkey patching, so waiting for a token only blocks the current green
+  thread.
+  """
+
+  # The number of seconds of throughput that a worker takes at a time.
+  LEASE_PERIOD = .5
+
+  # The range of seconds to wait before checking the bucket again.
+  MIN_WAIT = .01
+  MAX_WAIT = 1
+
+  def __init__(self, zk_client, project_id, queue_name, rate,
+               bucket_size=DEFAULT_BUCKET_SIZE):
+    """ Creates a new DistributedTokenBucket.
+
+    Args:
+      zk_client: A KazooClient.
+      project_id: A string specifying a project ID.
+      queue_name: A string specifying a queue name.
+      rate: A float specifying the number of tasks allowed per second.
+      bucket_size: An integer specifying the number of tokens that the
+        bucket can hold.
+    """
+    self.rate = rate
+    self.bucket_size = max(int(bucket_size), 1)
+    self._zk_client = zk_client
+    self._node = bucket_node(project_id, queue_name)
+    self._lease_size = max(
+      min(int(math.ceil(rate * self.LEASE_PERIOD)), self.bucket_size), 1)
+    # Tokens that this worker has taken from the shared bucket.
+    self._tokens = 0
+    self._lease_expires = 0
+    self._lock = threading.Lock()
+    self.counters = dict.fromkeys(BUCKET_COUNTERS, 0)
+    # Counts that have not been added to the shared bucket node yet.
+    self._unreported = dict.fromkeys(SHARED_COUNTERS, 0)
+
+  def acquire(self):
+    """ Waits until the queue's rate allows another task to run.
+
+    Returns:
+      A float specifying the number of seconds spent waiting.
+    """
+    start_time = time.time()
+    throttled = False
+    while True:
+      with self._lock:
+        wait_time = self._take()
+        if wait_time is None:
+          waited = time.time() - start_time if throttled else 0
+          self._count('dispatched', 1)
+          if throttled:
+            self._count('throttled', 1)
+            self._count('throttled_seconds', waited)
+
+          return waited
+
+      throttled = True
+      time.sleep(wait_time)
+
+  def _count(self, name, value):
+    """ Increments a local counter and its shared equivalent.
+
+    Args:
+      name: A string specifying the counter.
+      value: A number to add to the counter.
+    """
+    self.counters[name] += value
+    self._unreported[name] += value
+
+  def _take(self):
+    """ Takes a token, leasing more from the shared bucket if necessary.
+
+    Returns:
+      None if a token was taken. Otherwise, a float specifying the number of
+      seconds to wait before trying again.
+    """
+    now = time.time()
+    if self._tokens > 0 and now < self._lease_expires:
+      self._tokens -= 1
+      return None
+
+    try:
+      granted, wait_time = self._lease()
+    except KazooException as error:
+      # Celery's per-worker rate limit still applies when the shared bucket
+      # is unavailable.
+      logger.warning('Unable to lease tokens from {}: {}'.format(
+        self._node, error))
+      return None
+
+    if not granted:
+      return wait_time
+
+    self._tokens = granted - 1
+    self._lease_expires = now + self.LEASE_PERIOD
+    return None
+
+  def _lease(self):
+    """ Takes a batch of tokens from the shared bucket.
+
+    Returns:
+      A tuple containing the number of tokens granted and the number of
+      seconds until another token is available.
+    """
+    if self.rate <= 0:
+      # The queue is paused.
+      return 0, self.MAX_WAIT
+
+    while True:
+      try:
+        data, stat = self._zk_client.get(self._node)
+      except NoNodeError:
+        self._create_bucket()
+        continue
+
+      bucket = json.loads(data)
+      now = time.time()
+
+      # Clocks on different machines can differ slightly, so the bucket is
+      # never refilled for a negative interval.
+      elapsed = max(now - bucket['updated'], 0)
+      available = min(bucket['tokens'] + elapsed * self.rate,
+                      self.bucket_size)
+      granted = min(int(available), self._lease_size)
+      if not granted:
+        wait_time = (1 - available) / self.rate
+        return 0, max(min(wait_time, self.MAX_WAIT), self.MIN_WAIT)
+
+      bucket['tokens'] = available - granted
+      bucket['updated'] = max(now, bucket['updated'])
+      bucket['rate'] = self.rate
+      bucket['bucket_size'] = self.bucket_size
+      for name, value in self._unreported.items():
+        bucket[name] = bucket.get(name, 0) + value
+
+      try:
+        self._zk_client.set(self._node, json.dumps(bucket),
+                            version=stat.version)
+      except BadVersionError:
+        # Another worker updated the bucket first.
+        self.counters['conflicts'] += 1
+        continue
+
+      self.counters['leases'] += 1
+      self._unreported = dict.fromkeys(SHARED_COUNTERS, 0)
+      return granted, 0
+
+  def _create_bucket(self):
+    """ Creates a full bucket node if one does not exist. """
+    bucket = {'tokens': self.bucket_size, 'updated': time.time()}
+    bucket.update(dict.fromkeys(SHARED_COUNTERS, 0))
+    try:
+      self._zk_client.create(self._node, json.dumps(bucket), makepath=True)
+    except NodeExistsError:
+      pass
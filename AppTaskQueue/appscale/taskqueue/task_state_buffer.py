@@ -0,0 +1,143 @@
+""" Buffers task state changes so that push workers can store them in
+batches. """
+import datetime
+import sys
+import threading
+import time
+
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from .constants import TRANSIENT_DS_ERRORS
+from .task_name import TaskName
+from .tq_lib import TASK_STATES
+from .utils import logger
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.ext import db
+
+# States that mark the end of a task's execution.
+FINAL_STATES = (TASK_STATES.EXPIRED, TASK_STATES.FAILED, TASK_STATES.SUCCESS)
+
+
+class TaskStateBuffer(object):
+  """ Accumulates task state changes and periodically writes them to the
+  TaskName entities.
+
+  Push workers run with eventlet's monkey patching, so the flushing thread
+  is a green thread.
+  """
+
+  # The number of seconds between flushes.
+  FLUSH_INTERVAL = 1
+
+  # The number of buffered changes that triggers an immediate flush.
+  MAX_BUFFERED = 100
+
+  # The number of times to retry a flush that fails.
+  FLUSH_RETRIES = 3
+
+  def __init__(self, flush_interval=FLUSH_INTERVAL, max_buffered=MAX_BUFFERED):
+    """ Creates a new TaskStateBuffer.
+
+    Args:
+      flush_interval: A number specifying the seconds between flushes.
+      max_buffered: An integer specifying the number of buffered changes
+        that triggers an immediate flush.
+    """
+    self._flush_interval = flush_interval
+    self._max_buffered = max_buffered
+    # Maps task names to (state, time changed) tuples.
+    self._pending = {}
+    self._lock = threading.Lock()
+    self._flush_lock = threading.Lock()
+    self._flush_thread = None
+
+  def add(self, task_name, state):
+    """ Records a task state change.
+
+    Args:
+      task_name: A string specifying the TaskName key.
+      state: A string specifying the new task state.
+    """
+    with self._lock:
+      self._pending[task_name] = (state, datetime.datetime.now())
+      buffered = len(self._pending)
+
+    if buffered >= self._max_buffered:
+      self.flush()
+
+  def start(self):
+    """ Starts flushing the buffer periodically. """
+    if self._flush_thread is not None:
+      return
+
+    self._flush_thread = threading.Thread(target=self._flush_periodically)
+    self._flush_thread.daemon = True
+    self._flush_thread.start()
+
+  def flush(self):
+    """ Writes the buffered changes to the TaskName entities.
+
+    Changes that could not be written are kept for the next flush, so errors
+    are logged instead of raised.
+    """
+    with self._flush_lock:
+      with self._lock:
+        pending = self._pending
+        self._pending = {}
+
+      if not pending:
+        return
+
+      try:
+        self._store(pending)
+      except Exception as error:
+        with self._lock:
+          # Keep changes that were made while the flush was in progress.
+          pending.update(self._pending)
+          self._pending = pending
+
+        if isinstance(error, TRANSIENT_DS_ERRORS):
+          logger.warning('Unable to store {} task states: {}'.format(
+            len(pending), error))
+        else:
+          logger.exception('Unexpected error while storing {} task states'
+                           .format(len(pending)))
+
+  def _flush_periodically(self):
+    """ Flushes the buffer until the process exits. """
+    while True:
+      time.sleep(self._flush_interval)
+      self.flush()
+
+  def _store(self, pending, retries=FLUSH_RETRIES):
+    """ Updates TaskName entities with a batch get and put.
+
+    Args:
+      pending: A dictionary mapping task names to (state, time changed)
+        tuples.
+      retries: An integer specifying how many times to retry the update.
+    """
+    task_names = list(pending)
+    try:
+      entities = TaskName.get_by_key_name(task_names)
+      to_put = []
+      for task_name, entity in zip(task_names, entities):
+        if entity is None:
+          continue
+
+        state, changed = pending[task_name]
+        entity.state = state
+        if state in FINAL_STATES:
+          entity.endtime = changed
+
+        to_put.append(entity)
+
+      if to_put:
+        db.put(to_put)
+    except TRANSIENT_DS_ERRORS as error:
+      retries -= 1
+      if retries < 0:
+        raise
+
+      logger.warning('Error updating task names: {}. Retrying'.format(error))
+      self._store(pending, retries)
@@ -0,0 +1,172 @@
+""" Compares per-task and batched push task enqueuing for BulkAdd requests.
+
+The per-task path checks and stores each task name with separate datastore
+calls and acquires a broker producer for each task. The batched path checks
+and stores all of the names with one call each and publishes the tasks for
+a queue with a single producer. Each datastore call and producer acquisition
+waits for a simulated round trip.
+
+Usage: python bulk_add.py [--tasks N] [--latency SECONDS]
+"""
+
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+from appscale.common import constants
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
+from appscale.taskqueue import distributed_tq
+from appscale.taskqueue.distributed_tq import DistributedTaskQueue
+from appscale.taskqueue.task_name import TaskName
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.api.taskqueue import taskqueue_service_pb
+
+
+class SimulatedDatastore(object):
+  """ Stores task names in memory after a delay. """
+  def __init__(self, latency):
+    self.latency = latency
+    self.names = set()
+    self.round_trips = 0
+
+  def get(self, task_names):
+    self.round_trips += 1
+    time.sleep(self.latency)
+    if isinstance(task_names, basestring):
+      return None
+
+    return [None for _ in task_names]
+
+  def put(self, entities):
+    self.round_trips += 1
+    time.sleep(self.latency)
+    if not isinstance(entities, list):
+      entities = [entities]
+
+    self.names.update(entity.key().name() for entity in entities)
+
+
+class SimulatedCelery(object):
+  """ Accepts tasks, waiting a round trip for each producer. """
+  def __init__(self, latency):
+    self.latency = latency
+    self.round_trips = 0
+    self.published = 0
+
+  @contextmanager
+  def producer_or_acquire(self, producer=None):
+    if producer is not None:
+      yield producer
+      return
+
+    self.round_trips += 1
+    time.sleep(self.latency)
+    yield object()
+
+  def send_task(self, name, producer=None, **options):
+    with self.producer_or_acquire(producer):
+      self.published += 1
+
+
+class SimulatedPushQueue(object):
+  """ A push queue backed by a simulated broker. """
+  def __init__(self, latency):
+    self.name = 'default'
+    self.celery = SimulatedCelery(latency)
+
+
+class BenchmarkTaskQueue(DistributedTaskQueue):
+  """ A task queue server that only enqueues push tasks. """
+  def __init__(self, push_queue):
+    os.environ['APPLICATION_ID'] = constants.DASHBOARD_APP_ID
+    self.push_queue = push_queue
+
+  def get_queue(self, app, queue):
+    return self.push_queue
+
+  def get_task_headers(self, request):
+    return {'X-AppEngine-TaskETA': '0'}
+
+  def get_task_args(self, source_info, headers, request):
+    return {'expires': None}
+
+
+def build_requests(task_count):
+  """ Creates add requests for a push queue. """
+  requests = []
+  for index in range(task_count):
+    request = taskqueue_service_pb.TaskQueueAddRequest()
+    request.set_app_id('guestbook')
+    request.set_queue_name('default')
+    request.set_task_name('task-{}'.format(index))
+    request.set_url('/worker')
+    requests.append(request)
+
+  return requests
+
+
+def enqueue_per_task(tq, requests):
+  """ Enqueues tasks with separate calls for each task. """
+  for request in requests:
+    if TaskName.get_by_key_name(request.task_name()) is not None:
+      continue
+
+    distributed_tq.db.put(
+      TaskName(key_name=request.task_name(), state='queued',
+               queue=request.queue_name(), app_id=request.app_id()))
+    push_queue = tq.get_queue(request.app_id(), request.queue_name())
+    push_queue.celery.send_task('task', kwargs={}, queue=push_queue.name)
+
+
+def enqueue_batched(tq, requests):
+  """ Enqueues tasks with the BulkAdd implementation. """
+  tq._DistributedTaskQueue__enqueue_push_tasks({}, requests)
+
+
+def run(enqueue, requests, latency):
+  """ Enqueues all of the requests.
+
+  Returns:
+    A tuple containing the elapsed time, the number of datastore round
+    trips, and the number of broker round trips.
+  """
+  datastore = SimulatedDatastore(latency)
+  push_queue = SimulatedPushQueue(latency)
+
+  tq = BenchmarkTaskQueue(push_queue)
+
+  original_get = TaskName.get_by_key_name
+  original_put = distributed_tq.db.put
+  TaskName.get_by_key_name = staticmethod(datastore.get)
+  distributed_tq.db.put = datastore.put
+  try:
+    start = time.time()
+    enqueue(tq, requests)
+    elapsed = time.time() - start
+  finally:
+    TaskName.get_by_key_name = original_get
+    distributed_tq.db.put = original_put
+
+  return elapsed, datastore.round_trips, push_queue.celery.round_trips
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+  parser.add_argument('--tasks', type=int, default=100)
+  parser.add_argument('--latency', type=float, default=0.002)
+  args = parser.parse_args()
+
+  requests = build_requests(args.tasks)
+  for name, enqueue in [('per task', enqueue_per_task),
+                        ('batched', enqueue_batched)]:
+    elapsed, datastore_trips, broker_trips = run(enqueue, requests,
+                                                 args.latency)
+    print('{}: {:.3f}s, {} datastore round trips, {} broker round '
+          'trips'.format(name, elapsed, datastore_trips, broker_trips))
+
+
+if __name__ == '__main__':
+  main()
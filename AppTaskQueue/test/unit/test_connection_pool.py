@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from mock import MagicMock, patch
+
+from appscale.taskqueue import connection_pool
+from appscale.taskqueue.connection_pool import HTTPConnectionPool
+
+
+class TestHTTPConnectionPool(unittest.TestCase):
+  def setUp(self):
+    self.stats_dir = tempfile.mkdtemp()
+    self.addCleanup(shutil.rmtree, self.stats_dir)
+    self.connection_class = MagicMock(
+      side_effect=lambda host, port: MagicMock(host=host, port=port))
+    self.pool = HTTPConnectionPool(
+      {'http': self.connection_class}, max_per_host=2,
+      stats_path=os.path.join(self.stats_dir, 'app1-1.json'))
+
+  def test_reuse(self):
+    first, reused = self.pool.acquire('http', 'host1', 8080)
+    self.assertFalse(reused)
+    self.pool.release(first, 'http', 'host1', 8080)
+
+    second, reused = self.pool.acquire('http', 'host1', 8080)
+    self.assertTrue(reused)
+    self.assertIs(first, second)
+
+    # Each target has its own connections.
+    other, reused = self.pool.acquire('http', 'host1', 8081)
+    self.assertFalse(reused)
+    self.assertIsNot(other, second)
+
+    # Connections that can't be reused are closed.
+    self.pool.release(second, 'http', 'host1', 8080, reusable=False)
+    second.close.assert_called_once_with()
+    self.assertDictEqual(self.pool.stats(), {
+      'created': 2, 'reused': 1, 'evicted': 0, 'discarded': 1, 'waits': 0,
+      'open': 1, 'idle': 0})
+
+  def test_idle_eviction(self):
+    connection, _ = self.pool.acquire('http', 'host1', 8080)
+    with patch.object(connection_pool.time, 'time', return_value=1000):
+      self.pool.release(connection, 'http', 'host1', 8080)
+
+    # Connections that have been idle for too long are closed.
+    new_connection, reused = self.pool.acquire('http', 'host1', 8080)
+    self.assertFalse(reused)
+    connection.close.assert_called_once_with()
+    self.assertEqual(self.pool.counters['evicted'], 1)
+    self.assertEqual(self.pool.stats()['open'], 1)
+
+  def test_stats_file(self):
+    connection, _ = self.pool.acquire('http', 'host1', 8080)
+    self.pool.release(connection, 'http', 'host1', 8080)
+
+    stats_path = os.path.join(self.stats_dir, 'app1-1.json')
+    with open(stats_path) as stats_file:
+      stats = json.load(stats_file)
+
+    self.assertEqual(stats['created'], 1)
+    self.assertEqual(stats['idle'], 1)
+
+    # Statistics for each project are combined.
+    with patch.object(connection_pool, 'POOL_STATS_DIR', self.stats_dir):
+      with patch.object(connection_pool.os, 'kill'):
+        shutil.copy(stats_path, os.path.join(self.stats_dir, 'app1-2.json'))
+        combined = connection_pool.pool_stats()
+
+    self.assertEqual(combined['app1']['created'], 2)
+    self.assertEqual(combined['app1']['idle'], 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
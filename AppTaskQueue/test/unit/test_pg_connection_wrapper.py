@@ -0,0 +1,88 @@
+import unittest
+
+import psycopg2
+from mock import MagicMock, patch
+
+from appscale.taskqueue.pg_connection_wrapper import PostgresConnectionWrapper
+from appscale.taskqueue.queue import TransientError
+
+
+def new_connection(*args, **kwargs):
+  connection = MagicMock()
+  connection.closed = 0
+  return connection
+
+
+class TestPostgresConnectionWrapper(unittest.TestCase):
+  def setUp(self):
+    patcher = patch.object(psycopg2, 'connect', side_effect=new_connection)
+    self.connect = patcher.start()
+    self.addCleanup(patcher.stop)
+    self.wrapper = PostgresConnectionWrapper(dsn='dbname=test',
+                                             max_connections=2)
+
+  def test_reuse(self):
+    with self.wrapper.connection() as first:
+      pass
+
+    with self.wrapper.connection() as second:
+      pass
+
+    self.assertIs(first, second)
+    self.connect.assert_called_once_with(dsn='dbname=test')
+
+    # Concurrent transactions use separate connections.
+    with self.wrapper.connection() as first:
+      with self.wrapper.connection() as second:
+        self.assertIsNot(first, second)
+
+    self.assertEqual(self.connect.call_count, 2)
+
+  def test_reconnect(self):
+    # Connections that fail are replaced.
+    with self.assertRaises(psycopg2.OperationalError):
+      with self.wrapper.connection() as first:
+        raise psycopg2.OperationalError()
+
+    first.close.assert_called_once_with()
+    with self.wrapper.connection() as second:
+      self.assertIsNot(first, second)
+
+    # Other errors do not affect the connection.
+    with self.assertRaises(psycopg2.IntegrityError):
+      with self.wrapper.connection() as third:
+        raise psycopg2.IntegrityError()
+
+    self.assertIs(third, second)
+
+  def test_health_check(self):
+    with self.wrapper.connection() as first:
+      pass
+
+    # Idle connections are checked before they are used.
+    connection, last_used = self.wrapper._idle[0]
+    self.wrapper._idle[0] = (
+      connection, last_used - self.wrapper.HEALTH_CHECK_INTERVAL)
+    cursor = first.cursor.return_value.__enter__.return_value
+    cursor.execute.side_effect = psycopg2.InterfaceError()
+    with self.wrapper.connection() as second:
+      self.assertIsNot(first, second)
+
+    cursor.execute.assert_called_once_with('SELECT 1')
+    self.assertEqual(self.wrapper._open_count, 1)
+
+  def test_acquire_timeout(self):
+    self.wrapper.ACQUIRE_TIMEOUT = 0.01
+    with self.wrapper.connection():
+      with self.wrapper.connection():
+        # The pool is full, so a third transaction gives up.
+        with self.assertRaises(TransientError):
+          with self.wrapper.connection():
+            pass
+
+    self.assertEqual(self.connect.call_count, 2)
+    self.assertEqual(len(self.wrapper._idle), 2)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,146 @@
+import datetime
+import unittest
+from collections import namedtuple
+
+from cassandra import OperationTimedOut
+from cassandra.query import BatchStatement
+from mock import MagicMock
+
+from appscale.taskqueue.queue import PullQueue
+
+IndexRow = namedtuple('IndexRow', ['eta', 'id', 'tag'])
+TaskRow = namedtuple('TaskRow', ['payload', 'enqueued', 'lease_expires',
+                                 'retry_count', 'tag'])
+
+
+class FakeResult(list):
+  """ A query result that indicates if a conditional update was applied. """
+  def __init__(self, rows=(), was_applied=True):
+    super(FakeResult, self).__init__(rows)
+    self.was_applied = was_applied
+
+
+class FakeFuture(object):
+  def __init__(self, result=None, error=None):
+    self._result = result
+    self._error = error
+
+  def result(self):
+    if self._error is not None:
+      raise self._error
+
+    return self._result
+
+
+class FakeSession(object):
+  """ Stores pull queue tasks in memory. """
+  def __init__(self, tasks):
+    self.tasks = tasks
+    self.op_ids = {}
+    self.prepared = []
+    self.batches = []
+    self.update_error = None
+    self.apply_updates = True
+
+  def prepare(self, statement):
+    self.prepared.append(statement)
+    prepared = MagicMock()
+    prepared.statement = statement
+    prepared.bind.side_effect = lambda params: MagicMock(
+      statement=statement, params=params)
+    return prepared
+
+  def execute_async(self, query, params=None):
+    if isinstance(query, BatchStatement):
+      self.batches.append(query)
+      return FakeFuture(FakeResult())
+
+    statement = query.statement.strip()
+    if params is None:
+      params = query.params
+
+    task_id = params[2]
+    if statement.startswith('SELECT op_id'):
+      return FakeFuture(FakeResult([MagicMock(op_id=self.op_ids[task_id])]))
+
+    if statement.startswith('SELECT'):
+      task = self.tasks.get(task_id)
+      return FakeFuture(FakeResult([] if task is None else [task]))
+
+    lease_expires, op_id, retry_count, _, _, task_id, now, old_count = params
+    task = self.tasks[task_id]
+    applied = (self.apply_updates and task.lease_expires < now and
+               task.retry_count == old_count)
+    if applied:
+      self.tasks[task_id] = task._replace(lease_expires=lease_expires,
+                                          retry_count=retry_count)
+      self.op_ids[task_id] = op_id
+
+    return FakeFuture(FakeResult(was_applied=applied), self.update_error)
+
+
+class TestPullQueue(unittest.TestCase):
+  def test_lease_batch(self):
+    epoch = datetime.datetime.utcfromtimestamp(0)
+    future = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+    tasks = {
+      'available': TaskRow('payload1', epoch, epoch, 0, 'tag1'),
+      'leased': TaskRow('payload2', epoch, future, 0, ''),
+      'exhausted': TaskRow('payload3', epoch, epoch, 2, '')
+    }
+    session = FakeSession(tasks)
+    queue = PullQueue({'name': 'queue1',
+                       'retry_parameters': {'task_retry_limit': 2}},
+                      'app1', MagicMock(session=session))
+    indexes = [IndexRow(epoch, task_id, '')
+               for task_id in ('available', 'leased', 'exhausted', 'missing')]
+    new_eta = future + datetime.timedelta(hours=1)
+
+    metrics = {'rounds': 0, 'reads': 0, 'conditional_updates': 0,
+               'serial_reads': 0, 'index_batches': 0}
+    leased = queue._lease_batch(indexes, new_eta, metrics)
+
+    self.assertEqual(leased[0].id, 'available')
+    self.assertEqual(leased[0].payloadBase64, 'payload1')
+    self.assertEqual(leased[0].tag, 'tag1')
+    self.assertEqual(leased[0].retry_count, 0)
+    self.assertListEqual(leased[1:], [None, None, None])
+    self.assertEqual(tasks['available'].retry_count, 1)
+    self.assertEqual(tasks['available'].lease_expires, new_eta)
+
+    # Only tasks that are available are leased, and the index and stats
+    # updates are written in one batch.
+    self.assertDictEqual(metrics, {'rounds': 1, 'reads': 4,
+                                   'conditional_updates': 1,
+                                   'serial_reads': 0, 'index_batches': 1})
+    self.assertEqual(len(session.batches), 1)
+
+    # Statements are only prepared once.
+    prepared_count = len(session.prepared)
+    tasks['available'] = tasks['available']._replace(lease_expires=epoch)
+    queue._lease_batch(indexes, new_eta, metrics)
+    self.assertEqual(len(session.prepared), prepared_count)
+    self.assertEqual(metrics['rounds'], 2)
+
+  def test_lease_batch_timeout(self):
+    epoch = datetime.datetime.utcfromtimestamp(0)
+    tasks = {'task1': TaskRow('payload1', epoch, epoch, 0, '')}
+    session = FakeSession(tasks)
+    session.update_error = OperationTimedOut()
+    queue = PullQueue({'name': 'queue1'}, 'app1', MagicMock(session=session))
+    new_eta = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+
+    # A lease that timed out succeeded if the operation ID matches.
+    leased = queue._lease_batch([IndexRow(epoch, 'task1', '')], new_eta)
+    self.assertEqual(leased[0].id, 'task1')
+
+    # The lease failed if the task was last mutated by another operation.
+    tasks['task1'] = tasks['task1']._replace(lease_expires=epoch,
+                                             retry_count=0)
+    session.apply_updates = False
+    leased = queue._lease_batch([IndexRow(epoch, 'task1', '')], new_eta)
+    self.assertListEqual(leased, [None])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,146 @@
+import json
+import unittest
+
+from kazoo.exceptions import (
+  BadVersionError,
+  ConnectionLoss,
+  NodeExistsError,
+  NoNodeError
+)
+from mock import MagicMock, patch
+
+from appscale.taskqueue import rate_limiter
+from appscale.taskqueue.rate_limiter import (
+  DistributedTokenBucket,
+  bucket_stats,
+  parse_rate
+)
+
+
+class FakeZKClient(object):
+  """ Stores versioned nodes in memory. """
+  def __init__(self):
+    self.nodes = {}
+    self.conflicts = 0
+    self.sets = 0
+
+  def get(self, path):
+    if path not in self.nodes:
+      raise NoNodeError()
+
+    data, version = self.nodes[path]
+    return data, MagicMock(version=version)
+
+  def get_children(self, path):
+    prefix = path + '/'
+    children = [node[len(prefix):] for node in self.nodes
+                if node.startswith(prefix)]
+    if not children:
+      raise NoNodeError()
+
+    return children
+
+  def create(self, path, value, makepath=False):
+    if path in self.nodes:
+      raise NodeExistsError()
+
+    self.nodes[path] = (value, 0)
+
+  def set(self, path, value, version=-1):
+    if self.conflicts:
+      # Simulate a write from another worker.
+      self.conflicts -= 1
+      data, current_version = self.nodes[path]
+      self.nodes[path] = (data, current_version + 1)
+
+    if self.nodes[path][1] != version:
+      raise BadVersionError()
+
+    self.sets += 1
+    self.nodes[path] = (value, version + 1)
+
+
+class TestDistributedTokenBucket(unittest.TestCase):
+  def setUp(self):
+    self.zk_client = FakeZKClient()
+    self.now = 1000.0
+    time_patcher = patch.object(rate_limiter.time, 'time',
+                                side_effect=lambda: self.now)
+    time_patcher.start()
+    self.addCleanup(time_patcher.stop)
+
+    def sleep(seconds):
+      self.now += seconds
+
+    sleep_patcher = patch.object(rate_limiter.time, 'sleep',
+                                 side_effect=sleep)
+    self.sleep = sleep_patcher.start()
+    self.addCleanup(sleep_patcher.stop)
+
+  def test_parse_rate(self):
+    self.assertEqual(parse_rate('5/s'), 5)
+    self.assertEqual(parse_rate('30/m'), .5)
+    self.assertEqual(parse_rate('1.5/h'), 1.5 / 3600)
+    self.assertEqual(parse_rate('0'), 0)
+
+  def test_shared_rate(self):
+    # Two workers share the same bucket.
+    workers = [DistributedTokenBucket(self.zk_client, 'app1', 'queue1', 10,
+                                      bucket_size=10)
+               for _ in range(2)]
+
+    # A full bucket allows a burst without waiting.
+    for _ in range(5):
+      for worker in workers:
+        self.assertEqual(worker.acquire(), 0)
+
+    self.sleep.assert_not_called()
+
+    # Tokens are leased in batches.
+    self.assertEqual(self.zk_client.sets, 2)
+
+    # Once the bucket is empty, the workers are limited to the shared rate.
+    start_time = self.now
+    for _ in range(5):
+      for worker in workers:
+        worker.acquire()
+
+    self.assertAlmostEqual(self.now - start_time, 1, delta=.2)
+    throttled = sum(worker.counters['throttled'] for worker in workers)
+    self.assertGreater(throttled, 0)
+    self.assertEqual(sum(worker.counters['dispatched'] for worker in workers),
+                     20)
+
+    # Counters are combined in the shared node.
+    workers[0].acquire()
+    workers[1].acquire()
+    stats = bucket_stats(self.zk_client, 'app1')['queue1']
+    self.assertGreaterEqual(stats['dispatched'], 20)
+    self.assertEqual(stats['rate'], 10)
+
+  def test_conflicts(self):
+    bucket = DistributedTokenBucket(self.zk_client, 'app1', 'queue1', 5)
+    self.zk_client.conflicts = 2
+    self.assertEqual(bucket.acquire(), 0)
+    self.assertEqual(bucket.counters['conflicts'], 2)
+    self.assertEqual(bucket.counters['leases'], 1)
+
+  def test_unavailable(self):
+    # Tasks are not blocked when the bucket can't be reached.
+    zk_client = MagicMock()
+    zk_client.get.side_effect = ConnectionLoss()
+    bucket = DistributedTokenBucket(zk_client, 'app1', 'queue1', 5)
+    self.assertEqual(bucket.acquire(), 0)
+    self.assertEqual(bucket.counters['dispatched'], 1)
+
+  def test_paused(self):
+    bucket = DistributedTokenBucket(self.zk_client, 'app1', 'queue1', 0)
+    self.sleep.side_effect = StopIteration
+    with self.assertRaises(StopIteration):
+      bucket.acquire()
+
+    self.sleep.assert_called_once_with(DistributedTokenBucket.MAX_WAIT)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -4,6 +4,7 @@ import json
 
 from appscale.common.service_stats import stats_manager
 from mock import mock, patch
+from tornado.concurrent import Future
 from tornado.testing import AsyncHTTPTestCase
 
 from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
@@ -57,6 +58,13 @@ class TestServiceStatistics(AsyncHTTPTestCase):
     self.pb_remote_request_mock = remote_request_patcher.start()
     self.patchers.append(remote_request_patcher)
 
+    # remote_request is a coroutine, so the mock wraps its result in a future.
+    def remote_request(*args, **kwargs):
+      future = Future()
+      future.set_result(self.pb_remote_request_mock.return_value)
+      return future
+    self.pb_remote_request_mock.side_effect = remote_request
+
     time_patcher = patch.object(stats_manager.time, 'time')
     self.time_mock = time_patcher.start()
     self.patchers.append(time_patcher)
@@ -139,6 +147,9 @@ class TestServiceStatistics(AsyncHTTPTestCase):
     self.assertGreater(stats['recent_stats'].pop('to'), 0)
     self.assertGreaterEqual(stats['recent_stats'].pop('avg_latency'), 0)
 
+    # Connection pool statistics come from push workers.
+    self.assertIsInstance(stats.pop('push_connection_pools'), dict)
+
     # Verify other fields
     self.assertEqual(stats, {
       'current_requests': 0,
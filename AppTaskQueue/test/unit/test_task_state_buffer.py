@@ -0,0 +1,83 @@
+import os
+import unittest
+
+from mock import MagicMock, patch
+
+from appscale.common import constants
+from appscale.taskqueue import task_state_buffer
+from appscale.taskqueue.task_state_buffer import TaskStateBuffer
+from appscale.taskqueue.tq_lib import TASK_STATES
+
+
+class TestTaskStateBuffer(unittest.TestCase):
+  def setUp(self):
+    os.environ['APPLICATION_ID'] = constants.DASHBOARD_APP_ID
+    self.entities = {'task1': MagicMock(), 'task2': MagicMock()}
+    get_patcher = patch.object(
+      task_state_buffer.TaskName, 'get_by_key_name',
+      side_effect=lambda names: [self.entities.get(name) for name in names])
+    self.get_by_key_name = get_patcher.start()
+    self.addCleanup(get_patcher.stop)
+    put_patcher = patch.object(task_state_buffer.db, 'put')
+    self.put = put_patcher.start()
+    self.addCleanup(put_patcher.stop)
+
+  def test_flush(self):
+    buffer_ = TaskStateBuffer(max_buffered=10)
+    buffer_.add('task1', TASK_STATES.FAILED)
+    buffer_.add('task1', TASK_STATES.SUCCESS)
+    buffer_.add('task2', TASK_STATES.EXPIRED)
+    buffer_.add('missing', TASK_STATES.SUCCESS)
+    self.put.assert_not_called()
+
+    # All of the changes are stored with one get and one put.
+    buffer_.flush()
+    self.assertEqual(self.get_by_key_name.call_count, 1)
+    self.assertEqual(self.put.call_count, 1)
+    stored = self.put.call_args[0][0]
+    self.assertItemsEqual(stored, self.entities.values())
+    self.assertEqual(self.entities['task1'].state, TASK_STATES.SUCCESS)
+    self.assertEqual(self.entities['task2'].state, TASK_STATES.EXPIRED)
+
+    # Nothing is written when there are no changes.
+    buffer_.flush()
+    self.assertEqual(self.put.call_count, 1)
+
+  def test_size_threshold(self):
+    buffer_ = TaskStateBuffer(max_buffered=2)
+    buffer_.add('task1', TASK_STATES.SUCCESS)
+    self.put.assert_not_called()
+    buffer_.add('task2', TASK_STATES.SUCCESS)
+    self.assertEqual(self.put.call_count, 1)
+
+  def test_failed_flush(self):
+    error = task_state_buffer.TRANSIENT_DS_ERRORS[0]()
+    self.put.side_effect = error
+    buffer_ = TaskStateBuffer()
+    buffer_.add('task1', TASK_STATES.SUCCESS)
+
+    # Changes that could not be stored are kept for the next flush.
+    buffer_.flush()
+    self.assertEqual(self.put.call_count, TaskStateBuffer.FLUSH_RETRIES + 1)
+    self.put.side_effect = None
+    buffer_.flush()
+    self.assertEqual(self.put.call_count, TaskStateBuffer.FLUSH_RETRIES + 2)
+    self.assertEqual(self.entities['task1'].state, TASK_STATES.SUCCESS)
+
+  def test_unexpected_error(self):
+    self.put.side_effect = ValueError()
+    buffer_ = TaskStateBuffer(max_buffered=2)
+    buffer_.add('task1', TASK_STATES.SUCCESS)
+
+    # A flush triggered by a new change does not raise, and the changes are
+    # kept for the next flush.
+    buffer_.add('task2', TASK_STATES.FAILED)
+    self.assertEqual(self.put.call_count, 1)
+    self.put.side_effect = None
+    buffer_.flush()
+    self.assertEqual(self.put.call_count, 2)
+    self.assertItemsEqual(self.put.call_args[0][0], self.entities.values())
+
+
+if __name__ == '__main__':
+  unittest.main()
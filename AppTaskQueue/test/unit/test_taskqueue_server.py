@@ -1,10 +1,19 @@
 #!/usr/bin/env python
+import sys
 import unittest
 
 from mock import MagicMock, patch
 from appscale.common import file_io
+from appscale.common.unpackaged import APPSCALE_PYTHON_APPSERVER
 
 from appscale.taskqueue import distributed_tq
+from appscale.taskqueue.task_name import TaskName
+from appscale.taskqueue.tq_lib import TASK_STATES
+
+sys.path.append(APPSCALE_PYTHON_APPSERVER)
+from google.appengine.api.taskqueue import taskqueue_service_pb
+from google.appengine.api.taskqueue.taskqueue_service_pb import (
+  TaskQueueServiceError)
 
 
 class TestDistributedTaskQueue(unittest.TestCase):
@@ -25,12 +34,55 @@ class TestDistributedTaskQueue(unittest.TestCase):
     zk_client = MagicMock()
     distributed_tq.DistributedTaskQueue(db_access, zk_client)
 
+  def test_enqueue_push_tasks(self):
+    tq = distributed_tq.DistributedTaskQueue(MagicMock(), MagicMock())
+    push_queue = MagicMock()
+    push_queue.name = 'default'
+    tq.get_queue = MagicMock(return_value=push_queue)
+    tq.get_task_headers = MagicMock(
+      return_value={'X-AppEngine-TaskETA': '0'})
+    tq.get_task_args = MagicMock(return_value={'expires': None})
+
+    requests = []
+    for task_name in ['task1', 'task2', 'task1', 'task3']:
+      request = taskqueue_service_pb.TaskQueueAddRequest()
+      request.set_app_id('guestbook')
+      request.set_queue_name('default')
+      request.set_task_name(task_name)
+      request.set_url('/worker')
+      requests.append(request)
+
+    existing = TaskName(key_name='task3', state=TASK_STATES.QUEUED,
+                        queue='default', app_id='guestbook')
+    with patch.object(TaskName, 'get_by_key_name',
+                      return_value=[None, None, None, existing]) as get, \
+         patch.object(distributed_tq.db, 'put') as put:
+      results = tq._DistributedTaskQueue__enqueue_push_tasks({}, requests)
+
+    self.assertListEqual(results, [
+      TaskQueueServiceError.OK, TaskQueueServiceError.OK,
+      TaskQueueServiceError.DUPLICATE_TASK_NAME,
+      TaskQueueServiceError.TASK_ALREADY_EXISTS])
+
+    # Names are checked and stored with one datastore call each.
+    get.assert_called_once_with(['task1', 'task2', 'task1', 'task3'])
+    self.assertEqual(put.call_count, 1)
+    self.assertListEqual(
+      [entity.key().name() for entity in put.call_args[0][0]],
+      ['task1', 'task2'])
+
+    # Tasks for a queue share a producer.
+    producer = push_queue.celery.producer_or_acquire.return_value.__enter__()
+    self.assertEqual(push_queue.celery.producer_or_acquire.call_count, 1)
+    self.assertEqual(push_queue.celery.send_task.call_count, 2)
+    for call_args in push_queue.celery.send_task.call_args_list:
+      self.assertIs(call_args[1]['producer'], producer)
+
   # TODO:
   # def test_fetch_queue_stats(self):
   # def test_delete(self):
   # def test_purge_queue(self):
   # def test_query_and_own_tasks(self):
-  # def test_bulk_add(self):
   # def test_modify_task_lease(self):
   # def test_update_queue(self):
   # def test_fetch_queue(self):